@@ -0,0 +1,209 @@
+"""
+Benchmark of the vector-graphics clustering used by _extract_page_regions.
+
+Generates synthetic pages with thousands of drawing paths, checks that
+cluster_drawings() returns exactly the clusters of the original pairwise
+algorithm and compares their run times.
+
+Usage:
+    python benchmarks/bench_clustering.py [--paths 10000] [--seed 0] [--skip-legacy]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import fitz  # PyMuPDF
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from morpher_pdf.converters.clustering import cluster_drawings
+
+
+def legacy_cluster_drawings(paths):
+    """The original clustering from _extract_page_regions, kept as a reference"""
+    def is_likely_axis(path):
+        """Check if a drawing path might be part of an axis"""
+        # Check for straight lines
+        if 'items' in path:
+            items = path['items']
+            if items:
+                # Check if it's a line
+                if path.get('type') in ['l', 'L']:  # line types
+                    points = items[0]
+                    if len(points) >= 2:
+                        x0, y0 = points[0:2]
+                        x1, y1 = points[-2:]
+                        # Check if line is horizontal, vertical, or diagonal
+                        return (abs(x0 - x1) < 5 or 
+                              abs(y0 - y1) < 5 or 
+                              abs(abs(x0 - x1) - abs(y0 - y1)) < 5)  # 45-degree lines
+        return False
+    
+    def get_path_bounds(path):
+        """Get the bounds of a path, including its stroke width"""
+        bbox = fitz.Rect(path['rect'])
+        # Consider stroke width in the bounds
+        stroke_width = path.get('width', 1)  # Default to 1 if not specified
+        bbox.x0 -= stroke_width
+        bbox.y0 -= stroke_width
+        bbox.x1 += stroke_width
+        bbox.y1 += stroke_width
+        return bbox
+    
+    def merge_rects(rect1, rect2, padding=10):
+        """Merge two rectangles with padding"""
+        x0 = min(rect1.x0, rect2.x0) - padding
+        y0 = min(rect1.y0, rect2.y0) - padding
+        x1 = max(rect1.x1, rect2.x1) + padding
+        y1 = max(rect1.y1, rect2.y1) + padding
+        return fitz.Rect(x0, y0, x1, y1)
+    
+    def rects_are_close(rect1, rect2, threshold=150):  # Increased threshold
+        """Check if two rectangles are close to each other"""
+        # Check for any kind of overlap or proximity
+        expanded1 = fitz.Rect(rect1)
+        expanded2 = fitz.Rect(rect2)
+        # Expand rectangles by threshold
+        expanded1.x0 -= threshold
+        expanded1.y0 -= threshold
+        expanded1.x1 += threshold
+        expanded1.y1 += threshold
+        expanded2.x0 -= threshold
+        expanded2.y0 -= threshold
+        expanded2.x1 += threshold
+        expanded2.y1 += threshold
+        
+        # Check if the expanded rectangles intersect or are very close
+        if expanded1.intersects(expanded2):
+            return True
+            
+        # Check if rectangles are aligned horizontally or vertically
+        horizontal_aligned = (abs(expanded1.y0 - expanded2.y0) < threshold or 
+                           abs(expanded1.y1 - expanded2.y1) < threshold)
+        vertical_aligned = (abs(expanded1.x0 - expanded2.x0) < threshold or 
+                         abs(expanded1.x1 - expanded2.x1) < threshold)
+        
+        return horizontal_aligned or vertical_aligned
+    
+    # First pass: create initial clusters with special handling for axes
+    clusters = []
+    axis_paths = []
+    
+    # First identify potential axes and significant paths
+    for path in paths:
+        if is_likely_axis(path) or path.get('type') in ['L', 'l', 'c', 'C', 'v', 'V']:
+            axis_paths.append(get_path_bounds(path))
+    
+    # Create initial clusters including axes and all significant paths
+    for path in paths:
+        bbox = get_path_bounds(path)
+        
+        # More lenient size threshold
+        if bbox.width < 10 or bbox.height < 10:
+            connected_to_axis = any(rects_are_close(bbox, axis, threshold=50) 
+                                 for axis in axis_paths)
+            if not connected_to_axis:
+                continue
+        
+        # Try to add to existing cluster
+        added_to_cluster = False
+        for i, cluster in enumerate(clusters):
+            if rects_are_close(cluster, bbox):
+                clusters[i] = merge_rects(cluster, bbox)
+                added_to_cluster = True
+                break
+        
+        # Create new cluster if needed
+        if not added_to_cluster:
+            clusters.append(bbox)
+    
+    # Second pass: aggressive merging of clusters
+    merged = True
+    while merged:
+        merged = False
+        i = 0
+        while i < len(clusters):
+            j = i + 1
+            while j < len(clusters):
+                if rects_are_close(clusters[i], clusters[j]):
+                    clusters[i] = merge_rects(clusters[i], clusters[j])
+                    clusters.pop(j)
+                    merged = True
+                else:
+                    j += 1
+            i += 1
+
+    return clusters
+
+
+def synthetic_paths(count, width, height, seed=0, tiny_fraction=0.3, axis_fraction=0.05):
+    """
+    Build drawing paths in the shape returned by page.get_drawings().
+
+    A share of the paths are tiny tick marks that are only kept when they
+    are close to an axis-like curve.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < axis_fraction:
+            path_type = "c"
+            w, h = rng.uniform(20, width / 4), rng.uniform(1, 20)
+        elif roll < axis_fraction + tiny_fraction:
+            path_type = "s"
+            w, h = rng.uniform(0.5, 8), rng.uniform(0.5, 8)
+        else:
+            path_type = "s"
+            w, h = rng.uniform(10, 120), rng.uniform(10, 120)
+        x0, y0 = rng.uniform(0, width - w), rng.uniform(0, height - h)
+        paths.append({
+            "type": path_type,
+            "items": [("l", fitz.Point(x0, y0), fitz.Point(x0 + w, y0 + h))],
+            "rect": fitz.Rect(x0, y0, x0 + w, y0 + h),
+            "width": rng.choice([0.5, 1.0, 2.0]),
+        })
+    return paths
+
+
+SCENARIOS = {
+    # Dense plot on a letter sized page
+    "plot": (612, 792),
+    # Large CAD sheet with widely spread parts
+    "cad": (20000, 14000),
+    # Sparse parts spread far apart, producing many separate clusters
+    "sparse": (10_000_000, 10_000_000),
+}
+
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--paths", type=int, default=10000, help="Drawing paths per page")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the indexed implementation")
+    args = parser.parse_args()
+
+    for name, (width, height) in SCENARIOS.items():
+        paths = synthetic_paths(args.paths, width, height, seed=args.seed)
+        clusters, elapsed = time_call(cluster_drawings, paths)
+        line = f"{name:>6}: {len(paths)} paths -> {len(clusters)} clusters, indexed {elapsed:.3f}s"
+
+        if not args.skip_legacy:
+            expected, legacy_elapsed = time_call(legacy_cluster_drawings, paths)
+            if [tuple(r) for r in clusters] != [tuple(r) for r in expected]:
+                raise SystemExit(f"{name}: clusters differ from the original algorithm")
+            line += f", original {legacy_elapsed:.3f}s ({legacy_elapsed / elapsed:.1f}x)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
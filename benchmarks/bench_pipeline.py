@@ -0,0 +1,362 @@
+"""
+End-to-end benchmark of the conversion pipeline on synthetic PDFs.
+
+Generates text-heavy, image-heavy, vector-plot-heavy and long documents
+with PyMuPDF and converts them against an in-process fake LLM registered
+in LLMFactory, so runs need no network access or API key. Every scenario
+runs in its own process and reports pages/sec, peak RSS and the time
+spent per pipeline stage.
+
+Results can be saved as a baseline and later runs compared against it;
+a throughput drop or memory growth beyond the tolerance exits non-zero.
+
+Stalled requests (--stall-rate) reproduce the latency tail of real
+providers; --hedge sends slow requests to a second fake provider.
+--latency-per-mb makes requests take longer the larger their images,
+as real requests do with more content to transcribe, which is what
+--region-tiling plays against.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--scenarios text,images] [--latency 0.05]
+        [--stall-rate 0.02 --hedge] [--latency-per-mb 2 --region-tiling]
+        [--save-baseline baseline.json] [--compare baseline.json] [--tolerance 0.2]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+FAKE_LLM_TYPE = "benchmark-fake"
+
+WORDS = ("the quick brown fox jumps over lazy dog lorem ipsum dolor sit amet consectetur "
+         "adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore magna aliqua").split()
+
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def text_heavy_pdf(path: str, pages: int, seed: int = 0) -> None:
+    """Pages of dense prose with a heading each"""
+    rng = random.Random(seed)
+    document = fitz.open()
+    for page_num in range(pages):
+        page = document.new_page()
+        page.insert_text((72, 72), f"Section {page_num + 1}", fontsize=18)
+        body = "\n\n".join(_paragraph(rng, 60) for _ in range(6))
+        page.insert_textbox(fitz.Rect(72, 100, 540, 760), body, fontsize=10)
+    document.save(path)
+
+
+def image_heavy_pdf(path: str, pages: int, seed: int = 0) -> None:
+    """Pages with several distinct raster images and a caption"""
+    rng = random.Random(seed)
+    document = fitz.open()
+    for page_num in range(pages):
+        page = document.new_page()
+        for index in range(4):
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 160, 120), False)
+            # Noise keeps every image distinct and incompressible
+            pix.set_rect(pix.irect, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+            for _ in range(200):
+                x, y = rng.randrange(150), rng.randrange(110)
+                pix.set_rect(fitz.IRect(x, y, x + 10, y + 10),
+                             (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+            x0, y0 = 72 + (index % 2) * 240, 100 + (index // 2) * 200
+            page.insert_image(fitz.Rect(x0, y0, x0 + 220, y0 + 165), pixmap=pix)
+        page.insert_text((72, 560), f"Figure {page_num + 1}: {_paragraph(rng, 12)}", fontsize=9)
+    document.save(path)
+
+
+def vector_plot_pdf(path: str, pages: int, seed: int = 0) -> None:
+    """Pages with line plots: axes, ticks and many polyline segments"""
+    rng = random.Random(seed)
+    document = fitz.open()
+    for page_num in range(pages):
+        page = document.new_page()
+        for plot in range(2):
+            top = 80 + plot * 350
+            shape = page.new_shape()
+            shape.draw_line((100, top + 250), (500, top + 250))
+            shape.draw_line((100, top), (100, top + 250))
+            for tick in range(11):
+                x = 100 + tick * 40
+                shape.draw_line((x, top + 250), (x, top + 256))
+            y = top + 125
+            for x in range(100, 500, 4):
+                next_y = min(top + 245, max(top + 5, y + rng.uniform(-8, 8)))
+                shape.draw_line((x, y), (x + 4, next_y))
+                y = next_y
+            shape.finish(color=(0, 0, 0), width=0.8)
+            shape.commit()
+            page.insert_text((100, top + 275), f"Plot {page_num + 1}.{plot + 1}", fontsize=9)
+    document.save(path)
+
+
+def mixed_pdf(path: str, pages: int, seed: int = 0) -> None:
+    """Prose, tables, blank separator pages and plots, as in a typical report"""
+    rng = random.Random(seed)
+    document = fitz.open()
+    for page_num in range(pages):
+        page = document.new_page()
+        kind = page_num % 5
+        if kind in (0, 1):
+            page.insert_text((72, 72), f"Section {page_num + 1}", fontsize=18)
+            body = "\n\n".join(_paragraph(rng, 60) for _ in range(6))
+            page.insert_textbox(fitz.Rect(72, 100, 540, 760), body, fontsize=10)
+        elif kind == 2:
+            shape = page.new_shape()
+            for row in range(16):
+                shape.draw_line((72, 100 + row * 25), (540, 100 + row * 25))
+                for column in range(4):
+                    page.insert_text((80 + column * 117, 118 + row * 25), f"{rng.uniform(0, 100):.2f}", fontsize=9)
+            for column in range(5):
+                shape.draw_line((72 + column * 117, 100), (72 + column * 117, 475))
+            shape.finish(color=(0, 0, 0), width=0.5)
+            shape.commit()
+        elif kind == 4:
+            shape = page.new_shape()
+            y = 300
+            for x in range(100, 500, 4):
+                next_y = min(450, max(150, y + rng.uniform(-8, 8)))
+                shape.draw_line((x, y), (x + 4, next_y))
+                y = next_y
+            shape.finish(color=(0, 0, 0), width=0.8)
+            shape.commit()
+        # Every fifth page (kind 3) is left blank, like a separator page
+    document.save(path)
+
+
+def two_column_pdf(path: str, pages: int, seed: int = 0) -> None:
+    """Paper pages: a title, two columns of prose, a results table and an equation"""
+    rng = random.Random(seed)
+    document = fitz.open()
+    for page_num in range(pages):
+        page = document.new_page()
+        page.insert_textbox(fitz.Rect(72, 60, 540, 90), f"Results {page_num + 1}", fontsize=16)
+        for column in range(2):
+            x0 = 72 + column * 240
+            body = "\n\n".join(_paragraph(rng, 45) for _ in range(4))
+            page.insert_textbox(fitz.Rect(x0, 110, x0 + 225, 540), body, fontsize=9)
+        shape = page.new_shape()
+        for row in range(7):
+            shape.draw_line((72, 560 + row * 20), (540, 560 + row * 20))
+            if row < 6:
+                for column in range(4):
+                    page.insert_text((80 + column * 117, 575 + row * 20), f"{rng.uniform(0, 100):.2f}", fontsize=8)
+        for column in range(5):
+            shape.draw_line((72 + column * 117, 560), (72 + column * 117, 680))
+        shape.finish(color=(0, 0, 0), width=0.5)
+        shape.commit()
+        page.insert_text((72, 720), f"E = m c^2 + {rng.randrange(10)} (x - y)^2", fontsize=11)
+    document.save(path)
+
+
+SCENARIOS = {
+    "text": (text_heavy_pdf, 50),
+    "images": (image_heavy_pdf, 30),
+    "vectors": (vector_plot_pdf, 30),
+    "mixed": (mixed_pdf, 50),
+    "papers": (two_column_pdf, 30),
+    "long": (text_heavy_pdf, 1000),
+}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process and its finished children"""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenario(name: str, pages: int, options: dict) -> dict:
+    """Generate and convert one scenario; runs in a fresh process"""
+    logging.basicConfig(level=options["log_level"].upper())
+    from morpher_pdf.converters.markdown import MarkdownConverter
+    from morpher_pdf.converters.routing import ModelRouter
+    from morpher_pdf.llm.factory import LLMFactory
+    from morpher_pdf.llm.fake import FakeLLMClient
+    from morpher_pdf.llm.throttle import RetryPolicy
+
+    llm_types = []
+    # With --hedge a second fake provider, with its own draws, takes hedged requests
+    for backend in range(2 if options["hedge"] else 1):
+        llm_types.append(f"{FAKE_LLM_TYPE}-{backend}")
+        LLMFactory.register(llm_types[-1], functools.partial(
+            FakeLLMClient,
+            latency=options["latency"],
+            latency_jitter=options["latency_jitter"],
+            error_rate=options["error_rate"],
+            stall_rate=options["stall_rate"],
+            stall_latency=options["stall_latency"],
+            latency_per_mb=options["latency_per_mb"],
+            seed=options["seed"] + backend,
+            retry_policy=RetryPolicy(max_retries=5, base_delay=0.01, max_delay=0.1),
+        ))
+
+    router = None
+    if options["route"]:
+        # Simple pages go to a cheaper fake model answering twice as fast
+        LLMFactory.register(f"{FAKE_LLM_TYPE}-cheap", functools.partial(
+            FakeLLMClient,
+            latency=options["latency"] / 2,
+            latency_jitter=options["latency_jitter"] / 2,
+            latency_per_mb=options["latency_per_mb"] / 2,
+            seed=options["seed"],
+        ))
+        router = ModelRouter({"simple": f"{FAKE_LLM_TYPE}-cheap"})
+
+    generate, _ = SCENARIOS[name]
+    with tempfile.TemporaryDirectory(prefix="morpher-bench-") as scratch:
+        path = os.path.join(scratch, f"{name}.pdf")
+        start = time.perf_counter()
+        generate(path, pages, seed=options["seed"])
+        generate_seconds = time.perf_counter() - start
+
+        converter = MarkdownConverter(
+            path,
+            "fake-key",
+            llm_type=llm_types if options["hedge"] else llm_types[0],
+            max_workers=options["workers"],
+            render_workers=options["render_workers"],
+            pages_per_request=options["pages_per_request"],
+            text_layer_fast_path=options["text_layer"],
+            router=router,
+            region_tiling=options["region_tiling"],
+        )
+        _, _, stats = converter.convert(return_stats=True)
+
+    data = stats.to_dict()
+    return {
+        "pages": pages,
+        "generate_seconds": generate_seconds,
+        "wall_seconds": data["wall_seconds"],
+        "pages_per_second": data["pages_per_second"],
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": {stage: values["seconds"] for stage, values in data["stages"].items()},
+        "counters": data["counters"],
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of results against a baseline, as printable lines"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None or reference["pages"] != result["pages"]:
+            continue
+        if result["pages_per_second"] < reference["pages_per_second"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['pages_per_second']:.1f} pages/s, "
+                               f"baseline {reference['pages_per_second']:.1f}")
+        if reference["peak_rss_mb"] and result["peak_rss_mb"] > reference["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{name}: peak RSS {result['peak_rss_mb']:.0f} MB, "
+                               f"baseline {reference['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma separated scenarios out of {', '.join(SCENARIOS)}")
+    parser.add_argument("--pages", type=int, default=None, help="Override the page count of every scenario")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per fake LLM request")
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of failing fake requests")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Fraction of stalling fake requests")
+    parser.add_argument("--stall-latency", type=float, default=2.0, help="Seconds a stalled request takes")
+    parser.add_argument("--hedge", action="store_true", help="Hedge slow requests to a second fake provider")
+    parser.add_argument("--latency-per-mb", type=float, default=0.0,
+                        help="Seconds added to a fake request per megabyte of images")
+    parser.add_argument("--workers", type=int, default=10, help="LLM worker threads")
+    parser.add_argument("--render-workers", type=int, default=1, help="Render processes")
+    parser.add_argument("--pages-per-request", type=int, default=1)
+    parser.add_argument("--text-layer", action="store_true", help="Enable the text layer fast path")
+    parser.add_argument("--route", action="store_true",
+                        help="Route simple pages to a cheaper fake model and skip blank pages")
+    parser.add_argument("--region-tiling", action="store_true",
+                        help="Split dense pages into regions converted in parallel")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="error", help="Logging level of the converter")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results to a baseline file")
+    parser.add_argument("--compare", metavar="PATH", help="Compare the results with a baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    options = {
+        "latency": args.latency,
+        "latency_jitter": args.latency_jitter,
+        "error_rate": args.error_rate,
+        "stall_rate": args.stall_rate,
+        "stall_latency": args.stall_latency,
+        "hedge": args.hedge,
+        "latency_per_mb": args.latency_per_mb,
+        "workers": args.workers,
+        "render_workers": args.render_workers,
+        "pages_per_request": args.pages_per_request,
+        "text_layer": args.text_layer,
+        "route": args.route,
+        "region_tiling": args.region_tiling,
+        "seed": args.seed,
+        "log_level": args.log_level,
+    }
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in args.scenarios.split(","):
+        if name not in SCENARIOS:
+            parser.error(f"Unknown scenario: {name}")
+        pages = args.pages or SCENARIOS[name][1]
+        # A fresh process per scenario keeps the peak RSS figures independent
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_scenario, name, pages, options).result()
+        results[name] = result
+
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in sorted(result["stages"].items()))
+        print(f"{name:>8}: {pages} pages in {result['wall_seconds']:.2f}s, "
+              f"{result['pages_per_second']:.1f} pages/s, peak RSS {result['peak_rss_mb']:.0f} MB")
+        print(f"{'':>8}  {stages}")
+        routed = {page_class: result["counters"][f"{page_class}_pages"] for page_class in ("blank", "simple", "complex")
+                  if f"{page_class}_pages" in result["counters"]}
+        if routed:
+            print(f"{'':>8}  routed pages: " + ", ".join(f"{count} {page_class}" for page_class, count in routed.items()))
+        if "tiled_pages" in result["counters"]:
+            print(f"{'':>8}  tiled pages: {result['counters']['tiled_pages']} "
+                  f"in {result['counters']['region_requests']} region requests")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"options": options, "results": results}, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("options") != options:
+            print("Warning: baseline was recorded with different options")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,58 @@
-from .converters.markdown import MarkdownConverter
-from .converters.latex import LaTeXConverter
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ['MarkdownConverter', 'LaTeXConverter']
+# Public names by the module defining them. They are imported on first
+# access so that `import morpher_pdf` stays cheap and PyMuPDF, NumPy and
+# the provider SDKs are only loaded by the code paths that need them.
+_EXPORTS = {
+    'MarkdownConverter': '.converters.markdown',
+    'LaTeXConverter': '.converters.latex',
+    'RenderOptions': '.converters.render',
+    'BatchConverter': '.converters.batch',
+    'DocumentResult': '.converters.batch',
+    'Document': '.converters.document',
+    'DocumentPage': '.converters.document',
+    'ModelRouter': '.converters.routing',
+    'BasePageCache': '.cache',
+    'MemoryPageCache': '.cache',
+    'SQLitePageCache': '.cache',
+    'ImageSink': '.converters.sinks',
+    'DirectoryImageSink': '.converters.sinks',
+    'ZipImageSink': '.converters.sinks',
+    'TarImageSink': '.converters.sinks',
+    'CallbackImageSink': '.converters.sinks',
+    'HedgedClient': '.llm.hedging',
+    'ConversionStats': '.stats',
+    'StatsSink': '.stats',
+    'CallbackSink': '.stats',
+    'JSONLinesSink': '.stats',
+    'PrometheusTextSink': '.stats',
+}
+
+__all__ = list(_EXPORTS)
+
+if TYPE_CHECKING:
+    from .converters.markdown import MarkdownConverter
+    from .converters.latex import LaTeXConverter
+    from .converters.render import RenderOptions
+    from .converters.batch import BatchConverter, DocumentResult
+    from .converters.document import Document, DocumentPage
+    from .converters.routing import ModelRouter
+    from .converters.sinks import ImageSink, DirectoryImageSink, ZipImageSink, TarImageSink, CallbackImageSink
+    from .cache import BasePageCache, MemoryPageCache, SQLitePageCache
+    from .llm.hedging import HedgedClient
+    from .stats import ConversionStats, StatsSink, CallbackSink, JSONLinesSink, PrometheusTextSink
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    # Cache it so later lookups do not go through __getattr__ again
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,158 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+class BasePageCache(ABC):
+    """Cache of processed page content keyed on page image, model and prompt"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached content for key or None on a miss"""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        """Store content under key"""
+        pass
+
+    @staticmethod
+    def make_key(page: bytes, llm_type: str, prompt: str) -> str:
+        """
+        Build a content-addressed cache key.
+
+        Args:
+            page (bytes): Rendered page image
+            llm_type (str): Type of LLM the page is sent to
+            prompt (str): Prompt the page is sent with
+
+        Returns:
+            str: Hex digest identifying the page/model/prompt combination
+        """
+        digest = hashlib.sha256()
+        for part in (page, str(llm_type).encode("utf-8"), prompt.encode("utf-8")):
+            # Length-prefix each part so different splits never collide
+            digest.update(len(part).to_bytes(8, "big"))
+            digest.update(part)
+        return digest.hexdigest()
+
+
+class MemoryPageCache(BasePageCache):
+    """In-memory LRU cache bounded by the total size of the stored content"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes (int): Maximum total size of cached content in bytes
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.encode("utf-8"))
+            self._entries[key] = value
+            self._size += size
+
+            # Evict least recently used entries until we are within budget
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.encode("utf-8"))
+
+
+class SQLitePageCache(BasePageCache):
+    """On-disk LRU cache stored in a SQLite database"""
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            path (str): Path to the SQLite database file
+            max_bytes (int): Maximum total size of cached content in bytes
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "accessed REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed)"
+            )
+            row = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()
+            self._size = row[0]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT value FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE pages SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT size FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._size -= row[0]
+            self._connection.execute(
+                "INSERT OR REPLACE INTO pages (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._size += size
+
+            # Evict least recently used entries until we are within budget
+            while self._size > self.max_bytes:
+                oldest = self._connection.execute(
+                    "SELECT key, size FROM pages ORDER BY accessed LIMIT 1"
+                ).fetchone()
+                if oldest is None:
+                    break
+                self._connection.execute("DELETE FROM pages WHERE key = ?", (oldest[0],))
+                self._size -= oldest[1]
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,300 @@
+"""
+Command line interface.
+
+    morpher-pdf convert report.pdf -o report.md --pages 40-55
+    morpher-pdf serve [--socket /tmp/morpher.sock]
+
+``serve`` keeps a warm worker running: the converters are imported and the
+LLM clients connected once, then conversion jobs are read as JSON lines
+from stdin (answers go to stdout) or from connections to a Unix socket.
+A job looks like
+
+    {"id": 1, "input": "report.pdf", "output": "report.md", "pages": "40-55"}
+
+and is answered with
+
+    {"id": 1, "ok": true, "output": "report.md", "failed_pages": [], "seconds": 12.3}
+
+Without "output" the converted content is returned in the "content" field.
+Jobs may also set "format", "sections", "llm_type" (one type or a list to
+hedge between), "api_key", "route" (true, or LLM types by page class),
+"api_keys" (by LLM type, for routed pages) and "options", the latter
+holding further converter arguments. Routed jobs report the number of
+pages per class in "routing".
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import socketserver
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    "markdown": ("morpher_pdf.converters.markdown", "MarkdownConverter"),
+    "latex": ("morpher_pdf.converters.latex", "LaTeXConverter"),
+}
+API_KEY_VARIABLE = "MORPHER_PDF_API_KEY"
+
+
+def parse_pages(spec: str) -> List[int]:
+    """
+    Parse a page selection such as "1-3,7" into 0-based page numbers.
+
+    Pages are 1-based, as shown by PDF viewers.
+
+    Raises:
+        ValueError: If the selection is malformed
+    """
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        start, stop = int(first), int(last or first)
+        if start < 1 or stop < start:
+            raise ValueError(f"Invalid page range: {part}")
+        pages.update(range(start - 1, stop))
+    return sorted(pages)
+
+
+def parse_llm_type(value):
+    """LLM type of a job or option, several comma separated types are hedged between"""
+    if isinstance(value, str) and "," in value:
+        return [part.strip() for part in value.split(",") if part.strip()]
+    return value
+
+
+def converter_class(output_format: str):
+    """Converter class of an output format, imported on first use"""
+    import importlib
+
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown format: {output_format}")
+    module, name = FORMATS[output_format]
+    return getattr(importlib.import_module(module), name)
+
+
+def run_job(job: Dict[str, Any], defaults: argparse.Namespace) -> Dict[str, Any]:
+    """Convert the document of a job, returning the answer; errors are reported, not raised"""
+    from .converters.routing import ModelRouter, summarize_routing
+    from .converters.sinks import DirectoryImageSink
+
+    start = time.perf_counter()
+    answer: Dict[str, Any] = {"id": job.get("id")}
+    try:
+        kwargs = dict(job.get("options") or {})
+        if job.get("pages"):
+            pages = job["pages"]
+            kwargs["pages"] = parse_pages(pages) if isinstance(pages, str) else [page - 1 for page in pages]
+        if job.get("sections"):
+            kwargs["sections"] = job["sections"]
+        route = job.get("route", defaults.route)
+        if route:
+            kwargs["router"] = ModelRouter(route if isinstance(route, dict) else None,
+                                           api_keys=job.get("api_keys") or defaults.route_api_keys)
+        kwargs.setdefault("region_tiling", defaults.region_tiling)
+        kwargs.setdefault("max_workers", defaults.workers)
+        kwargs.setdefault("render_workers", defaults.render_workers)
+
+        output = job.get("output")
+        image_sink = None
+        if output:
+            # Images go next to the output and are linked relative to it
+            stem = os.path.splitext(os.path.basename(output))[0]
+            image_sink = DirectoryImageSink(os.path.join(os.path.dirname(output), f"{stem}_images"),
+                                            base_url=f"{stem}_images/")
+            kwargs["image_sink"] = image_sink
+
+        converter = converter_class(job.get("format") or defaults.format)(
+            job["input"],
+            job.get("api_key") or defaults.api_key,
+            llm_type=parse_llm_type(job.get("llm_type") or defaults.llm_type),
+            **kwargs,
+        )
+        content, images = converter.convert()
+        content = content or ""
+
+        if output:
+            with open(output + ".tmp", "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(output + ".tmp", output)
+            answer["output"] = output
+        else:
+            answer["content"] = content
+        answer.update(ok=not converter.failed_pages, images=images or [],
+                      failed_pages=[page + 1 for page in converter.failed_pages])
+        if converter.router is not None:
+            answer["routing"] = summarize_routing(converter.routing_decisions.values())
+    except Exception as e:
+        logger.error("Job %s failed: %s", answer["id"], e, exc_info=logger.isEnabledFor(logging.DEBUG))
+        answer.update(ok=False, error=f"{type(e).__name__}: {e}")
+    answer["seconds"] = round(time.perf_counter() - start, 3)
+    return answer
+
+
+def _parse_job(line: str) -> Optional[Dict[str, Any]]:
+    line = line.strip()
+    if not line:
+        return None
+    job = json.loads(line)
+    if not isinstance(job, dict) or "input" not in job:
+        raise ValueError('A job is a JSON object with at least an "input" path')
+    return job
+
+
+def _answer_line(line: str, defaults: argparse.Namespace) -> Optional[str]:
+    try:
+        job = _parse_job(line)
+    except ValueError as e:
+        return json.dumps({"id": None, "ok": False, "error": f"Invalid job: {e}"})
+    if job is None:
+        return None
+    return json.dumps(run_job(job, defaults))
+
+
+def serve_stdin(defaults: argparse.Namespace) -> None:
+    """Answer jobs read from stdin on stdout, running up to --jobs at a time"""
+    lock = threading.Lock()
+
+    def handle(line: str) -> None:
+        answer = _answer_line(line, defaults)
+        if answer is not None:
+            with lock:
+                sys.stdout.write(answer + "\n")
+                sys.stdout.flush()
+
+    with ThreadPoolExecutor(max_workers=defaults.jobs, thread_name_prefix="morpher-job") as executor:
+        for line in sys.stdin:
+            executor.submit(handle, line)
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    """Answers the jobs of one connection in order"""
+
+    def handle(self) -> None:
+        for raw_line in self.rfile:
+            answer = _answer_line(raw_line.decode("utf-8"), self.server.defaults)
+            if answer is not None:
+                self.wfile.write(answer.encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+
+def serve_socket(path: str, defaults: argparse.Namespace) -> None:
+    """Answer jobs from connections to a Unix socket, one thread per connection"""
+    if os.path.exists(path):
+        # Left behind by a worker that did not shut down cleanly
+        os.remove(path)
+    server = socketserver.ThreadingUnixStreamServer(path, _JobHandler)
+    server.daemon_threads = True
+    server.defaults = defaults
+    os.chmod(path, 0o600)
+    logger.info("Listening on %s", path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+def warm_up(defaults: argparse.Namespace) -> None:
+    """Import the converters and connect the LLM client before the first job arrives"""
+    from .converters import DEFAULT_MAX_CONCURRENCY
+    from .llm.factory import LLMFactory
+
+    start = time.perf_counter()
+    converter_class(defaults.format)
+    if defaults.api_key:
+        try:
+            # Sized like the converters of the jobs, which get this very client
+            LLMFactory.get_client(parse_llm_type(defaults.llm_type), defaults.api_key,
+                                  max_connections=max(defaults.workers, DEFAULT_MAX_CONCURRENCY))
+        except Exception as e:
+            logger.warning("Could not set up the %s client: %s", defaults.llm_type, e)
+    logger.info("Worker ready in %.2fs", time.perf_counter() - start)
+
+
+def _add_common_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--format", choices=sorted(FORMATS), default="markdown")
+    parser.add_argument("--llm-type", default="gpt4-vision",
+                        help="LLM type, or comma separated types to hedge slow requests and fail over between")
+    parser.add_argument("--api-key", default=os.environ.get(API_KEY_VARIABLE),
+                        help=f"API key of the LLM service (default: ${API_KEY_VARIABLE})")
+    parser.add_argument("--route", action="store_true",
+                        help="Send simple pages to gemini-flash-1 and complex ones to gpt4-vision, skip blank pages; "
+                             "routes to another provider than --llm-type need a --route-api-key")
+    parser.add_argument("--route-api-key", action="append", dest="route_api_keys", metavar="TYPE=KEY",
+                        help="API key of a routed LLM type, may be repeated")
+    parser.add_argument("--region-tiling", action="store_true",
+                        help="Split dense pages into column, table and formula regions converted in parallel")
+    parser.add_argument("--workers", type=int, default=10, help="Pages converted in parallel")
+    parser.add_argument("--render-workers", type=int, default=1, help="Processes rendering pages")
+    parser.add_argument("--log-level", default="warning")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="morpher-pdf", description="Convert PDF documents with vision LLMs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="Convert a document")
+    convert.add_argument("input", help="PDF document")
+    convert.add_argument("-o", "--output", help="Output file (default: print to stdout)")
+    convert.add_argument("--pages", help='Pages to convert, e.g. "40-55" or "1,3-5" (1-based)')
+    convert.add_argument("--section", action="append", dest="sections", metavar="TITLE",
+                         help="Table of contents section to convert, may be repeated")
+    _add_common_arguments(convert)
+
+    serve = commands.add_parser("serve", help="Run a warm worker answering JSON line jobs")
+    serve.add_argument("--socket", help="Unix socket to listen on (default: stdin and stdout)")
+    serve.add_argument("--jobs", type=int, default=2, help="Jobs run at a time when reading stdin")
+    _add_common_arguments(serve)
+
+    args = parser.parse_args(argv)
+    # Logs go to stderr, stdout carries the converted content or the answers
+    logging.basicConfig(level=args.log_level.upper(), stream=sys.stderr)
+    if not args.api_key:
+        parser.error(f"An API key is required, pass --api-key or set ${API_KEY_VARIABLE}")
+    try:
+        args.route_api_keys = dict(item.split("=", 1) for item in args.route_api_keys or ())
+    except ValueError:
+        parser.error("--route-api-key takes TYPE=KEY")
+
+    if args.command == "convert":
+        if args.pages:
+            try:
+                parse_pages(args.pages)
+            except ValueError as e:
+                parser.error(str(e))
+        answer = run_job({"input": args.input, "output": args.output, "pages": args.pages,
+                          "sections": args.sections}, args)
+        if "error" in answer:
+            print(answer["error"], file=sys.stderr)
+            return 1
+        if not args.output:
+            sys.stdout.write(answer["content"] + "\n")
+        if "routing" in answer:
+            print(f"Routing: {json.dumps(answer['routing'])}", file=sys.stderr)
+        if answer["failed_pages"]:
+            print(f"Failed pages: {answer['failed_pages']}", file=sys.stderr)
+            return 2
+        return 0
+
+    warm_up(args)
+    try:
+        if args.socket:
+            serve_socket(args.socket, args)
+        else:
+            serve_stdin(args)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
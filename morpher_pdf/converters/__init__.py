@@ -1,65 +1,543 @@
 from abc import ABC, abstractmethod
+import asyncio
 import base64
-from typing import Dict, List, Tuple, Union, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, Union, Optional
+import math
+import mmap
+import multiprocessing
 import os
 from pathlib import Path
 import fitz  # PyMuPDF
 import hashlib
-import math
-import numpy as np
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import logging
+import queue
 import re
+import tempfile
+import threading
+
+from ..cache import BasePageCache
+from ..llm.clients import BaseLLMClient
+from ..llm.factory import LLMFactory, RateLimits
+from ..llm.prompts import region_prompt
+from ..stats import ConversionStats, StatsSink
+from .imagestore import ImageStore
+from .layout import Region, tile_page
+from .manifest import ConversionManifest, page_fingerprint
+from .render import RenderOptions, render_page
+from .routing import ModelRouter, RoutingDecision
+from .scheduler import PageScheduler
+from .selection import select_pages
+from .sinks import ImageSink
+from .textlayer import analyze_page, page_to_markdown
+from .triage import is_tiny, triage_image
+
+logger = logging.getLogger(__name__)
 
-from openai import OpenAI
+# Routing decision of the page the current thread or task is sending to the LLM
+_page_route: ContextVar[Optional[RoutingDecision]] = ContextVar("morpher_page_route", default=None)
+
+# PyMuPDF is not thread-safe, not even for different documents. Converters
+# running side by side, e.g. in a BatchConverter, take turns on it; the
+# LLM requests, where they spend their time, still run in parallel.
+FITZ_LOCK = threading.RLock()
+
+# Pages in flight in aconvert() unless the caller asks for another number
+DEFAULT_MAX_CONCURRENCY = 10
+
+@contextmanager
+def open_document(source: Union[str, Path, bytes, mmap.mmap, fitz.Document],
+                  stats: Optional[ConversionStats] = None) -> Iterator[fitz.Document]:
+    """
+    Open a document given in any form the converters accept.
+    
+    Documents opened by the caller are left open, the others are closed
+    on leaving the block.
+    
+    Args:
+        source (Union[str, Path, bytes, mmap.mmap, fitz.Document]): Path to the document,
+            its content as bytes or a memory-mapped file, or an already open document
+        stats (Optional[ConversionStats]): Stats the opening time is recorded in
+    """
+    if isinstance(source, fitz.Document):
+        yield source
+        return
+    
+    if isinstance(source, mmap.mmap):
+        source = memoryview(source)
+    with stats.stage("open") if stats is not None else nullcontext(), FITZ_LOCK:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            pdf_document = fitz.open(stream=source, filetype="pdf")
+        else:
+            pdf_document = fitz.open(source)
+    
+    try:
+        yield pdf_document
+    finally:
+        with FITZ_LOCK:
+            pdf_document.close()
 
-from llm.factory import LLMFactory
+class PageJob:
+    """A page on its way through the conversion pipeline"""
+    __slots__ = ("page_num", "image", "content", "fingerprint", "reused", "route", "regions")
+    
+    def __init__(self,
+                 page_num: int,
+                 image: Optional[bytes] = None,
+                 content: Optional[str] = None,
+                 fingerprint: Optional[str] = None,
+                 reused: bool = False,
+                 route: Optional[RoutingDecision] = None,
+                 regions: Optional[List[Tuple[str, bytes]]] = None):
+        """
+        Args:
+            page_num (int): Zero-based page number
+            image (Optional[bytes]): Rendered page to send to the LLM
+            content (Optional[str]): Page content when no LLM call is needed
+            fingerprint (Optional[str]): Content fingerprint of the page in incremental mode
+            reused (bool): Page is unchanged since the previous conversion
+            route (Optional[RoutingDecision]): Model the page is sent to, when pages are routed
+            regions (Optional[List[Tuple[str, bytes]]]): Kind and render of every region of a
+                tiled page in reading order, sent instead of image
+        """
+        self.page_num = page_num
+        self.image = image
+        self.content = content
+        self.fingerprint = fingerprint
+        self.reused = reused
+        self.route = route
+        self.regions = regions
+    
+    @property
+    def cost(self) -> int:
+        """Size of the renders sent to the LLM; a tiled page takes as long as its largest region"""
+        if self.regions is not None:
+            return max(len(image) for _, image in self.regions)
+        return len(self.image) if self.image else 0
 
 class BaseConverter(ABC):
+    # Prompt the pages are sent with; part of the page cache key
+    prompt: str = ""
+    # File extension of the converted document
+    output_extension: str = ".txt"
+    # Tag of the LLM response holding the page content
+    output_tag: str = "task_two"
+    
     def __init__(self, 
-                 doc_path: str, 
+                 doc_path: Union[str, Path, bytes, mmap.mmap, fitz.Document], 
                  api_key: str, 
-                 llm_type: str = "gpt4-vision",
+                 llm_type: Union[str, List[str]] = "gpt4-vision",
                  chunk_size: int = 10, 
-                 max_chunks: int = 10):
+                 max_chunks: int = 10,
+                 prefetch_pages: int = 4,
+                 cache: Optional[BasePageCache] = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 max_workers: Optional[int] = None,
+                 prioritize_short_pages: bool = False,
+                 render_workers: int = 1,
+                 render_options: Optional[RenderOptions] = None,
+                 text_layer_fast_path: bool = False,
+                 dedupe_similar_images: bool = False,
+                 incremental_dir: Optional[str] = None,
+                 llm_client: Optional[BaseLLMClient] = None,
+                 scheduler: Optional[PageScheduler] = None,
+                 pages_per_request: int = 1,
+                 on_page_delta: Optional[Callable[[int, str], None]] = None,
+                 stats_sinks: Optional[List[StatsSink]] = None,
+                 image_sink: Optional[ImageSink] = None,
+                 pages: Optional[Iterable[int]] = None,
+                 sections: Optional[Iterable[str]] = None,
+                 router: Optional[ModelRouter] = None,
+                 region_tiling: bool = False,
+                 rate_limit: Optional[RateLimits] = None):
         """
         Initialize the converter.
         
         Args:
-            doc_path (str): Path to the document
+            doc_path (Union[str, Path, bytes, mmap.mmap, fitz.Document]): Path to the document,
+                its content as bytes or a memory-mapped file, or an already open document
             api_key (str): API key for the LLM service
-            llm_type (str): Type of LLM to use (default: "gpt4-vision")
-            chunk_size (int): Number of pages per chunk
-            max_chunks (int): Maximum number of chunks to process
+            llm_type (Union[str, List[str]]): Type of LLM to use (default: "gpt4-vision"); with
+                several types, slow requests are hedged and failed ones fail over to the next type
+            chunk_size (int): Number of pages each worker may have queued ahead
+            max_chunks (int): Default number of worker threads
+            prefetch_pages (int): Number of rendered pages buffered ahead of the LLM workers
+            cache (Optional[BasePageCache]): Cache for processed page content
+            max_concurrency (int): Maximum number of pages in flight in aconvert()
+            max_workers (Optional[int]): Number of worker threads (default: max_chunks)
+            prioritize_short_pages (bool): Send pages with smaller renders to the LLM first
+            render_workers (int): Number of processes rendering pages and extracting images
+            render_options (Optional[RenderOptions]): Resolution and encoding of the page renders
+            text_layer_fast_path (bool): Convert plain prose pages from their text layer without the LLM
+            dedupe_similar_images (bool): Also merge near-identical figures by perceptual hash
+            incremental_dir (Optional[str]): Directory of the page manifest used to only
+                re-convert pages that changed since the previous conversion
+            llm_client (Optional[BaseLLMClient]): Client to use (default: the client
+                LLMFactory shares between converters of llm_type and api_key)
+            scheduler (Optional[PageScheduler]): Scheduler shared with other converters;
+                it is not shut down when the conversion finishes
+            pages_per_request (int): Number of consecutive pages sent to the LLM in one request
+            on_page_delta (Optional[Callable[[int, str], None]]): Called with the page number and
+                each new piece of content while a page is streamed from the LLM; called from
+                worker threads, and only for pages sent on their own
+            stats_sinks (Optional[List[StatsSink]]): Receive the stats of every finished run
+            image_sink (Optional[ImageSink]): Destination images are written to as soon as they
+                are extracted, instead of being kept in memory; links in the converted
+                document point at it. The caller closes the sink.
+            pages (Optional[Iterable[int]]): 0-based numbers of the pages to convert,
+                e.g. ``range(39, 55)`` (default: all pages)
+            sections (Optional[Iterable[str]]): Titles of table of contents sections to
+                convert, in addition to ``pages``
+            router (Optional[ModelRouter]): Picks the LLM of every page from a local
+                classification and skips blank pages (default: all pages go to llm_type)
+            region_tiling (bool): Cut dense pages into column, table, figure and formula
+                regions, each rendered at a resolution sized for it and sent to the LLM in
+                parallel, so a page takes as long as its largest region
+            rate_limit (Optional[RateLimits]): Budget of the provider as (requests per minute,
+                tokens per minute), or budgets by LLM type such as llm.factory.RATE_LIMITS;
+                shared by all converters with the same key (default: requests are not throttled)
         """
         self.doc_path = doc_path
         self.api_key = api_key
         self.llm_type = llm_type
         self.chunk_size = chunk_size
         self.max_chunks = max_chunks
-        self.images_by_page: Dict[int, List[Tuple[str, bytes]]] = {}
+        self.prefetch_pages = max(1, prefetch_pages)
+        self.cache = cache
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_workers = max(1, max_workers or max_chunks)
+        self.prioritize_short_pages = prioritize_short_pages
+        self.render_workers = max(1, render_workers)
+        self.render_options = render_options or RenderOptions()
+        self.render_stats: Dict[int, Dict[str, float]] = {}
+        self.text_layer_fast_path = text_layer_fast_path
+        self.dedupe_similar_images = dedupe_similar_images
+        self.image_sink = image_sink
+        self.pages = list(pages) if pages is not None else None
+        self.sections = list(sections) if sections is not None else None
+        self.image_store = self._new_image_store()
+        self.incremental_dir = incremental_dir
+        self._manifest: Optional[ConversionManifest] = None
+        self._reusable: set = set()
+        self._fingerprints: Dict[int, str] = {}
+        self._failed_pages: set = set()
         self.page_contents: List[str] = []
-        self.llm_client = LLMFactory.create_client(llm_type, api_key)
+        self.page_numbers: List[int] = []
+        self.scheduler = scheduler
+        self.pages_per_request = max(1, pages_per_request)
+        self.on_page_delta = on_page_delta
+        self.stats_sinks = list(stats_sinks or [])
+        self.stats = ConversionStats()
+        # Converters with the same settings share one client and its open connections
+        self.rate_limit = rate_limit
+        self.llm_client = llm_client or LLMFactory.get_client(
+            llm_type, api_key, max_connections=max(self.max_workers, self.max_concurrency), rate_limit=rate_limit)
+        self.region_tiling = region_tiling
+        self.router = router
+        self.routing_decisions: Dict[int, RoutingDecision] = {}
+        self._route_clients: Dict[str, BaseLLMClient] = {}
+        for page_class, route_type in (router.routes.items() if router is not None else ()):
+            self._route_clients[page_class] = LLMFactory.get_client(
+                route_type, router.api_key(route_type, api_key, llm_type),
+                max_connections=max(self.max_workers, self.max_concurrency), rate_limit=rate_limit)
+    
+    @property
+    def llm_client(self) -> BaseLLMClient:
+        """Client of the page being converted: the client of its route, if it was routed"""
+        route = _page_route.get()
+        if route is not None and route.page_class in self._route_clients:
+            return self._route_clients[route.page_class]
+        return self._llm_client
+    
+    @llm_client.setter
+    def llm_client(self, client: BaseLLMClient) -> None:
+        self._llm_client = client
+    
+    @contextmanager
+    def _routed(self, job: "PageJob") -> Iterator[None]:
+        """Send the LLM requests made in the block to the model the job was routed to"""
+        if job.route is None:
+            yield
+            return
+        token = _page_route.set(job.route)
+        try:
+            yield
+        finally:
+            _page_route.reset(token)
+    
+    def _page_llm_type(self) -> Union[str, List[str]]:
+        """LLM type the page being converted is sent to, part of its cache key"""
+        route = _page_route.get()
+        if route is not None and route.llm_type is not None:
+            return route.llm_type
+        return self.llm_type
+        
+    @property
+    def images_by_page(self) -> Dict[int, List[Tuple[str, Optional[bytes]]]]:
+        """Extracted images of every page as (name, bytes) pairs, bytes are None with an image sink"""
+        return {page_num: self.image_store.page_images(page_num)
+                for page_num in sorted(self.image_store.pages)}
+    
+    @property
+    def failed_pages(self) -> List[int]:
+        """Pages of the last conversion that failed and were left empty"""
+        return sorted(self._failed_pages)
+    
+    def _new_image_store(self) -> ImageStore:
+        return ImageStore(perceptual_threshold=4 if self.dedupe_similar_images else None,
+                          sink=self.image_sink)
+    
+    def convert(self, return_stats: bool = False) -> Union[Tuple[str, List[str]], Tuple[str, List[str], ConversionStats]]:
+        """
+        Main conversion pipeline.
+        
+        Args:
+            return_stats (bool): Also return the ConversionStats of the run
+                (they are always available as ``self.stats``)
+        """
+        self._start_run()
+        
+        # Stream pages through the LLM and collect the results in page order
+        results = list(self._convert_pages())
+        self.page_numbers = [page_num for page_num, _ in results]
+        self.page_contents = [content for _, content in results]
         
-    def convert(self) -> Tuple[str, List[str]]:
-        """Main conversion pipeline"""
-        # Load PDF and extract images
-        self._extract_images()
+        with self.stats.stage("merge"):
+            # Merge all images into a single array
+            all_images = self._merge_images()
+            
+            # Merge all text content
+            final_text = self._merge_content()
+        
+        self._finish_run()
+        if return_stats:
+            return final_text, all_images, self.stats
+        return final_text, all_images
+    
+    def convert_iter(self) -> Iterator[Tuple[int, str]]:
+        """
+        Convert the document page by page, yielding results in page order.
         
-        # Convert PDF pages to images
-        page_images = self._pdf_to_images()
+        Pages are traversed once by a background thread, which extracts
+        their images and renders them into a bounded queue. They are
+        scheduled individually on ``max_workers`` worker threads. At most
+        ``prefetch_pages`` rendered pages wait in the queue and at most
+        ``max_workers * chunk_size`` pages are in flight, so memory stays
+        flat regardless of the document length. With ``pages_per_request``
+        above one, consecutive pages are grouped into a single LLM request.
         
-        # Split pages into chunks for parallel processing
-        chunks = self._split_pages(page_images)
+        Yields:
+            Tuple[int, str]: Page number and processed content of that page
+        """
+        self._start_run()
+        yield from self._convert_pages()
+        self._finish_run()
+    
+    def _start_run(self) -> None:
+        self.stats = ConversionStats()
+        self.routing_decisions = {}
+    
+    def _finish_run(self) -> None:
+        """Complete the stats of a run and hand them to the sinks"""
+        self.stats.increment("failed_pages", len(self._failed_pages))
+        self.stats.increment("images", len(self.image_store))
+        self.stats.finish()
         
-        # Process chunks in parallel
-        self.page_contents = self._process_chunks_parallel(chunks)
+        labels = {"converter": type(self).__name__, "document": self._document_label()}
+        for sink in self.stats_sinks:
+            try:
+                sink.emit(self.stats, labels)
+            except Exception:
+                logger.exception("Stats sink %r failed", sink)
+    
+    def _document_label(self) -> str:
+        if isinstance(self.doc_path, (str, Path)):
+            return str(self.doc_path)
+        if isinstance(self.doc_path, fitz.Document) and self.doc_path.name:
+            return self.doc_path.name
+        return "<memory>"
+    
+    def _with_stats(self, func: Callable) -> Callable:
+        """Run func with the stats of the current run active, so LLM clients record into them"""
+        stats = self.stats
         
-        # Merge all images into a single array
-        all_images = self._merge_images()
+        def run(*args):
+            with stats.activate():
+                return func(*args)
         
-        # Merge all text content
-        final_text = self._merge_content()
+        return run
+    
+    def _convert_pages(self) -> Iterator[Tuple[int, str]]:
+        """Pipeline of convert_iter(), without starting or finishing the run"""
+        pages = self._prefetch(self._iter_page_jobs())
+        contents = {}
+        try:
+            with self._page_scheduler() as scheduler:
+                for results in scheduler.map(
+                    self._with_stats(self._process_group_safe),
+                    self._group_jobs(pages),
+                    # The size of the rendered pages is a cheap proxy for their density
+                    cost=lambda group: sum(job.cost for job in group),
+                    max_pending=max(1, self.max_workers * self.chunk_size // self.pages_per_request),
+                ):
+                    for page_num, content in results:
+                        self.stats.increment("pages")
+                        if self.incremental_dir is not None:
+                            contents[page_num] = content
+                        yield page_num, content
+        finally:
+            pages.close()
         
+        self._save_manifest(contents)
+    
+    @contextmanager
+    def _page_scheduler(self) -> Iterator[PageScheduler]:
+        """Shared scheduler if one was given, otherwise a private one for this run"""
+        if self.scheduler is not None:
+            yield self.scheduler
+            return
+        with PageScheduler(self.max_workers, self.prioritize_short_pages) as scheduler:
+            yield scheduler
+    
+    def _group_jobs(self, jobs: Iterator["PageJob"]) -> Iterator[List["PageJob"]]:
+        """
+        Group consecutive page jobs so that each group holds at most
+        ``pages_per_request`` pages that need the LLM, all routed to the same model.
+        """
+        group = []
+        llm_pages = 0
+        group_class = None
+        for job in jobs:
+            if job.regions is not None:
+                # Tiled pages already make several requests of their own
+                if group:
+                    yield group
+                    group = []
+                    llm_pages = 0
+                yield [job]
+                continue
+            page_class = job.route.page_class if job.route is not None else None
+            if job.content is None and llm_pages and page_class != group_class:
+                # Pages routed to different models cannot share a request
+                yield group
+                group = []
+                llm_pages = 0
+            group.append(job)
+            if job.content is None:
+                llm_pages += 1
+                group_class = page_class
+            # Pages converted locally are not held back waiting for a full group
+            if llm_pages >= self.pages_per_request or llm_pages == 0:
+                yield group
+                group = []
+                llm_pages = 0
+        if group:
+            yield group
+    
+    def _prefetch(self, items: Iterator) -> Iterator:
+        """
+        Run a generator on a background thread, buffering up to
+        ``prefetch_pages`` of its items in a bounded queue.
+        """
+        item_queue: queue.Queue = queue.Queue(maxsize=self.prefetch_pages)
+        stop = threading.Event()
+        done = object()
+        
+        def put(item) -> bool:
+            # Block until there is room in the queue or the consumer went away
+            while not stop.is_set():
+                try:
+                    item_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produce():
+            try:
+                for item in items:
+                    if not put(item):
+                        return
+            except Exception as e:
+                put(e)
+            finally:
+                put(done)
+        
+        producer = threading.Thread(target=produce, name="morpher-render", daemon=True)
+        producer.start()
+        
+        try:
+            while True:
+                item = item_queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+                del item
+        finally:
+            stop.set()
+            producer.join()
+    
+    async def aconvert(self) -> Tuple[str, List[str]]:
+        """
+        Asynchronous conversion pipeline.
+        
+        Every page (or group of ``pages_per_request`` pages) runs as its own
+        task on the event loop. A semaphore of ``max_concurrency`` bounds
+        both the requests in flight and the pages rendered ahead of them, so
+        many documents can be converted concurrently on a single loop.
+        """
+        self._start_run()
+        with self.stats.activate():
+            return await self._aconvert()
+    
+    async def _aconvert(self) -> Tuple[str, List[str]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def process(group: List[PageJob]) -> List[Tuple[int, str]]:
+            try:
+                return await self._aprocess_group_safe(group)
+            finally:
+                semaphore.release()
+        
+        pages = self._iter_page_jobs()
+        groups = self._group_jobs(pages)
+        tasks = []
+        try:
+            while True:
+                await semaphore.acquire()
+                # Rendering and extraction are CPU bound, keep them off the event loop
+                group = await asyncio.to_thread(next, groups, None)
+                if group is None:
+                    semaphore.release()
+                    break
+                tasks.append(asyncio.create_task(process(group)))
+            
+            results = [result for results in await asyncio.gather(*tasks) for result in results]
+            self.page_numbers = [page_num for page_num, _ in results]
+            self.page_contents = [content for _, content in results]
+            self.stats.increment("pages", len(self.page_contents))
+            self._save_manifest(dict(results))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            groups.close()
+            pages.close()
+        
+        with self.stats.stage("merge"):
+            # Merge all images into a single array
+            all_images = self._merge_images()
+            
+            # Merge all text content
+            final_text = self._merge_content()
+        
+        self._finish_run()
         return final_text, all_images
     
     @abstractmethod
@@ -67,117 +545,434 @@ class BaseConverter(ABC):
         """Process a single page using LLM"""
         pass
     
+    async def _aprocess_page(self, page: bytes) -> str:
+        """Asynchronously process a single page using LLM"""
+        # Converters without a native async implementation run in a thread
+        return await asyncio.to_thread(self._process_page, page)
+    
+    def _stream_page(self, page: bytes, on_delta: Callable[[str], None]) -> Optional[str]:
+        """Process a single page, passing its content to on_delta as it arrives"""
+        # Converters without streaming report the page once it is complete
+        content = self._process_page(page)
+        if content:
+            on_delta(content)
+        return content
+    
+    async def _astream_page(self, page: bytes, on_delta: Callable[[str], None]) -> Optional[str]:
+        """Asynchronously process a single page, passing its content to on_delta as it arrives"""
+        content = await self._aprocess_page(page)
+        if content:
+            on_delta(content)
+        return content
+    
+    def _request_page(self, page: bytes, page_num: Optional[int] = None) -> Optional[str]:
+        """Send a page to the LLM, streaming it to on_page_delta when set"""
+        if self.on_page_delta is None or page_num is None:
+            return self._process_page(page)
+        return self._stream_page(page, lambda delta: self.on_page_delta(page_num, delta))
+    
+    async def _arequest_page(self, page: bytes, page_num: Optional[int] = None) -> Optional[str]:
+        """Asynchronously send a page to the LLM, streaming it to on_page_delta when set"""
+        if self.on_page_delta is None or page_num is None:
+            return await self._aprocess_page(page)
+        return await self._astream_page(page, lambda delta: self.on_page_delta(page_num, delta))
+    
+    def _process_pages(self, pages: List[bytes]) -> List[Optional[str]]:
+        """Process several pages, in a single LLM request where the converter supports it"""
+        return [self._process_page(page) for page in pages]
+    
+    async def _aprocess_pages(self, pages: List[bytes]) -> List[Optional[str]]:
+        """Asynchronously process several pages, in a single LLM request where supported"""
+        return list(await asyncio.gather(*(self._aprocess_page(page) for page in pages)))
+    
+    def _process_page_cached(self, page: bytes, page_num: Optional[int] = None) -> str:
+        """Process a single page, serving repeated pages from the cache"""
+        if self.cache is None:
+            return self._request_page(page, page_num)
+        
+        key = self.cache.make_key(page, self._page_llm_type(), self.prompt)
+        content = self.cache.get(key)
+        if content is not None:
+            self.stats.increment("cache_hits")
+            return content
+        
+        self.stats.increment("cache_misses")
+        content = self._request_page(page, page_num)
+        # Only successful results are cached so failed pages are retried next time
+        if content is not None:
+            self.cache.set(key, content)
+        return content
+    
+    def _region_prompt(self, kind: str) -> str:
+        """Prompt the regions of a kind are sent with; part of their cache key"""
+        return region_prompt(self.prompt, kind)
+    
+    def _process_region(self, image: bytes, kind: str) -> Optional[str]:
+        """Process a region of a tiled page using LLM"""
+        # Converters without a region prompt treat it like a page
+        return self._process_page(image)
+    
+    async def _aprocess_region(self, image: bytes, kind: str) -> Optional[str]:
+        """Asynchronously process a region of a tiled page using LLM"""
+        return await asyncio.to_thread(self._process_region, image, kind)
+    
+    def _process_region_cached(self, image: bytes, kind: str) -> Optional[str]:
+        """Process a region of a tiled page, serving repeated regions from the cache"""
+        if self.cache is None:
+            return self._process_region(image, kind)
+        
+        key = self.cache.make_key(image, self._page_llm_type(), self._region_prompt(kind))
+        content = self.cache.get(key)
+        if content is not None:
+            self.stats.increment("cache_hits")
+            return content
+        
+        self.stats.increment("cache_misses")
+        content = self._process_region(image, kind)
+        if content is not None:
+            self.cache.set(key, content)
+        return content
+    
+    async def _aprocess_region_cached(self, image: bytes, kind: str) -> Optional[str]:
+        """Asynchronously process a region of a tiled page, serving repeated regions from the cache"""
+        if self.cache is None:
+            return await self._aprocess_region(image, kind)
+        
+        key = self.cache.make_key(image, self._page_llm_type(), self._region_prompt(kind))
+        content = self.cache.get(key)
+        if content is not None:
+            self.stats.increment("cache_hits")
+            return content
+        
+        self.stats.increment("cache_misses")
+        content = await self._aprocess_region(image, kind)
+        if content is not None:
+            self.cache.set(key, content)
+        return content
+    
+    def _process_regions(self, job: "PageJob") -> Optional[str]:
+        """Send the regions of a tiled page to the LLM in parallel and join them in reading order"""
+        with ThreadPoolExecutor(max_workers=len(job.regions), thread_name_prefix="morpher-region") as executor:
+            # Each request runs with the stats and route of the page
+            futures = [executor.submit(copy_context().run, self._process_region_cached, image, kind)
+                       for kind, image in job.regions]
+            return self._join_regions(job, [future.result() for future in futures])
+    
+    async def _aprocess_regions(self, job: "PageJob") -> Optional[str]:
+        """Asynchronously send the regions of a tiled page to the LLM and join them in reading order"""
+        contents = await asyncio.gather(*(self._aprocess_region_cached(image, kind) for kind, image in job.regions))
+        return self._join_regions(job, contents)
+    
+    def _join_regions(self, job: "PageJob", contents: List[Optional[str]]) -> Optional[str]:
+        """Content of a tiled page from the content of its regions, None if any of them failed"""
+        if any(content is None for content in contents):
+            # Regions that succeeded are cached, so a retry only repeats the failed ones
+            return None
+        content = "\n\n".join(content for content in contents if content)
+        if self.on_page_delta is not None and content:
+            # Regions finish out of order, the page is reported once it is complete
+            self.on_page_delta(job.page_num, content)
+        return content
+    
+    def _process_page_safe(self, job: "PageJob") -> Tuple[int, str]:
+        """Process a page job, replacing a failed page with empty content"""
+        if job.content is not None:
+            return job.page_num, job.content
+        try:
+            with self._routed(job):
+                if job.regions is not None:
+                    content = self._process_regions(job)
+                else:
+                    content = self._process_page_cached(job.image, job.page_num)
+            if content is None:
+                self._failed_pages.add(job.page_num)
+                return job.page_num, ""
+            return job.page_num, content
+        except Exception as e:
+            logger.error("Error processing page %s: %s", job.page_num, e)
+            self._failed_pages.add(job.page_num)
+            return job.page_num, ""
+    
+    def _process_pages_cached(self, pages: List[bytes]) -> List[Optional[str]]:
+        """Process several pages, sending only the pages missing from the cache to the LLM"""
+        contents, keys, missing = self._cached_pages(pages)
+        if len(missing) == 1:
+            contents[missing[0]] = self._process_page(pages[missing[0]])
+        elif missing:
+            for i, content in zip(missing, self._process_pages([pages[i] for i in missing])):
+                contents[i] = content
+        self._cache_pages(contents, keys, missing)
+        return contents
+    
+    async def _aprocess_pages_cached(self, pages: List[bytes]) -> List[Optional[str]]:
+        """Asynchronously process several pages, sending only cache misses to the LLM"""
+        contents, keys, missing = self._cached_pages(pages)
+        if len(missing) == 1:
+            contents[missing[0]] = await self._aprocess_page(pages[missing[0]])
+        elif missing:
+            for i, content in zip(missing, await self._aprocess_pages([pages[i] for i in missing])):
+                contents[i] = content
+        self._cache_pages(contents, keys, missing)
+        return contents
+    
+    def _cached_pages(self, pages: List[bytes]) -> Tuple[List[Optional[str]], List[Optional[str]], List[int]]:
+        """Cached content and cache key of every page, and the indices of the cache misses"""
+        contents: List[Optional[str]] = [None] * len(pages)
+        keys: List[Optional[str]] = [None] * len(pages)
+        if self.cache is not None:
+            for i, page in enumerate(pages):
+                keys[i] = self.cache.make_key(page, self._page_llm_type(), self.prompt)
+                contents[i] = self.cache.get(keys[i])
+            hits = sum(1 for content in contents if content is not None)
+            self.stats.increment("cache_hits", hits)
+            self.stats.increment("cache_misses", len(pages) - hits)
+        return contents, keys, [i for i, content in enumerate(contents) if content is None]
+    
+    def _cache_pages(self, contents: List[Optional[str]], keys: List[Optional[str]], missing: List[int]) -> None:
+        if self.cache is None:
+            return
+        for i in missing:
+            # Only successful results are cached so failed pages are retried next time
+            if contents[i] is not None:
+                self.cache.set(keys[i], contents[i])
+    
+    def _process_group_safe(self, group: List["PageJob"]) -> List[Tuple[int, str]]:
+        """Process a group of page jobs, sending their renders in a single request"""
+        jobs = [job for job in group if job.content is None]
+        if len(jobs) <= 1:
+            return [self._process_page_safe(job) for job in group]
+        
+        try:
+            # Groups only hold pages routed to the same model
+            with self._routed(jobs[0]):
+                contents = self._process_pages_cached([job.image for job in jobs])
+        except Exception as e:
+            logger.error("Error processing pages %s: %s", [job.page_num for job in jobs], e)
+            contents = [""] * len(jobs)
+            self._failed_pages.update(job.page_num for job in jobs)
+        return self._group_results(group, jobs, contents)
+    
+    async def _aprocess_group_safe(self, group: List["PageJob"]) -> List[Tuple[int, str]]:
+        """Asynchronously process a group of page jobs, sending their renders in a single request"""
+        jobs = [job for job in group if job.content is None]
+        if len(jobs) <= 1:
+            return [await self._aprocess_page_safe(job) for job in group]
+        
+        try:
+            with self._routed(jobs[0]):
+                contents = await self._aprocess_pages_cached([job.image for job in jobs])
+        except Exception as e:
+            logger.error("Error processing pages %s: %s", [job.page_num for job in jobs], e)
+            contents = [""] * len(jobs)
+            self._failed_pages.update(job.page_num for job in jobs)
+        return self._group_results(group, jobs, contents)
+    
+    def _group_results(self,
+                       group: List["PageJob"],
+                       jobs: List["PageJob"],
+                       contents: List[Optional[str]]) -> List[Tuple[int, str]]:
+        for job, content in zip(jobs, contents):
+            if content is None:
+                self._failed_pages.add(job.page_num)
+                content = ""
+            job.content = content
+        return [(job.page_num, job.content) for job in group]
+    
+    async def _aprocess_page_safe(self, job: "PageJob") -> Tuple[int, str]:
+        """Asynchronously process a page job, replacing a failed page with empty content"""
+        if job.content is not None:
+            return job.page_num, job.content
+        try:
+            with self._routed(job):
+                if job.regions is not None:
+                    content = await self._aprocess_regions(job)
+                else:
+                    content = await self._aprocess_page_cached(job.image, job.page_num)
+            if content is None:
+                self._failed_pages.add(job.page_num)
+                return job.page_num, ""
+            return job.page_num, content
+        except Exception as e:
+            logger.error("Error processing page %s: %s", job.page_num, e)
+            self._failed_pages.add(job.page_num)
+            return job.page_num, ""
+    
+    async def _aprocess_page_cached(self, page: bytes, page_num: Optional[int] = None) -> str:
+        """Asynchronously process a single page, serving repeated pages from the cache"""
+        if self.cache is None:
+            return await self._arequest_page(page, page_num)
+        
+        key = self.cache.make_key(page, self._page_llm_type(), self.prompt)
+        content = self.cache.get(key)
+        if content is not None:
+            self.stats.increment("cache_hits")
+            return content
+        
+        self.stats.increment("cache_misses")
+        content = await self._arequest_page(page, page_num)
+        # Only successful results are cached so failed pages are retried next time
+        if content is not None:
+            self.cache.set(key, content)
+        return content
+    
+    @contextmanager
+    def _open_document(self) -> Iterator[fitz.Document]:
+        """Open the source document, leaving documents opened by the caller open"""
+        with open_document(self.doc_path, self.stats) as pdf_document:
+            yield pdf_document
+    
+    def _iter_pages(self) -> Iterator[Tuple[fitz.Document, int, fitz.Page]]:
+        """
+        Open the document once and walk the selected pages.
+        
+        The caller holds FITZ_LOCK while working on a page.
+        """
+        with self._open_document() as pdf_document:
+            with FITZ_LOCK:
+                page_nums = self._selected_pages(pdf_document)
+            for page_num in page_nums:
+                with FITZ_LOCK:
+                    page = pdf_document[page_num]
+                yield pdf_document, page_num, page
+    
+    def _selected_pages(self, pdf_document) -> List[int]:
+        """Numbers of the pages to convert, in document order"""
+        return select_pages(pdf_document, self.pages, self.sections)
+    
     def _extract_images(self):
         """Extract images from PDF and store in page map"""
-        # Open the PDF using context manager
-        with fitz.open(self.doc_path) as pdf_document:
-            # Iterate through pages
-            for page_num in range(len(pdf_document)):
-                page = pdf_document[page_num]
-                
-                # Initialize empty list for current page
-                self.images_by_page[page_num] = []
-                
-                try:
-                    # Method 1: Extract embedded images
-                    self._extract_embedded_images(pdf_document, page, page_num)
-                    
-                    # Method 2: Extract vector graphics and other content as images
-                    self._extract_page_regions(page, page_num)
-                except Exception as e:
-                    print(f"Warning: Error processing page {page_num}: {str(e)}")
-                    continue
+        for pdf_document, page_num, page in self._iter_pages():
+            with FITZ_LOCK:
+                self._extract_page_images(pdf_document, page, page_num)
+    
+    def _extract_page_images(self, pdf_document, page, page_num,
+                             drawings: Optional[List[Dict]] = None) -> Optional[List[fitz.Rect]]:
+        """
+        Extract images from a single page and store in page map.
+        
+        Args:
+            pdf_document (fitz.Document): Document of the page
+            page (fitz.Page): Page to extract from
+            page_num (int): Number of the page
+            drawings (Optional[List[Dict]]): Result of page.get_drawings() if already available
+        
+        Returns:
+            Optional[List[fitz.Rect]]: Drawing clusters of the page, None if they could not be computed
+        """
+        # Initialize empty list for current page
+        self.image_store.start_page(page_num)
+        
+        try:
+            # Method 1: Extract embedded images
+            with self.stats.stage("extract_embedded"):
+                self._extract_embedded_images(pdf_document, page, page_num)
+            
+            # Method 2: Extract vector graphics and other content as images
+            with self.stats.stage("extract_regions"):
+                return self._extract_page_regions(page, page_num, drawings)
+        except Exception as e:
+            logger.warning("Error processing page %s: %s", page_num, e)
+            return None
     
     def _extract_embedded_images(self, pdf_document, page, page_num):
         """Extract embedded raster images from the page"""
         # Try different methods to get images
         try:
             # Method 1: Using get_images()
-            image_list = page.get_images()
+            image_list = page.get_images(full=True)
+            
+            # Positions of the images, which order their references in reading order
+            image_info = page.get_image_info(xrefs=True)
+            positions = {}
+            for info in image_info:
+                positions.setdefault(info["xref"], info["bbox"])
             
             # If no images found, try alternative method
             if not image_list:
                 # Method 2: Using get_image_info()
-                image_list = [(img["xref"], img) for img in page.get_image_info()]
+                image_list = [(img["xref"], img) for img in image_info]
             
             for img_idx, img in enumerate(image_list):
                 try:
                     # Handle both tuple format from get_images() and dict format from get_image_info()
-                    xref = img[0] if isinstance(img, tuple) else img["xref"]
+                    if isinstance(img[1], dict):
+                        xref, width, height = img[0], img[1]["width"], img[1]["height"]
+                        bbox = img[1]["bbox"]
+                    else:
+                        xref, width, height = img[0], img[2], img[3]
+                        bbox = positions.get(xref)
+                    
+                    # Reuse the result of an image already seen on an earlier page
+                    seen, image_name = self.image_store.lookup_xref(xref)
+                    if seen:
+                        if image_name is not None:
+                            self.image_store.add_reference(page_num, image_name, bbox=bbox)
+                        continue
+                    
+                    # Skip tiny images from the xref metadata, before decoding anything
+                    if is_tiny(width, height):
+                        self.image_store.skip_xref(xref)
+                        continue
                     
                     # Extract image
                     base_image = pdf_document.extract_image(xref)
                     
                     if base_image is None:
+                        self.image_store.skip_xref(xref)
                         continue
-                        
-                    image_bytes = base_image["image"]
                     
-                    # Try to handle different image formats and masks
                     try:
-                        from PIL import Image
-                        import io
-                        
-                        # Convert to PIL Image for processing
-                        img = Image.open(io.BytesIO(image_bytes))
-                        
-                        # Handle SMask if present
-                        if "smask" in base_image:
-                            smask_bytes = base_image["smask"]
-                            mask = Image.open(io.BytesIO(smask_bytes))
-                            
-                            # Convert images to appropriate modes
-                            if img.mode not in ['RGBA', 'LA']:
-                                img = img.convert('RGBA')
-                            if mask.mode != 'L':
-                                mask = mask.convert('L')
-                            
-                            # Apply mask
-                            img.putalpha(mask)
-                        
-                        # Basic image validation
-                        if img.size[0] < 10 or img.size[1] < 10:  # Skip tiny images
-                            continue
-                            
-                        # Skip solid color images but with more lenient threshold
-                        extrema = img.convert('L').getextrema()
-                        if extrema[0] == extrema[1] or (extrema[1] - extrema[0] < 5):
+                        # Skip solid color images, keeping the original encoding where possible
+                        triaged = triage_image(pdf_document, base_image)
+                        if triaged is None:
+                            self.image_store.skip_xref(xref)
                             continue
-                        
-                        # Convert back to bytes
-                        output = io.BytesIO()
-                        img.save(output, format='PNG', optimize=True)
-                        image_bytes = output.getvalue()
-                        base_image["ext"] = "png"
-                        
+                        image_bytes, image_ext = triaged
                     except Exception as e:
-                        print(f"Warning: Image processing failed on page {page_num}: {str(e)}")
+                        logger.warning("Image processing failed on page %s: %s", page_num, e)
                         # If PIL processing fails, use original image
-                        pass
+                        image_bytes, image_ext = base_image["image"], base_image.get("ext", "png")
                     
                     # Generate unique filename
                     image_hash = hashlib.md5(image_bytes).hexdigest()[:12]
-                    image_ext = base_image.get("ext", "png")
                     image_name = f"image_{page_num}_{image_hash}.{image_ext}"
                     
-                    # Store image
-                    self.images_by_page[page_num].append((image_name, image_bytes))
+                    # Store image, keeping a single copy of repeated images
+                    self.image_store.add(page_num, image_name, image_bytes, xref=xref, bbox=bbox)
                     
                 except Exception as e:
-                    print(f"Warning: Failed to extract image {img_idx} on page {page_num}: {str(e)}")
+                    logger.warning("Failed to extract image %s on page %s: %s", img_idx, page_num, e)
                     continue
                     
         except Exception as e:
-            print(f"Warning: Failed to process images on page {page_num}: {str(e)}")
+            logger.warning("Failed to process images on page %s: %s", page_num, e)
     
-    def _extract_page_regions(self, page, page_num):
-        """Extract vector graphics and other content as images"""
+    def _extract_page_regions(self, page, page_num,
+                              drawings: Optional[List[Dict]] = None) -> Optional[List[fitz.Rect]]:
+        """
+        Extract vector graphics and other content as images.
+        
+        Returns:
+            Optional[List[fitz.Rect]]: Drawing clusters of the page, also when their
+                images could not be extracted; None if the drawings could not be clustered
+        """
         try:
             # Get drawings and graphics from the page
-            paths = page.get_drawings()
+            paths = drawings if drawings is not None else page.get_drawings()
             if not paths:  # Skip if no vector graphics found
-                return
-                
+                return []
+            
+            from .clustering import cluster_drawings
+            
+            # Group the drawing paths into figure regions
+            clusters = cluster_drawings(paths)
+        except Exception as e:
+            logger.warning("Failed to cluster the drawings on page %s: %s", page_num, e)
+            return None
+        
+        # The layout stage reuses the clusters before they are padded below
+        unpadded = [fitz.Rect(bbox) for bbox in clusters]
+        try:
             # Get page dimensions
             rect = page.rect
             
@@ -185,118 +980,6 @@ class BaseConverter(ABC):
             import io
             import numpy as np
             
-            def is_likely_axis(path):
-                """Check if a drawing path might be part of an axis"""
-                # Check for straight lines
-                if 'items' in path:
-                    items = path['items']
-                    if items:
-                        # Check if it's a line
-                        if path.get('type') in ['l', 'L']:  # line types
-                            points = items[0]
-                            if len(points) >= 2:
-                                x0, y0 = points[0:2]
-                                x1, y1 = points[-2:]
-                                # Check if line is horizontal, vertical, or diagonal
-                                return (abs(x0 - x1) < 5 or 
-                                      abs(y0 - y1) < 5 or 
-                                      abs(abs(x0 - x1) - abs(y0 - y1)) < 5)  # 45-degree lines
-                return False
-            
-            def get_path_bounds(path):
-                """Get the bounds of a path, including its stroke width"""
-                bbox = fitz.Rect(path['rect'])
-                # Consider stroke width in the bounds
-                stroke_width = path.get('width', 1)  # Default to 1 if not specified
-                bbox.x0 -= stroke_width
-                bbox.y0 -= stroke_width
-                bbox.x1 += stroke_width
-                bbox.y1 += stroke_width
-                return bbox
-            
-            def merge_rects(rect1, rect2, padding=10):
-                """Merge two rectangles with padding"""
-                x0 = min(rect1.x0, rect2.x0) - padding
-                y0 = min(rect1.y0, rect2.y0) - padding
-                x1 = max(rect1.x1, rect2.x1) + padding
-                y1 = max(rect1.y1, rect2.y1) + padding
-                return fitz.Rect(x0, y0, x1, y1)
-            
-            def rects_are_close(rect1, rect2, threshold=150):  # Increased threshold
-                """Check if two rectangles are close to each other"""
-                # Check for any kind of overlap or proximity
-                expanded1 = fitz.Rect(rect1)
-                expanded2 = fitz.Rect(rect2)
-                # Expand rectangles by threshold
-                expanded1.x0 -= threshold
-                expanded1.y0 -= threshold
-                expanded1.x1 += threshold
-                expanded1.y1 += threshold
-                expanded2.x0 -= threshold
-                expanded2.y0 -= threshold
-                expanded2.x1 += threshold
-                expanded2.y1 += threshold
-                
-                # Check if the expanded rectangles intersect or are very close
-                if expanded1.intersects(expanded2):
-                    return True
-                    
-                # Check if rectangles are aligned horizontally or vertically
-                horizontal_aligned = (abs(expanded1.y0 - expanded2.y0) < threshold or 
-                                   abs(expanded1.y1 - expanded2.y1) < threshold)
-                vertical_aligned = (abs(expanded1.x0 - expanded2.x0) < threshold or 
-                                 abs(expanded1.x1 - expanded2.x1) < threshold)
-                
-                return horizontal_aligned or vertical_aligned
-            
-            # First pass: create initial clusters with special handling for axes
-            clusters = []
-            axis_paths = []
-            
-            # First identify potential axes and significant paths
-            for path in paths:
-                if is_likely_axis(path) or path.get('type') in ['L', 'l', 'c', 'C', 'v', 'V']:
-                    axis_paths.append(get_path_bounds(path))
-            
-            # Create initial clusters including axes and all significant paths
-            for path in paths:
-                bbox = get_path_bounds(path)
-                
-                # More lenient size threshold
-                if bbox.width < 10 or bbox.height < 10:
-                    connected_to_axis = any(rects_are_close(bbox, axis, threshold=50) 
-                                         for axis in axis_paths)
-                    if not connected_to_axis:
-                        continue
-                
-                # Try to add to existing cluster
-                added_to_cluster = False
-                for i, cluster in enumerate(clusters):
-                    if rects_are_close(cluster, bbox):
-                        clusters[i] = merge_rects(cluster, bbox)
-                        added_to_cluster = True
-                        break
-                
-                # Create new cluster if needed
-                if not added_to_cluster:
-                    clusters.append(bbox)
-            
-            # Second pass: aggressive merging of clusters
-            merged = True
-            while merged:
-                merged = False
-                i = 0
-                while i < len(clusters):
-                    j = i + 1
-                    while j < len(clusters):
-                        if rects_are_close(clusters[i], clusters[j]):
-                            clusters[i] = merge_rects(clusters[i], clusters[j])
-                            clusters.pop(j)
-                            merged = True
-                        else:
-                            j += 1
-                    i += 1
-            
             # Create pixmap with higher resolution
             zoom = 2
             mat = fitz.Matrix(zoom, zoom)
@@ -342,113 +1025,400 @@ class BaseConverter(ABC):
                 image_hash = hashlib.md5(image_bytes).hexdigest()[:12]
                 image_name = f"drawing_{page_num}_{cluster_num}_{image_hash}.png"
                 
-                # Store image
-                self.images_by_page[page_num].append((image_name, image_bytes))
-            
+                # Store image, keeping a single copy of repeated figures
+                self.image_store.add(page_num, image_name, image_bytes, image=img, bbox=unpadded[cluster_num])
         except Exception as e:
-            print(f"Warning: Failed to extract page region on page {page_num}: {str(e)}")
+            logger.warning("Failed to extract page region on page %s: %s", page_num, e)
+        return unpadded
     
     def _pdf_to_images(self) -> List[bytes]:
         """Convert PDF pages to images"""
-        page_images = []
-        
-        # Open PDF using context manager
-        with fitz.open(self.doc_path) as pdf_document:
-            for page_num in range(len(pdf_document)):
-                page = pdf_document[page_num]
-                
-                # Get the page's pixmap (image representation)
-                # Using a zoom factor of 2 for better quality
-                # Using RGB color space (no alpha channel)
-                pix = page.get_pixmap(matrix=fitz.Matrix(3, 3), alpha=False)
-                
-                # Convert pixmap to PNG bytes
-                image_bytes = pix.tobytes("png")
-                page_images.append(image_bytes)
-        
-        return page_images
+        return [self._render_page_locked(page, page_num) for _, page_num, page in self._iter_pages()]
     
-    def _split_pages(self, pages: List[bytes]) -> List[List[bytes]]:
+    def _iter_page_jobs(self) -> Iterator["PageJob"]:
         """
-        Split pages into processable chunks.
+        Walk the document once, extracting the images of each page and
+        preparing it for the LLM before moving on to the next one.
         
-        Args:
-            pages (List[bytes]): List of page images as bytes
-            
-        Returns:
-            List[List[bytes]]: List of chunks, where each chunk is a list of page images
+        Yields:
+            PageJob: Rendered page, or page already converted locally
         """
-        total_pages = len(pages)
-        if total_pages == 0:
-            return []
+        self._load_manifest()
+        
+        if self.render_workers > 1:
+            jobs = self._iter_page_jobs_parallel()
+        else:
+            jobs = (self._prepare_page_locked(pdf_document, page, page_num)
+                    for pdf_document, page_num, page in self._iter_pages())
+        
+        for job in jobs:
+            if job.fingerprint is not None:
+                self._fingerprints[job.page_num] = job.fingerprint
+            if job.route is not None:
+                self._record_route(job.route)
+            if job.reused:
+                self.stats.increment("reused_pages")
+                self._restore_page(job)
+            elif job.image is not None:
+                self.stats.increment("llm_pages")
+            elif job.regions is not None:
+                self.stats.increment("llm_pages")
+                self.stats.increment("tiled_pages")
+                self.stats.increment("region_requests", len(job.regions))
+            yield job
+    
+    def _prepare_page_locked(self, pdf_document, page, page_num: int) -> "PageJob":
+        """Prepare a page while no other converter works on a document"""
+        with FITZ_LOCK:
+            return self._prepare_page(pdf_document, page, page_num)
+    
+    def _prepare_page(self, pdf_document, page, page_num: int) -> "PageJob":
+        """Extract the images of a page and either convert it locally or render it"""
+        fingerprint = None
+        if self.incremental_dir is not None:
+            # Unchanged pages are stitched in from the previous conversion
+            fingerprint = page_fingerprint(pdf_document, page)
+            if fingerprint in self._reusable:
+                return PageJob(page_num, fingerprint=fingerprint, reused=True)
         
-        # Calculate number of chunks
-        num_chunks = min(self.max_chunks, max(1, math.ceil(total_pages / self.chunk_size)))
+        # The figure extraction, the text layer check and the router share one traversal of the drawings
+        drawings = self._page_drawings(page)
+        clusters = self._extract_page_images(pdf_document, page, page_num, drawings)
         
-        # Calculate actual chunk size based on number of chunks
-        actual_chunk_size = math.ceil(total_pages / num_chunks)
+        # Extracted images and figures are only placed by the LLM
+        if self.text_layer_fast_path and not self.image_store.page_images(page_num):
+            content = self._convert_text_layer(page, clusters, drawings)
+            if content is not None:
+                self.stats.increment("text_layer_pages")
+                return PageJob(page_num, content=content, fingerprint=fingerprint)
         
-        # Split pages into chunks
-        chunks = []
-        for i in range(0, total_pages, actual_chunk_size):
-            chunk = pages[i:i + actual_chunk_size]
-            chunks.append(chunk)
+        route = None
+        if self.router is not None:
+            route = self._route_page(page, drawings)
+            if route is not None and route.skip:
+                # Blank pages are neither rendered nor sent to the LLM
+                return PageJob(page_num, content="", fingerprint=fingerprint, route=route)
         
-        return chunks
+        # Without the clusters of the figure extraction the layout is not worth recomputing
+        if self.region_tiling and clusters is not None:
+            regions = self._tile_page(page, clusters)
+            if regions is not None:
+                return PageJob(page_num, regions=self._render_regions(page, page_num, regions),
+                               fingerprint=fingerprint, route=route)
+        
+        return PageJob(page_num, image=self._render_page(page, page_num), fingerprint=fingerprint, route=route)
+    
+    def _page_drawings(self, page) -> Optional[List[Dict]]:
+        """Vector drawings of a page, None if they could not be read"""
+        try:
+            return page.get_drawings()
+        except Exception as e:
+            logger.warning("Failed to read the drawings of page %s: %s", page.number, e)
+            return None
+    
+    def _route_page(self, page, drawings: Optional[List[Dict]] = None) -> Optional[RoutingDecision]:
+        """Classify a page for the router; None sends it to the converter's own model"""
+        try:
+            return self.router.route(page, drawings=drawings)
+        except Exception as e:
+            logger.warning("Routing failed on page %s: %s", page.number, e)
+            return None
     
-    def _process_chunks_parallel(self, chunks: List[List[bytes]]) -> List[str]:
+    def _tile_page(self, page, clusters: List[fitz.Rect]) -> Optional[List[Region]]:
+        """Regions of a dense page in reading order, None to send the page whole"""
+        try:
+            with self.stats.stage("layout"):
+                return tile_page(page, clusters=clusters)
+        except Exception as e:
+            logger.warning("Layout analysis failed on page %s: %s", page.number, e)
+            return None
+    
+    def _record_route(self, route: RoutingDecision) -> None:
+        """Report the routing decision of a page in the converter and the stats of the run"""
+        self.routing_decisions[route.page_num] = route
+        self.stats.increment(f"{route.page_class}_pages")
+        logger.debug("Page %s is %s (%s), sent to %s", route.page_num, route.page_class, route.reason,
+                     "nothing" if route.skip else route.llm_type or self.llm_type)
+    
+    def _manifest_settings(self) -> str:
+        """Digest of the settings that affect the converted content"""
+        settings = [
+            type(self).__name__,
+            str(self.llm_type),
+            self.prompt,
+            vars(self.render_options),
+            self.text_layer_fast_path,
+            self.dedupe_similar_images,
+            self.router.settings() if self.router is not None else None,
+            self.region_tiling,
+        ]
+        return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    
+    def _load_manifest(self) -> None:
+        """Load the manifest of the previous conversion in incremental mode"""
+        self._fingerprints = {}
+        self._failed_pages = set()
+        if self.incremental_dir is None:
+            return
+        self._manifest = ConversionManifest(self.incremental_dir, self._manifest_settings())
+        self._reusable = self._manifest.fingerprints
+        if self.image_sink is not None:
+            # Images written to the sink are gone from memory when the manifest is saved
+            self.image_store.sink = self._manifest.mirror(self.image_sink)
+    
+    def _restore_page(self, job: "PageJob") -> None:
+        """Fill in the content and images of an unchanged page from the manifest"""
+        entry = self._manifest.lookup(job.fingerprint)
+        job.content = entry["content"]
+        
+        self.image_store.start_page(job.page_num)
+        for image_name in entry["images"]:
+            try:
+                if image_name in self.image_store:
+                    self.image_store.add_reference(job.page_num, image_name)
+                else:
+                    self.image_store.add(job.page_num, image_name, self._manifest.load_image(image_name))
+            except OSError as e:
+                logger.warning("Missing image %s of page %s: %s", image_name, job.page_num, e)
+    
+    def _save_manifest(self, contents: Dict[int, str]) -> None:
+        """Record the pages of a finished conversion in incremental mode"""
+        if self._manifest is None:
+            return
+        
+        pages = []
+        for page_num in sorted(contents):
+            # Failed pages are left out so they are converted again next time
+            if page_num in self._failed_pages or page_num not in self._fingerprints:
+                continue
+            pages.append({
+                "fingerprint": self._fingerprints[page_num],
+                "content": contents[page_num],
+                "images": self.image_store.pages.get(page_num, []),
+            })
+        
+        if self.pages is not None or self.sections is not None:
+            # Pages outside the selection keep their entries from earlier runs
+            converted = {entry["fingerprint"] for entry in pages}
+            pages += [entry for fingerprint, entry in self._manifest.pages.items() if fingerprint not in converted]
+        self._manifest.save(pages, lambda name: self.image_store.images[name])
+    
+    def _convert_text_layer(self, page,
+                            clusters: Optional[List[fitz.Rect]] = None,
+                            drawings: Optional[List[Dict]] = None) -> Optional[str]:
         """
-        Process chunks in parallel using multiple threads.
+        Convert a page straight from its embedded text layer.
         
         Args:
-            chunks (List[List[bytes]]): List of chunks, where each chunk is a list of page images
-            
+            page (fitz.Page): Page to convert
+            clusters (Optional[List[fitz.Rect]]): Drawing clusters of the figure extraction
+            drawings (Optional[List[Dict]]): Result of page.get_drawings()
+        
         Returns:
-            List[str]: List of processed content, one entry per page
+            Optional[str]: Page content, or None if the page needs the LLM
         """
-        all_results = []
-        
-        # Process a single chunk
-        def process_chunk(chunk: List[bytes]) -> List[str]:
-            return [self._process_page(page) for page in chunk]
+        try:
+            text_dict = page.get_text("dict", sort=True)
+            if analyze_page(page, text_dict, clusters, drawings).needs_llm:
+                return None
+            return page_to_markdown(page, text_dict)
+        except Exception as e:
+            logger.warning("Text layer conversion failed on page %s: %s", page.number, e)
+            return None
+    
+    def _iter_page_jobs_parallel(self) -> Iterator["PageJob"]:
+        """
+        Prepare pages on a pool of processes.
         
-        # Use ThreadPoolExecutor for parallel processing
-        with ThreadPoolExecutor() as executor:
-            # Submit all chunks for processing
-            future_to_chunk = {
-                executor.submit(process_chunk, chunk): i 
-                for i, chunk in enumerate(chunks)
-            }
+        Every worker opens the PDF itself and handles a run of consecutive selected pages.
+        Results come back as files in a scratch directory (in shared memory
+        where available) so only their paths are pickled. Ranges are consumed
+        in page order and their files are removed as soon as they are read.
+        """
+        # Prefer a RAM backed scratch directory for the hand-off files
+        scratch_root = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        with tempfile.TemporaryDirectory(prefix="morpher-", dir=scratch_root) as scratch_dir:
+            source, page_nums = self._worker_source(scratch_dir)
+            if not page_nums:
+                return
             
-            # Collect results as they complete
-            chunk_results = [[] for _ in chunks]
-            for future in as_completed(future_to_chunk):
-                chunk_idx = future_to_chunk[future]
+            range_size = max(1, min(self.chunk_size, math.ceil(len(page_nums) / self.render_workers)))
+            ranges = [page_nums[start:start + range_size]
+                      for start in range(0, len(page_nums), range_size)]
+            state = self._worker_state()
+            
+            # Spawned workers are safe to start while other threads are running
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=self.render_workers, mp_context=context) as executor:
+                futures = []
+                next_range = 0
                 try:
-                    result = future.result()
-                    chunk_results[chunk_idx] = result
-                except Exception as e:
-                    print(f"Error processing chunk {chunk_idx}: {str(e)}")
-                    # Insert empty strings for failed pages
-                    chunk_results[chunk_idx] = ["" for _ in chunks[chunk_idx]]
+                    for index in range(len(ranges)):
+                        # Keep a bounded number of ranges in flight
+                        while next_range < len(ranges) and next_range < index + 2 * self.render_workers:
+                            futures.append(executor.submit(
+                                _render_page_range, type(self), state, source, ranges[next_range], scratch_dir
+                            ))
+                            next_range += 1
+                        
+                        records, worker_stats = futures[index].result()
+                        # Extraction and render times were recorded in the worker
+                        self.stats.merge(worker_stats)
+                        for page_num, page_path, image_paths, render_stats, content, fingerprint, reused, route in records:
+                            if reused:
+                                yield PageJob(page_num, fingerprint=fingerprint, reused=True)
+                                continue
+                            self.image_store.start_page(page_num)
+                            for image_name, image_path in image_paths:
+                                if image_path is None:
+                                    self.image_store.add_reference(page_num, image_name)
+                                else:
+                                    self.image_store.add(page_num, image_name, _read_and_remove(image_path))
+                            if page_path is None:
+                                yield PageJob(page_num, content=content, fingerprint=fingerprint, route=route)
+                                continue
+                            self.render_stats[page_num] = render_stats
+                            if isinstance(page_path, list):
+                                regions = [(kind, _read_and_remove(path)) for kind, path in page_path]
+                                yield PageJob(page_num, regions=regions, fingerprint=fingerprint, route=route)
+                                continue
+                            yield PageJob(page_num, image=_read_and_remove(page_path), fingerprint=fingerprint,
+                                          route=route)
+                        futures[index] = None
+                finally:
+                    for future in futures:
+                        if future is not None:
+                            future.cancel()
+    
+    def _worker_source(self, scratch_dir: str) -> Tuple[str, List[int]]:
+        """Get a path render workers can open the document from, and the selected pages"""
+        with self._open_document() as pdf_document, FITZ_LOCK:
+            page_nums = self._selected_pages(pdf_document)
+            if isinstance(self.doc_path, (str, Path)):
+                return str(self.doc_path), page_nums
+            if (isinstance(self.doc_path, fitz.Document) and pdf_document.name
+                    and os.path.isfile(pdf_document.name) and not pdf_document.is_dirty):
+                return pdf_document.name, page_nums
+            
+            # In-memory sources are written out once instead of pickled to every worker
+            path = os.path.join(scratch_dir, "source.pdf")
+            if isinstance(self.doc_path, fitz.Document):
+                pdf_document.save(path)
+            else:
+                with open(path, "wb") as f:
+                    f.write(self.doc_path)
+            return path, page_nums
+    
+    def _worker_state(self) -> Dict[str, Any]:
+        """Converter settings shipped to render worker processes"""
+        excluded = {"doc_path", "_llm_client", "cache", "image_store", "page_contents", "page_numbers", "render_stats",
+                    "scheduler", "on_page_delta", "stats_sinks", "stats", "image_sink", "routing_decisions",
+                    "_manifest", "_fingerprints", "_failed_pages", "_route_clients"}
+        return {key: value for key, value in self.__dict__.items() if key not in excluded}
+    
+    def _render_page_range(self, page_nums: List[int], scratch_dir: str) -> List[Tuple]:
+        """
+        Prepare a run of pages into scratch files.
         
-        # Merge results from all chunks in order
-        for chunk_result in chunk_results:
-            all_results.extend(chunk_result)
+        Returns:
+            List[Tuple]: Per page the page number, path of the rendered page
+                (None if converted locally, a list of (kind, path) of its regions
+                if tiled), (name, path) of each extracted
+                image, the render statistics, the locally converted content,
+                the page fingerprint, whether the page is unchanged and its
+                routing decision
+        """
+        records = []
+        with self._open_document() as pdf_document:
+            for page_num in page_nums:
+                job = self._prepare_page(pdf_document, pdf_document[page_num], page_num)
+                
+                image_paths = []
+                # Images already shipped with an earlier page are sent as references only
+                for image_index, (image_name, image_bytes) in enumerate(self.image_store.pop_page(page_num)):
+                    image_path = None
+                    if image_bytes is not None:
+                        image_path = os.path.join(scratch_dir, f"image_{page_num}_{image_index}")
+                        with open(image_path, "wb") as f:
+                            f.write(image_bytes)
+                    image_paths.append((image_name, image_path))
+                
+                page_path = None
+                if job.image is not None:
+                    page_path = os.path.join(scratch_dir, f"page_{page_num}")
+                    with open(page_path, "wb") as f:
+                        f.write(job.image)
+                elif job.regions is not None:
+                    page_path = []
+                    for region_index, (kind, image_bytes) in enumerate(job.regions):
+                        region_path = os.path.join(scratch_dir, f"page_{page_num}_{region_index}")
+                        with open(region_path, "wb") as f:
+                            f.write(image_bytes)
+                        page_path.append((kind, region_path))
+                records.append((page_num, page_path, image_paths,
+                                self.render_stats.pop(page_num, None), job.content,
+                                job.fingerprint, job.reused, job.route))
+        return records
+    
+    def _render_page_locked(self, page, page_num: int) -> bytes:
+        with FITZ_LOCK:
+            return self._render_page(page, page_num)
+    
+    def _render_page(self, page, page_num: int) -> bytes:
+        """Render a page for the LLM, recording its payload size and render time"""
+        image_bytes, stats = render_page(page, self.render_options)
+        self.render_stats[page_num] = stats
+        self._record_render(stats)
+        return image_bytes
+    
+    def _render_regions(self, page, page_num: int, regions: List[Region]) -> List[Tuple[str, bytes]]:
+        """
+        Render the regions of a tiled page for the LLM.
         
-        return all_results
+        The render stats of the page hold the resolution and size of its
+        largest region, with the bytes and seconds of all regions together.
+        """
+        rendered = []
+        largest = None
+        totals = {"bytes": 0, "render_seconds": 0.0, "encode_seconds": 0.0, "seconds": 0.0}
+        for region in regions:
+            image_bytes, stats = render_page(page, self.render_options, clip=region.rect)
+            self._record_render(stats)
+            rendered.append((region.kind, image_bytes))
+            if largest is None or stats["bytes"] > largest["bytes"]:
+                largest = stats
+            for key in totals:
+                totals[key] += stats[key]
+        self.render_stats[page_num] = {**largest, **totals, "regions": len(regions)}
+        return rendered
+    
+    def _record_render(self, stats: Dict[str, float]) -> None:
+        self.stats.add_time("render", stats["render_seconds"])
+        self.stats.add_time("encode", stats["encode_seconds"])
+        self.stats.increment("render_bytes", stats["bytes"])
     
     def _merge_images(self) -> List[str]:
-        """Merge all images into a single array"""
-        pass
+        """Links to all extracted images, in the order they first appear in the document"""
+        links = []
+        seen = set()
+        for page_num in sorted(self.image_store.pages):
+            for image_name in self.image_store.pages[page_num]:
+                if image_name not in seen:
+                    seen.add(image_name)
+                    links.append(self.image_store.link(image_name))
+        return links
     
     def _merge_content(self) -> str:
         """Merge all processed content into final document"""
         pass
+    
+    def _link_images(self, page_num: int, content: str) -> str:
+        """Point the image references in the content of a page at its extracted images"""
+        return content
 
     def _rewrite_page(self, content: str) -> Optional[str]:
         """
-        Extract markdown content from XML tags.
+        Extract markdown content from the output tag of the response.
         
         Args:
             content (str): Raw content with XML tags
@@ -457,10 +1427,11 @@ class BaseConverter(ABC):
             Optional[str]: Extracted markdown content or None if no valid content found
         """
         try:
-            # Find content between <markdown> tags using regex
-            pattern = r'<task_two>(.*?)</task_two>'
+            # Find content between the output tags using regex
+            pattern = rf'<{self.output_tag}>(.*?)</{self.output_tag}>'
             # Use re.DOTALL to match across multiple lines
-            match = re.search(pattern, content, re.DOTALL)
+            with self.stats.stage("parse"):
+                match = re.search(pattern, content, re.DOTALL)
             
             if match:
                 # Extract and clean the content
@@ -469,9 +1440,32 @@ class BaseConverter(ABC):
                 markdown_content = markdown_content.strip()
                 return markdown_content
             
-            print("Warning: No markdown tags found in content")
+            logger.warning("No markdown tags found in content")
             return None
             
         except Exception as e:
-            print(f"Error extracting markdown content: {str(e)}")
+            logger.error("Error extracting markdown content: %s", e)
             return None
+
+
+def _render_page_range(converter_class, state: Dict[str, Any], source: str,
+                       page_nums: List[int], scratch_dir: str) -> Tuple[List[Tuple], Dict[str, Any]]:
+    """Entry point of render worker processes, returning the page records and the worker's stats"""
+    # Rebuild a bare converter without creating an LLM client in the worker
+    converter = converter_class.__new__(converter_class)
+    converter.__dict__.update(state)
+    converter.doc_path = source
+    # Workers ship their images back to the main process, which writes them to the sink
+    converter.image_sink = None
+    converter.image_store = converter._new_image_store()
+    converter.render_stats = {}
+    converter.stats = ConversionStats()
+    records = converter._render_page_range(page_nums, scratch_dir)
+    return records, converter.stats.to_dict()
+
+
+def _read_and_remove(path: str) -> bytes:
+    with open(path, "rb") as f:
+        data = f.read()
+    os.remove(path)
+    return data
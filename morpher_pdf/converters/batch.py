@@ -0,0 +1,309 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import hashlib
+import json
+import logging
+import math
+import os
+from pathlib import Path
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Type, Union
+
+from . import BaseConverter
+from .markdown import MarkdownConverter
+from .scheduler import PageScheduler
+from .sinks import DirectoryImageSink
+from ..llm.factory import LLMFactory, RateLimits
+from ..stats import ConversionStats
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentResult:
+    """Outcome of converting one document of a batch"""
+    __slots__ = ("doc_path", "content", "images", "output_path", "failed_pages", "error", "resumed", "stats")
+
+    def __init__(self,
+                 doc_path: Union[str, Path],
+                 content: Optional[str] = None,
+                 images: Optional[Dict[str, bytes]] = None,
+                 output_path: Optional[str] = None,
+                 failed_pages: Optional[List[int]] = None,
+                 error: Optional[Exception] = None,
+                 resumed: bool = False,
+                 stats: Optional[ConversionStats] = None):
+        """
+        Args:
+            doc_path (Union[str, Path]): Path of the converted document
+            content (Optional[str]): Converted content (None if resumed or failed)
+            images (Optional[Dict[str, bytes]]): Extracted images by file name (empty when
+                they were written to the output directory)
+            output_path (Optional[str]): File the content was written to, if any
+            failed_pages (Optional[List[int]]): Pages left empty because their conversion failed
+            error (Optional[Exception]): Error that stopped the conversion of the document
+            resumed (bool): Document was finished by an earlier run of the batch
+            stats (Optional[ConversionStats]): Timings and counters of the conversion
+        """
+        self.doc_path = doc_path
+        self.content = content
+        self.images = images or {}
+        self.output_path = output_path
+        self.failed_pages = failed_pages or []
+        self.error = error
+        self.resumed = resumed
+        self.stats = stats
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.failed_pages
+
+    def __repr__(self) -> str:
+        return (f"DocumentResult(doc_path={str(self.doc_path)!r}, output_path={self.output_path!r}, "
+                f"failed_pages={self.failed_pages}, error={self.error!r}, resumed={self.resumed})")
+
+
+class BatchJournal:
+    """
+    Append-only JSON lines log of finished documents.
+
+    Every finished document appends one record, flushed to disk before the
+    document is reported, so a crashed batch knows exactly which documents
+    it does not need to convert again. The last record of a document wins.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open the journal, reading the records of earlier runs.
+
+        Args:
+            path (str): Path of the journal file
+        """
+        self.path = path
+        self.done: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+        needs_newline = False
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    needs_newline = not line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn last line of a run that crashed mid-write
+                        continue
+                    if record.get("status") == "done":
+                        self.done[record["doc"]] = record.get("output")
+                    else:
+                        self.done.pop(record["doc"], None)
+
+        self._file = open(path, "a", encoding="utf-8")
+        if needs_newline:
+            self._file.write("\n")
+
+    def is_done(self, doc: str) -> bool:
+        """Whether a document was finished and its output is still there"""
+        if doc not in self.done:
+            return False
+        output = self.done[doc]
+        return output is None or os.path.isfile(output)
+
+    def record(self, doc: str, status: str, output: Optional[str] = None, **details: Any) -> None:
+        """
+        Append the outcome of a document.
+
+        Args:
+            doc (str): Journal key of the document
+            status (str): "done", or any other status to convert it again on resume
+            output (Optional[str]): File the content was written to
+            **details: Extra fields stored with the record
+        """
+        line = json.dumps({"doc": doc, "status": status, "output": output, **details})
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if status == "done":
+                self.done[doc] = output
+            else:
+                self.done.pop(doc, None)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class BatchConverter:
+    """
+    Convert many documents with one LLM client and one page scheduler.
+
+    Up to ``max_documents`` documents are open at a time. Their pages are
+    scheduled together on a single pool of ``max_workers`` threads, so a
+    document with a few slow pages does not leave workers idle while other
+    documents wait, and all requests draw from the same client and rate
+    budget. Documents are yielded as soon as they complete.
+
+    With an ``output_dir`` every converted document is written there and
+    recorded in a journal; running the same batch again skips documents
+    the journal lists as done. Images are then written next to the
+    document as soon as they are extracted instead of kept in memory.
+    """
+
+    JOURNAL_NAME = "journal.jsonl"
+
+    def __init__(self,
+                 doc_paths: Iterable[Union[str, Path]],
+                 api_key: str,
+                 converter_class: Type[BaseConverter] = MarkdownConverter,
+                 llm_type: Union[str, List[str]] = "gpt4-vision",
+                 max_workers: int = 16,
+                 max_documents: int = 4,
+                 prioritize_short_pages: bool = False,
+                 output_dir: Optional[str] = None,
+                 rate_limit: Optional[RateLimits] = None,
+                 **converter_kwargs):
+        """
+        Initialize the batch.
+
+        Args:
+            doc_paths (Iterable[Union[str, Path]]): Paths of the documents, consumed lazily
+            api_key (str): API key for the LLM service
+            converter_class (Type[BaseConverter]): Converter used for every document
+            llm_type (Union[str, List[str]]): Type of LLM to use (default: "gpt4-vision"),
+                or several types to hedge between
+            max_workers (int): Number of page worker threads shared by all documents
+            max_documents (int): Maximum number of documents converted at a time
+            prioritize_short_pages (bool): Send pages with smaller renders to the LLM first
+            output_dir (Optional[str]): Directory receiving the converted documents and the journal
+            rate_limit (Optional[RateLimits]): Budget all documents share, or budgets by
+                LLM type (default: requests are not throttled)
+            **converter_kwargs: Further arguments of the converter class
+        """
+        self.doc_paths = doc_paths
+        self.api_key = api_key
+        self.converter_class = converter_class
+        self.llm_type = llm_type
+        self.max_workers = max(1, max_workers)
+        self.max_documents = max(1, max_documents)
+        self.prioritize_short_pages = prioritize_short_pages
+        self.output_dir = output_dir
+        self.converter_kwargs = converter_kwargs
+        self.rate_limit = rate_limit
+        self.llm_client = LLMFactory.get_client(llm_type, api_key, max_connections=self.max_workers,
+                                                rate_limit=rate_limit)
+
+    def convert(self) -> List[DocumentResult]:
+        """Convert every document, returning the results in completion order"""
+        return list(self.convert_iter())
+
+    def convert_iter(self) -> Iterator[DocumentResult]:
+        """
+        Convert the documents, yielding each one as soon as it completes.
+
+        Yields:
+            DocumentResult: Outcome of a document, in completion order
+        """
+        journal = None
+        if self.output_dir is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            journal = BatchJournal(os.path.join(self.output_dir, self.JOURNAL_NAME))
+
+        try:
+            with PageScheduler(self.max_workers, self.prioritize_short_pages) as scheduler:
+                executor = ThreadPoolExecutor(max_workers=self.max_documents,
+                                              thread_name_prefix="morpher-document")
+                try:
+                    pending = set()
+                    doc_paths = iter(self.doc_paths)
+                    exhausted = False
+                    while True:
+                        while not exhausted and len(pending) < self.max_documents:
+                            try:
+                                doc_path = next(doc_paths)
+                            except StopIteration:
+                                exhausted = True
+                                break
+                            key = self._journal_key(doc_path)
+                            if journal is not None and journal.is_done(key):
+                                yield DocumentResult(doc_path, output_path=journal.done[key], resumed=True)
+                                continue
+                            pending.add(executor.submit(self._convert_document, doc_path, scheduler, journal))
+
+                        if not pending:
+                            return
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                finally:
+                    executor.shutdown(wait=True, cancel_futures=True)
+        finally:
+            if journal is not None:
+                journal.close()
+
+    def _convert_document(self,
+                          doc_path: Union[str, Path],
+                          scheduler: PageScheduler,
+                          journal: Optional[BatchJournal]) -> DocumentResult:
+        """Convert a single document on the shared scheduler and record the outcome"""
+        key = self._journal_key(doc_path)
+        kwargs = dict(self.converter_kwargs)
+        # Split the in-flight page window between the documents open at a time
+        kwargs.setdefault("max_workers", max(1, math.ceil(self.max_workers / self.max_documents)))
+        if self.output_dir is not None:
+            name = self._output_name(doc_path)
+            kwargs.setdefault("image_sink", DirectoryImageSink(os.path.join(self.output_dir, f"{name}_images"),
+                                                               base_url=f"{name}_images/"))
+
+        try:
+            converter = self.converter_class(
+                doc_path,
+                self.api_key,
+                llm_type=self.llm_type,
+                llm_client=self.llm_client,
+                rate_limit=self.rate_limit,
+                scheduler=scheduler,
+                **kwargs,
+            )
+            content, _ = converter.convert()
+            content = content or ""
+            images = dict(converter.image_store.images)
+            failed_pages = converter.failed_pages
+
+            output_path = None
+            if self.output_dir is not None:
+                output_path = self._write_output(doc_path, content, images)
+        except Exception as e:
+            logger.error("Error converting document %s: %s", doc_path, e)
+            if journal is not None:
+                journal.record(key, "failed", error=str(e))
+            return DocumentResult(doc_path, error=e)
+
+        if journal is not None:
+            # Documents with failed pages are converted again on resume
+            status = "incomplete" if failed_pages else "done"
+            journal.record(key, status, output_path, failed_pages=failed_pages)
+        return DocumentResult(doc_path, content, images, output_path, failed_pages, stats=converter.stats)
+
+    def _output_name(self, doc_path: Union[str, Path]) -> str:
+        # The path digest keeps documents with the same file name apart
+        digest = hashlib.sha1(self._journal_key(doc_path).encode("utf-8")).hexdigest()[:8]
+        return f"{Path(doc_path).stem}-{digest}"
+
+    def _write_output(self, doc_path: Union[str, Path], content: str, images: Dict[str, bytes]) -> str:
+        """Write a converted document and its images, returning the path of the content file"""
+        name = self._output_name(doc_path)
+        if images:
+            image_dir = os.path.join(self.output_dir, f"{name}_images")
+            os.makedirs(image_dir, exist_ok=True)
+            for image_name, image_bytes in images.items():
+                with open(os.path.join(image_dir, image_name), "wb") as f:
+                    f.write(image_bytes)
+
+        output_path = os.path.join(self.output_dir, name + self.converter_class.output_extension)
+        with open(output_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(output_path + ".tmp", output_path)
+        return output_path
+
+    @staticmethod
+    def _journal_key(doc_path: Union[str, Path]) -> str:
+        return os.path.abspath(os.fspath(doc_path))
@@ -0,0 +1,253 @@
+from collections import defaultdict
+import math
+from typing import Dict, List, Sequence, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+
+# Drawing path types treated as potential axes or significant strokes
+AXIS_PATH_TYPES = ['L', 'l', 'c', 'C', 'v', 'V']
+
+# Coordinates of PyMuPDF's infinite rectangle
+_INFINITE_MIN = fitz.FZ_MIN_INF_RECT
+_INFINITE_MAX = fitz.FZ_MAX_INF_RECT
+
+# Above this many clusters candidate scans switch from Python to NumPy
+_VECTORIZE_THRESHOLD = 32
+
+# Axes spanning more grid cells than this are checked against every query
+_MAX_CELLS_PER_RECT = 256
+
+Box = Tuple[float, float, float, float]
+
+
+def is_likely_axis(path) -> bool:
+    """Check if a drawing path might be part of an axis"""
+    # Check for straight lines
+    if 'items' in path:
+        items = path['items']
+        if items:
+            # Check if it's a line
+            if path.get('type') in ['l', 'L']:  # line types
+                points = items[0]
+                if len(points) >= 2:
+                    x0, y0 = points[0:2]
+                    x1, y1 = points[-2:]
+                    # Check if line is horizontal, vertical, or diagonal
+                    return (abs(x0 - x1) < 5 or
+                            abs(y0 - y1) < 5 or
+                            abs(abs(x0 - x1) - abs(y0 - y1)) < 5)  # 45-degree lines
+    return False
+
+
+def get_path_bounds(path) -> fitz.Rect:
+    """Get the bounds of a path, including its stroke width"""
+    bbox = fitz.Rect(path['rect'])
+    # Consider stroke width in the bounds
+    stroke_width = path.get('width', 1)  # Default to 1 if not specified
+    bbox.x0 -= stroke_width
+    bbox.y0 -= stroke_width
+    bbox.x1 += stroke_width
+    bbox.y1 += stroke_width
+    return bbox
+
+
+def _expand(box: Box, threshold: float) -> Box:
+    return (box[0] - threshold, box[1] - threshold, box[2] + threshold, box[3] + threshold)
+
+
+def _is_solid(box: Box) -> bool:
+    """Rect is neither empty nor infinite, as required by fitz.Rect.intersects"""
+    if box[0] >= box[2] or box[1] >= box[3]:
+        return False
+    return not (box[0] == box[1] == _INFINITE_MIN and box[2] == box[3] == _INFINITE_MAX)
+
+
+def _merge(a: Box, b: Box, padding: float) -> Box:
+    """Merge two rectangles with padding"""
+    return (min(a[0], b[0]) - padding,
+            min(a[1], b[1]) - padding,
+            max(a[2], b[2]) + padding,
+            max(a[3], b[3]) + padding)
+
+
+def _close(a: Box, b: Box, threshold: float) -> bool:
+    """Check if two rectangles are close to each other"""
+    e1 = _expand(a, threshold)
+    e2 = _expand(b, threshold)
+
+    # Check if the expanded rectangles intersect
+    if (_is_solid(e1) and _is_solid(e2)
+            and e1[0] < e2[2] and e2[0] < e1[2]
+            and e1[1] < e2[3] and e2[1] < e1[3]):
+        return True
+
+    # Check if rectangles are aligned horizontally or vertically
+    return (abs(e1[1] - e2[1]) < threshold or abs(e1[3] - e2[3]) < threshold or
+            abs(e1[0] - e2[0]) < threshold or abs(e1[2] - e2[2]) < threshold)
+
+
+def _close_mask(boxes: np.ndarray, box: Box, threshold: float) -> np.ndarray:
+    """Vectorized _close of every row of boxes against box"""
+    e = boxes + np.array([-threshold, -threshold, threshold, threshold])
+    r = _expand(box, threshold)
+
+    aligned = ((np.abs(e[:, 1] - r[1]) < threshold) | (np.abs(e[:, 3] - r[3]) < threshold) |
+               (np.abs(e[:, 0] - r[0]) < threshold) | (np.abs(e[:, 2] - r[2]) < threshold))
+    if not _is_solid(r):
+        return aligned
+
+    infinite = ((e[:, 0] == _INFINITE_MIN) & (e[:, 1] == _INFINITE_MIN) &
+                (e[:, 2] == _INFINITE_MAX) & (e[:, 3] == _INFINITE_MAX))
+    intersects = ((e[:, 0] < e[:, 2]) & (e[:, 1] < e[:, 3]) & ~infinite &
+                  (e[:, 0] < r[2]) & (r[0] < e[:, 2]) &
+                  (e[:, 1] < r[3]) & (r[1] < e[:, 3]))
+    return aligned | intersects
+
+
+class _ProximityIndex:
+    """
+    Answers "is this rectangle close to any of the indexed rectangles".
+
+    The alignment part of the test is a 1-D proximity query on one edge
+    coordinate, answered by binary search over sorted edges. The overlap
+    part is answered through a uniform grid over the expanded rectangles.
+    """
+
+    def __init__(self, boxes: Sequence[Box], threshold: float):
+        self.threshold = threshold
+        expanded = np.array([_expand(box, threshold) for box in boxes], dtype=float).reshape(-1, 4)
+        self.edges = [np.sort(expanded[:, k]) for k in range(4)]
+
+        solid = [i for i, box in enumerate(expanded) if _is_solid(tuple(box))]
+        self.solid = expanded[solid]
+        self.cell = 2 * threshold if threshold > 0 else 1.0
+        self.grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        oversized = []
+        for i, box in enumerate(self.solid):
+            cells = self._cells(box)
+            if cells is None:
+                oversized.append(i)
+                continue
+            for cell in cells:
+                self.grid[cell].append(i)
+        self.oversized = np.array(oversized, dtype=int)
+
+    def _cells(self, box):
+        if not np.all(np.isfinite(box)):
+            return None
+        cx0, cy0 = math.floor(box[0] / self.cell), math.floor(box[1] / self.cell)
+        cx1, cy1 = math.floor(box[2] / self.cell), math.floor(box[3] / self.cell)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > _MAX_CELLS_PER_RECT:
+            return None
+        return [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)]
+
+    def close_to_any(self, box: Box) -> bool:
+        r = _expand(box, self.threshold)
+
+        # Alignment: the nearest edge on either side decides
+        for k in (1, 3, 0, 2):
+            edges = self.edges[k]
+            position = np.searchsorted(edges, r[k])
+            for neighbour in (position - 1, position):
+                if 0 <= neighbour < len(edges) and abs(r[k] - edges[neighbour]) < self.threshold:
+                    return True
+
+        if not _is_solid(r) or len(self.solid) == 0:
+            return False
+
+        # Overlap: only rectangles sharing a grid cell can intersect
+        cells = self._cells(np.array(r))
+        if cells is None:
+            candidates = np.arange(len(self.solid))
+        else:
+            found = set()
+            for cell in cells:
+                found.update(self.grid.get(cell, ()))
+            candidates = np.concatenate([np.fromiter(found, dtype=int, count=len(found)), self.oversized])
+        if len(candidates) == 0:
+            return False
+
+        e = self.solid[candidates]
+        return bool(np.any((e[:, 0] < r[2]) & (r[0] < e[:, 2]) &
+                           (e[:, 1] < r[3]) & (r[1] < e[:, 3])))
+
+
+def _first_close(clusters: List[Box], box: Box, threshold: float, start: int = 0) -> int:
+    """Index of the first cluster at or after start that is close to box, or -1"""
+    if len(clusters) - start <= _VECTORIZE_THRESHOLD:
+        for i in range(start, len(clusters)):
+            if _close(clusters[i], box, threshold):
+                return i
+        return -1
+
+    mask = _close_mask(np.array(clusters[start:], dtype=float), box, threshold)
+    hits = np.flatnonzero(mask)
+    return start + int(hits[0]) if len(hits) else -1
+
+
+def cluster_drawings(paths: List[dict],
+                     threshold: float = 150,
+                     axis_threshold: float = 50,
+                     min_size: float = 10,
+                     padding: float = 10) -> List[fitz.Rect]:
+    """
+    Group vector drawing paths into figure regions.
+
+    Produces the same clusters as the original pairwise algorithm: paths are
+    greedily added to the first close cluster, tiny paths are kept only when
+    close to an axis, and clusters are merged until no two are close. The
+    proximity tests are answered by sorted edge arrays, a grid index and
+    vectorized scans instead of repeated all-pairs loops.
+
+    Args:
+        paths (List[dict]): Drawing paths as returned by page.get_drawings()
+        threshold (float): Proximity threshold between clusters
+        axis_threshold (float): Proximity threshold between tiny paths and axes
+        min_size (float): Paths narrower or shorter than this need a nearby axis
+        padding (float): Padding added whenever two rectangles are merged
+
+    Returns:
+        List[fitz.Rect]: Bounding boxes of the clusters
+    """
+    bounds = [tuple(get_path_bounds(path)) for path in paths]
+
+    # First identify potential axes and significant paths
+    axis_paths = [bbox for path, bbox in zip(paths, bounds)
+                  if is_likely_axis(path) or path.get('type') in AXIS_PATH_TYPES]
+    axis_index = None
+
+    # First pass: create initial clusters including axes and all significant paths
+    clusters: List[Box] = []
+    for bbox in bounds:
+        if max(0, bbox[2] - bbox[0]) < min_size or max(0, bbox[3] - bbox[1]) < min_size:
+            if not axis_paths:
+                continue
+            if axis_index is None:
+                axis_index = _ProximityIndex(axis_paths, axis_threshold)
+            if not axis_index.close_to_any(bbox):
+                continue
+
+        i = _first_close(clusters, bbox, threshold)
+        if i >= 0:
+            clusters[i] = _merge(clusters[i], bbox, padding)
+        else:
+            clusters.append(bbox)
+
+    # Second pass: merge clusters until no two of them are close
+    merged = True
+    while merged:
+        merged = False
+        i = 0
+        while i < len(clusters):
+            j = i + 1
+            while True:
+                j = _first_close(clusters, clusters[i], threshold, start=j)
+                if j < 0:
+                    break
+                clusters[i] = _merge(clusters[i], clusters[j], padding)
+                clusters.pop(j)
+                merged = True
+            i += 1
+
+    return [fitz.Rect(cluster) for cluster in clusters]
@@ -0,0 +1,143 @@
+import mmap
+from pathlib import Path
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple, Type, Union
+
+import fitz  # PyMuPDF
+
+from . import FITZ_LOCK, BaseConverter, open_document
+from .markdown import MarkdownConverter
+from .selection import section_pages
+from ..stats import ConversionStats
+
+
+class DocumentPage:
+    """A page of a Document, converted the first time its content is read"""
+
+    def __init__(self, document: "Document", number: int):
+        self.document = document
+        self.number = number
+
+    @property
+    def content(self) -> str:
+        """Converted content of the page, empty if its conversion failed"""
+        self.document.load([self.number])
+        return self.document._contents.get(self.number, "")
+
+    @property
+    def markdown(self) -> str:
+        """Converted content of the page (Markdown with the default converter)"""
+        return self.content
+
+    @property
+    def images(self) -> List[Tuple[str, Optional[bytes]]]:
+        """Images extracted from the page as (name, bytes) pairs, bytes are None with an image sink"""
+        self.document.load([self.number])
+        return self.document._images.get(self.number, [])
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the page was converted already"""
+        return self.number in self.document._contents
+
+    def __repr__(self) -> str:
+        return f"DocumentPage(number={self.number}, loaded={self.loaded})"
+
+
+class Document:
+    """
+    Lazily converted document.
+
+    Opening the document only reads its page count and table of contents;
+    no converter or LLM client is set up until the content of a page is
+    read. Each page is then converted on its own and memoized, so a viewer
+    only pays for the pages it shows. load() converts several pages in one parallel
+    run, e.g. to prefetch the pages around the visible one. Pages whose
+    conversion failed are tried again on their next access.
+
+    Example:
+        document = Document("report.pdf", api_key)
+        print(document.pages[41].markdown)
+        for page in document.section("Results"):
+            print(page.markdown)
+    """
+
+    def __init__(self,
+                 doc_path: Union[str, Path, bytes, mmap.mmap, fitz.Document],
+                 api_key: str,
+                 converter_class: Type[BaseConverter] = MarkdownConverter,
+                 llm_type: str = "gpt4-vision",
+                 **converter_kwargs):
+        """
+        Open the document.
+
+        Args:
+            doc_path (Union[str, Path, bytes, mmap.mmap, fitz.Document]): Document to convert,
+                in any form the converters accept
+            api_key (str): API key for the LLM service
+            converter_class (Type[BaseConverter]): Converter used for the pages
+            llm_type (str): Type of LLM to use (default: "gpt4-vision")
+            **converter_kwargs: Further arguments of the converter class
+        """
+        self.doc_path = doc_path
+        self.api_key = api_key
+        self.converter_class = converter_class
+        self.llm_type = llm_type
+        # Without a client the converters use the one LLMFactory shares
+        self.llm_client = converter_kwargs.pop("llm_client", None)
+        self.converter_kwargs = converter_kwargs
+        # Timings and counters summed over all pages converted so far
+        self.stats = ConversionStats()
+        self._contents: Dict[int, str] = {}
+        self._images: Dict[int, List[Tuple[str, Optional[bytes]]]] = {}
+        self._lock = threading.Lock()
+
+        with open_document(doc_path, self.stats) as pdf_document, FITZ_LOCK:
+            self.page_count = len(pdf_document)
+            self.toc = pdf_document.get_toc()
+        self.pages = [DocumentPage(self, page_num) for page_num in range(self.page_count)]
+
+    def __len__(self) -> int:
+        return self.page_count
+
+    def section(self, title: str) -> List[DocumentPage]:
+        """
+        Pages of the table of contents sections with the given title, matched case-insensitively.
+
+        Raises:
+            ValueError: If the title is not in the table of contents
+        """
+        return [self.pages[page_num] for page_num in section_pages(self.toc, self.page_count, [title])]
+
+    def load(self, page_nums: Iterable[int]) -> None:
+        """
+        Convert the pages that were not converted yet, in a single run.
+
+        Conversions are serialized; pages of one run are converted in parallel.
+
+        Args:
+            page_nums (Iterable[int]): 0-based numbers of the pages
+        """
+        with self._lock:
+            missing = sorted({page_num for page_num in page_nums if page_num not in self._contents})
+            if not missing:
+                return
+
+            converter = self._new_converter(missing)
+            for page_num, content in converter.convert_iter():
+                # Failed pages are not memoized so the next access tries again
+                if page_num in converter.failed_pages:
+                    continue
+                self._contents[page_num] = converter._link_images(page_num, content)
+                self._images[page_num] = converter.image_store.page_images(page_num)
+            self.stats.merge(converter.stats.to_dict())
+
+    def _new_converter(self, page_nums: List[int]) -> BaseConverter:
+        return self.converter_class(
+            self.doc_path,
+            self.api_key,
+            llm_type=self.llm_type,
+            llm_client=self.llm_client,
+            pages=page_nums,
+            **self.converter_kwargs,
+        )
@@ -0,0 +1,236 @@
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .sinks import ImageSink
+
+# Marks an xref that was looked at and produced no image
+_SKIPPED = object()
+
+Box = Tuple[float, float, float, float]
+
+
+def reading_order(boxes: List[Box]) -> List[int]:
+    """
+    Order boxes top to bottom, then left to right.
+
+    Boxes whose top lies above the bottom of the current row join it, so
+    figures side by side stay left to right when their tops differ by a
+    point or two.
+
+    Returns:
+        List[int]: Indices of the boxes in reading order
+    """
+    order = []
+    row: List[int] = []
+    row_bottom = None
+    for index in sorted(range(len(boxes)), key=lambda index: (boxes[index][1], boxes[index][0])):
+        x0, y0, x1, y1 = boxes[index]
+        if row and y0 >= row_bottom:
+            order.extend(sorted(row, key=lambda index: boxes[index][0]))
+            row = []
+        row_bottom = y1 if not row else min(row_bottom, y1)
+        row.append(index)
+    order.extend(sorted(row, key=lambda index: boxes[index][0]))
+    return order
+
+
+def perceptual_hash(image, hash_size: int = 8) -> int:
+    """
+    Compute the difference hash (dHash) of a PIL image.
+
+    Near-identical images, e.g. the same vector figure rendered with a
+    slightly different clip, get hashes a few bits apart.
+    """
+    from PIL import Image
+
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+class ImageStore:
+    """
+    Per-document store of extracted images.
+
+    Every distinct image is kept once; pages only hold references to it.
+    Extraction results are memoized by xref so an image repeated on many
+    pages (logos, headers, watermarks) is decoded a single time, and
+    images are deduplicated by content hash and optionally by perceptual
+    hash for near-duplicate renders.
+
+    With a sink, every distinct image is written to it when it is added
+    and only its name and link are kept, so memory does not grow with the
+    number of figures. Without one, the bytes are kept in ``images``.
+
+    References added with their position on the page are kept in reading
+    order, so ``pages`` lists the images of a page in the order the
+    converted content refers to them.
+    """
+
+    def __init__(self, perceptual_threshold: Optional[int] = None, sink: Optional[ImageSink] = None):
+        """
+        Initialize the store.
+
+        Args:
+            perceptual_threshold (Optional[int]): Maximum Hamming distance between the
+                perceptual hashes of two images considered the same, None to disable
+            sink (Optional[ImageSink]): Destination the images are written to instead of memory
+        """
+        self.perceptual_threshold = perceptual_threshold
+        self.sink = sink
+        self.images: Dict[str, bytes] = {}
+        self.links: Dict[str, str] = {}
+        self.pages: Dict[int, List[str]] = {}
+        self._boxes: Dict[int, List[Optional[Box]]] = {}
+        self._by_digest: Dict[str, str] = {}
+        self._by_xref: Dict[int, object] = {}
+        self._aliases: Dict[str, str] = {}
+        self._perceptual: List[Tuple[int, str]] = []
+        self._lock = threading.Lock()
+
+    def start_page(self, page_num: int) -> None:
+        """Reset the references of a page before (re-)extracting it"""
+        with self._lock:
+            self.pages[page_num] = []
+            self._boxes[page_num] = []
+
+    def lookup_xref(self, xref: int) -> Tuple[bool, Optional[str]]:
+        """
+        Look up the memoized extraction of an xref.
+
+        Returns:
+            Tuple[bool, Optional[str]]: Whether the xref was seen before and
+                the name of its image (None if it produced no image)
+        """
+        with self._lock:
+            # Inline images have no xref and cannot be memoized
+            if not xref or xref not in self._by_xref:
+                return False, None
+            name = self._by_xref[xref]
+            return True, None if name is _SKIPPED else name
+
+    def skip_xref(self, xref: int) -> None:
+        """Remember that an xref produced no image"""
+        if not xref:
+            return
+        with self._lock:
+            self._by_xref[xref] = _SKIPPED
+
+    def add(self,
+            page_num: int,
+            name: str,
+            data: bytes,
+            xref: Optional[int] = None,
+            image=None,
+            bbox: Optional[Box] = None) -> str:
+        """
+        Store an image and reference it from a page.
+
+        Args:
+            page_num (int): Page the image appears on
+            name (str): Proposed file name of the image
+            data (bytes): Encoded image
+            xref (Optional[int]): PDF xref the image was extracted from
+            image (Optional[PIL.Image.Image]): Decoded image, used for perceptual deduplication
+            bbox (Optional[Box]): Position of the image on the page
+
+        Returns:
+            str: Name of the stored copy, which differs from name for duplicates
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        fingerprint = None
+        if image is not None and self.perceptual_threshold is not None:
+            fingerprint = perceptual_hash(image)
+
+        with self._lock:
+            canonical = self._by_digest.get(digest)
+            if canonical is None and fingerprint is not None:
+                for other, other_name in self._perceptual:
+                    if bin(fingerprint ^ other).count("1") <= self.perceptual_threshold:
+                        canonical = other_name
+                        break
+
+            if canonical is None:
+                canonical = name
+                if self.sink is not None:
+                    self.links[name] = self.sink.write(name, data)
+                else:
+                    self.images[name] = data
+                    self.links[name] = name
+                self._by_digest[digest] = name
+                if fingerprint is not None:
+                    self._perceptual.append((fingerprint, name))
+
+            if name != canonical:
+                self._aliases[name] = canonical
+            if xref:
+                self._by_xref[xref] = canonical
+            self._reference(page_num, canonical, bbox)
+            return canonical
+
+    def add_reference(self, page_num: int, name: str, bbox: Optional[Box] = None) -> str:
+        """
+        Reference an already stored image from a page.
+
+        Args:
+            page_num (int): Page the image appears on
+            name (str): Name of the stored image
+            bbox (Optional[Box]): Position of the image on the page
+
+        Returns:
+            str: Name of the stored copy
+        """
+        with self._lock:
+            canonical = self._aliases.get(name, name)
+            self._reference(page_num, canonical, bbox)
+            return canonical
+
+    def _reference(self, page_num: int, name: str, bbox: Optional[Box]) -> None:
+        # Called with the lock held
+        names = self.pages.setdefault(page_num, [])
+        boxes = self._boxes.setdefault(page_num, [])
+        names.append(name)
+        boxes.append(tuple(bbox) if bbox is not None else None)
+        if bbox is None or None in boxes:
+            return
+        order = reading_order(boxes)
+        names[:] = [names[index] for index in order]
+        boxes[:] = [boxes[index] for index in order]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.links
+
+    def __len__(self) -> int:
+        return len(self.links)
+
+    def link(self, name: str) -> str:
+        """Link to a stored image for the converted document"""
+        with self._lock:
+            return self.links[self._aliases.get(name, name)]
+
+    def page_images(self, page_num: int) -> List[Tuple[str, Optional[bytes]]]:
+        """Images referenced by a page as (name, bytes) pairs, bytes are None for images written to the sink"""
+        with self._lock:
+            return [(name, self.images.get(name)) for name in self.pages.get(page_num, [])]
+
+    def pop_page(self, page_num: int) -> List[Tuple[str, Optional[bytes]]]:
+        """
+        Remove a page and hand out its references.
+
+        The bytes of an image are handed out only with its first reference;
+        later references carry None, so callers can ship each image once.
+        """
+        with self._lock:
+            names = self.pages.pop(page_num, [])
+            self._boxes.pop(page_num, None)
+            shipped = []
+            for name in names:
+                self.links.pop(name, None)
+                shipped.append((name, self.images.pop(name, None)))
+            return shipped
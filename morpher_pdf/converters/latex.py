@@ -2,6 +2,8 @@ from . import BaseConverter
 from typing import List
 
 class LaTeXConverter(BaseConverter):
+    output_extension = ".tex"
+    
     def _process_chunk(self, chunk: bytes) -> str:
         """Convert chunk to LaTeX using LLM"""
         # Implement OpenAI vision API call to convert image to LaTeX
@@ -0,0 +1,222 @@
+from typing import List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from .textlayer import _is_math_char
+
+# Kinds of regions a page is cut into
+TEXT = "text"
+TABLE = "table"
+FIGURE = "figure"
+FORMULA = "formula"
+
+# Blocks at least this fraction of the content width span all columns
+FULL_WIDTH = 0.6
+# Regions overlapping by more than this fraction of the smaller one are merged
+MERGE_OVERLAP = 0.1
+# Points of margin kept around every region so glyphs on its edge are not cut
+REGION_PADDING = 4
+
+
+class Region:
+    """Part of a page sent to the LLM on its own"""
+
+    def __init__(self, rect: fitz.Rect, kind: str):
+        self.rect = rect
+        self.kind = kind
+
+    def __repr__(self) -> str:
+        return f"Region({self.kind!r}, {tuple(round(value) for value in self.rect)})"
+
+
+def _x_overlap(a: fitz.Rect, b: fitz.Rect) -> float:
+    return max(0.0, min(a.x1, b.x1) - max(a.x0, b.x0))
+
+
+def _same_column(a: fitz.Rect, b: fitz.Rect) -> bool:
+    """Whether two boxes share their horizontal extent, so stacking them covers nothing else"""
+    narrower, wider = sorted((a.width, b.width))
+    return wider > 0 and narrower / wider > 0.8 and _x_overlap(a, b) >= 0.8 * narrower
+
+
+def _columns(items: List[Region]) -> List[List[Region]]:
+    """Split the items of a band into columns of horizontally overlapping items, left to right"""
+    columns: List[List[Region]] = []
+    extents: List[List[float]] = []
+    for item in sorted(items, key=lambda item: item.rect.x0):
+        if extents and item.rect.x0 < extents[-1][1]:
+            columns[-1].append(item)
+            extents[-1][1] = max(extents[-1][1], item.rect.x1)
+        else:
+            columns.append([item])
+            extents.append([item.rect.x0, item.rect.x1])
+    return columns
+
+
+def _overlap_fraction(a: fitz.Rect, b: fitz.Rect) -> float:
+    """Overlap of two boxes as a fraction of the smaller one"""
+    smaller = min(abs(a), abs(b))
+    return abs(a & b) / smaller if smaller else 0.0
+
+
+def _overlaps(rect: fitz.Rect, others: List[Region]) -> bool:
+    return any(_overlap_fraction(rect, other.rect) > MERGE_OVERLAP for other in others)
+
+
+def page_regions(page,
+                 clusters: Optional[List[fitz.Rect]] = None,
+                 max_math_chars: int = 2) -> List[Region]:
+    """
+    Cut a page into regions in reading order.
+
+    Text blocks from ``page.get_text("blocks")`` and the drawing clusters
+    of the figure extraction are grouped into bands separated by blocks
+    spanning the page, and the bands into columns. Consecutive text in a
+    column forms one region; drawings with text inside are tables, other
+    drawings and images figures, and blocks full of math symbols formulas,
+    each a region of its own.
+
+    Args:
+        page (fitz.Page): Page to cut
+        clusters (Optional[List[fitz.Rect]]): Drawing clusters of the page, as computed
+            by the figure extraction (default: clustered from the page drawings)
+        max_math_chars (int): Math symbols a text block may hold before it is a formula
+
+    Returns:
+        List[Region]: Regions top to bottom, columns left to right
+    """
+    if clusters is None:
+        from .clustering import cluster_drawings
+        clusters = cluster_drawings(page.get_drawings())
+
+    page_rect = page.rect
+    graphics = [Region(cluster & page_rect, FIGURE) for cluster in clusters]
+    graphics = [region for region in graphics if not region.rect.is_empty]
+
+    items = list(graphics)
+    cells: List[Tuple[Region, fitz.Rect]] = []
+    for x0, y0, x1, y1, text, _, block_type in page.get_text("blocks"):
+        rect = fitz.Rect(x0, y0, x1, y1) & page_rect
+        if rect.is_empty:
+            continue
+        if block_type == 1:
+            items.append(Region(rect, FIGURE))
+            continue
+        # Text mostly inside ruled drawings is a table, sent with its rulings
+        owner = next((region for region in graphics if abs(rect & region.rect) > 0.5 * abs(rect)), None)
+        if owner is not None:
+            cells.append((owner, rect))
+            continue
+        math_chars = sum(1 for char in text if _is_math_char(char))
+        items.append(Region(rect, FORMULA if math_chars > max_math_chars else TEXT))
+    # Clusters only grow once every block is assigned, so they do not swallow their neighbours
+    for owner, rect in cells:
+        owner.kind = TABLE
+        owner.rect |= rect
+    if not items:
+        return []
+
+    content = fitz.Rect(items[0].rect)
+    for item in items[1:]:
+        content |= item.rect
+
+    # Bands of columns between the blocks spanning the page
+    bands: List[List[Region]] = []
+    current: List[Region] = []
+    for item in sorted(items, key=lambda item: (item.rect.y0, item.rect.x0)):
+        if item.rect.width >= FULL_WIDTH * content.width:
+            if current:
+                bands.append(current)
+                current = []
+            bands.append([item])
+        else:
+            current.append(item)
+    if current:
+        bands.append(current)
+
+    regions: List[Region] = []
+    for band in bands:
+        for column in _columns(band):
+            for item in sorted(column, key=lambda item: item.rect.y0):
+                previous = regions[-1] if regions else None
+                if (previous is not None and item.kind == TEXT and previous.kind == TEXT
+                        and _same_column(previous.rect, item.rect)):
+                    previous.rect |= item.rect
+                else:
+                    regions.append(Region(fitz.Rect(item.rect), item.kind))
+
+    # Regions grown into each other, e.g. a figure and the labels it overlaps, are merged
+    merged: List[Region] = []
+    for region in regions:
+        previous = merged[-1] if merged else None
+        if previous is not None and _overlap_fraction(previous.rect, region.rect) > MERGE_OVERLAP:
+            previous.rect |= region.rect
+            if previous.kind == TEXT:
+                previous.kind = region.kind
+        else:
+            merged.append(region)
+    return merged
+
+
+def tile_page(page,
+              clusters: Optional[List[fitz.Rect]] = None,
+              max_regions: int = 8,
+              min_chars: int = 1500,
+              min_region_fraction: float = 0.03) -> Optional[List[Region]]:
+    """
+    Decide whether a page is worth tiling and return its regions.
+
+    Only dense pages are tiled: pages with a lot of text or with tables or
+    formulas, that fall apart into at least two regions. Regions smaller
+    than min_region_fraction of the page are merged into a neighbour in
+    reading order where that covers no other region. Pages with more than
+    max_regions regions are sent whole, as are pages where regions overlap.
+
+    Args:
+        page (fitz.Page): Page to tile
+        clusters (Optional[List[fitz.Rect]]): Drawing clusters of the page from the figure extraction
+        max_regions (int): Most regions a page is cut into
+        min_chars (int): Text a page needs to be tiled without tables or formulas
+        min_region_fraction (float): Smallest region, as a fraction of the page area
+
+    Returns:
+        Optional[List[Region]]: Regions padded and in reading order, or None to send the whole page
+    """
+    regions = page_regions(page, clusters)
+    if len(regions) < 2:
+        return None
+    dense = any(region.kind in (TABLE, FORMULA) for region in regions)
+    if not dense and len(page.get_text("text")) < min_chars:
+        return None
+
+    page_rect = page.rect
+    min_area = min_region_fraction * abs(page_rect)
+    index = 0
+    while index < len(regions) and len(regions) > 1:
+        region = regions[index]
+        if abs(region.rect) >= min_area:
+            index += 1
+            continue
+        # Headers, page numbers and captions join the next region, or the previous one
+        for neighbour in (index + 1, index - 1):
+            if not 0 <= neighbour < len(regions):
+                continue
+            union = region.rect | regions[neighbour].rect
+            others = [other for position, other in enumerate(regions) if position not in (index, neighbour)]
+            if not _overlaps(union, others):
+                regions[neighbour].rect = union
+                if regions[neighbour].kind == TEXT:
+                    regions[neighbour].kind = region.kind
+                del regions[index]
+                break
+        else:
+            index += 1
+
+    if not 2 <= len(regions) <= max_regions:
+        return None
+    # Content in two overlapping regions would be converted twice
+    if any(_overlaps(region.rect, regions[index + 1:]) for index, region in enumerate(regions)):
+        return None
+    for region in regions:
+        region.rect = (region.rect + (-REGION_PADDING, -REGION_PADDING, REGION_PADDING, REGION_PADDING)) & page_rect
+    return regions
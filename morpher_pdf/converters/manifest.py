@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+from .sinks import ImageSink
+
+logger = logging.getLogger(__name__)
+
+
+def page_fingerprint(pdf_document, page) -> str:
+    """
+    Fingerprint the content of a page.
+
+    Covers the page geometry, its content streams, the raw streams of the
+    images and form XObjects it uses, its fonts and its annotations. Xref
+    numbers are left out so a page keeps its fingerprint when the document
+    is rewritten or pages are moved around.
+
+    Args:
+        pdf_document (fitz.Document): Document the page belongs to
+        page (fitz.Page): Page to fingerprint
+
+    Returns:
+        str: Hex digest identifying the page content
+    """
+    digest = hashlib.sha256()
+    digest.update(repr((tuple(page.rect), page.rotation)).encode("utf-8"))
+    digest.update(page.read_contents())
+
+    for image in page.get_images(full=True):
+        xref, smask = image[0], image[1]
+        for stream_xref in (xref, smask):
+            if stream_xref:
+                digest.update(pdf_document.xref_stream_raw(stream_xref) or b"")
+
+    for xobject in page.get_xobjects():
+        digest.update(pdf_document.xref_stream_raw(xobject[0]) or b"")
+
+    for font in page.get_fonts():
+        # Everything but the xref: extension, type, base font, name and encoding
+        digest.update(repr(font[1:]).encode("utf-8"))
+
+    for annot in page.annots() or []:
+        digest.update(repr((annot.type, tuple(annot.rect), annot.info.get("content"))).encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+class ConversionManifest:
+    """
+    Per-page record of a previous conversion, kept in a directory next to the output.
+
+    The directory holds ``manifest.json`` with the fingerprint, converted
+    content and image names of every page, and an ``images`` directory
+    with one file per image. A manifest written with different conversion
+    settings is ignored.
+    """
+
+    FILE_NAME = "manifest.json"
+    IMAGE_DIR = "images"
+    VERSION = 1
+
+    def __init__(self, directory: str, settings: str):
+        """
+        Load the manifest of a previous conversion, if any.
+
+        Args:
+            directory (str): Directory holding the manifest
+            settings (str): Digest of the conversion settings the manifest must match
+        """
+        self.directory = directory
+        self.settings = settings
+        self.pages: Dict[str, Dict] = {}
+
+        path = os.path.join(directory, self.FILE_NAME)
+        if not os.path.isfile(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable manifest %s: %s", path, e)
+            return
+
+        if data.get("version") != self.VERSION or data.get("settings") != settings:
+            return
+        for entry in data.get("pages", []):
+            self.pages[entry["fingerprint"]] = entry
+
+    @property
+    def fingerprints(self) -> set:
+        return set(self.pages)
+
+    def lookup(self, fingerprint: str) -> Optional[Dict]:
+        """Previous result of a page with the given fingerprint"""
+        return self.pages.get(fingerprint)
+
+    def mirror(self, sink: ImageSink) -> ImageSink:
+        """Sink that also keeps a copy of every image in the manifest directory"""
+        return _MirroredImageSink(os.path.join(self.directory, self.IMAGE_DIR), sink)
+
+    def load_image(self, name: str) -> bytes:
+        with open(os.path.join(self.directory, self.IMAGE_DIR, name), "rb") as f:
+            return f.read()
+
+    def save(self, pages: List[Dict], get_image: Callable[[str], bytes]) -> None:
+        """
+        Replace the manifest with the pages of the current conversion.
+
+        Image files of pages that no longer exist are removed.
+
+        Args:
+            pages (List[Dict]): Fingerprint, content and image names of each page, in page order
+            get_image (Callable[[str], bytes]): Returns the bytes of an image by name
+        """
+        image_dir = os.path.join(self.directory, self.IMAGE_DIR)
+        os.makedirs(image_dir, exist_ok=True)
+
+        referenced = set()
+        for entry in pages:
+            for name in entry["images"]:
+                referenced.add(name)
+                path = os.path.join(image_dir, name)
+                if not os.path.exists(path):
+                    with open(path, "wb") as f:
+                        f.write(get_image(name))
+
+        for name in os.listdir(image_dir):
+            if name not in referenced:
+                os.remove(os.path.join(image_dir, name))
+
+        # Write atomically so a crash never leaves a truncated manifest behind
+        path = os.path.join(self.directory, self.FILE_NAME)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "settings": self.settings, "pages": pages}, f)
+        os.replace(path + ".tmp", path)
+
+        self.pages = {entry["fingerprint"]: entry for entry in pages}
+
+
+class _MirroredImageSink(ImageSink):
+    """Copies images into the manifest image directory before passing them on to another sink"""
+
+    def __init__(self, directory: str, sink: ImageSink):
+        super().__init__()
+        self.directory = directory
+        self.sink = sink
+
+    def write(self, name: str, data: bytes) -> str:
+        super().write(name, data)
+        return self.sink.write(name, data)
+
+    def _write(self, name: str, data: bytes) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(data)
+        return path
@@ -1,16 +1,138 @@
+import asyncio
+import logging
+import re
+from typing import Callable, List, Optional
+
 from . import BaseConverter
+from ..llm.prompts import (
+    MARKDOWN_CONVERTER_PROMPT,
+    MARKDOWN_SINGLE_TASK_PROMPT,
+    multi_page_prompt,
+    split_multi_page_response,
+)
+from ..llm.streaming import TagStreamParser
+
+logger = logging.getLogger(__name__)
+
+# ![description](target) image reference, as asked for by the prompt
+IMAGE_REFERENCE = re.compile(r"!\[([^\]]*)\]\(([^)]*)\)")
 
 class MarkdownConverter(BaseConverter):
-    def __init__(self, *args, **kwargs):
+    prompt = MARKDOWN_CONVERTER_PROMPT
+    output_extension = ".md"
+    
+    def __init__(self, *args, single_task_prompt: bool = False, **kwargs):
+        """
+        Initialize the converter.
+        
+        Args:
+            single_task_prompt (bool): Ask for the Markdown only, instead of a plain text
+                transcript followed by the Markdown, which halves the output tokens
+            *args, **kwargs: Arguments of BaseConverter
+        """
         super().__init__(*args, **kwargs)
+        if single_task_prompt:
+            self.prompt = MARKDOWN_SINGLE_TASK_PROMPT
+            self.output_tag = "markdown"
     
     def _process_page(self, page: bytes) -> str:
         """Convert chunk to Markdown using LLM"""
-        return self._rewrite_page(self.llm_client.process_image(page))
+        return self._rewrite_page(self.llm_client.process_image(page, self.prompt))
+    
+    async def _aprocess_page(self, page: bytes) -> str:
+        """Asynchronously convert page to Markdown using LLM"""
+        return self._rewrite_page(await self.llm_client.aprocess_image(page, self.prompt))
+    
+    def _process_region(self, image: bytes, kind: str) -> Optional[str]:
+        """Convert a region of a tiled page to Markdown using LLM"""
+        return self._rewrite_page(self.llm_client.process_image(image, self._region_prompt(kind)))
+    
+    async def _aprocess_region(self, image: bytes, kind: str) -> Optional[str]:
+        """Asynchronously convert a region of a tiled page to Markdown using LLM"""
+        return self._rewrite_page(await self.llm_client.aprocess_image(image, self._region_prompt(kind)))
+    
+    def _stream_page(self, page: bytes, on_delta: Callable[[str], None]) -> Optional[str]:
+        """Convert page to Markdown, passing the Markdown to on_delta as it is generated"""
+        parser = TagStreamParser(self.output_tag)
+        for chunk in self.llm_client.stream_image(page, self.prompt):
+            delta = parser.feed(chunk)
+            if delta:
+                on_delta(delta)
+        if parser.result is None:
+            logger.warning("No markdown tags found in content")
+        return parser.result
+    
+    async def _astream_page(self, page: bytes, on_delta: Callable[[str], None]) -> Optional[str]:
+        """Asynchronously convert page to Markdown, passing the Markdown to on_delta as it is generated"""
+        parser = TagStreamParser(self.output_tag)
+        async for chunk in self.llm_client.astream_image(page, self.prompt):
+            delta = parser.feed(chunk)
+            if delta:
+                on_delta(delta)
+        if parser.result is None:
+            logger.warning("No markdown tags found in content")
+        return parser.result
+    
+    def _process_pages(self, pages: List[bytes]) -> List[Optional[str]]:
+        """Convert several pages to Markdown in a single LLM request"""
+        if not self.llm_client.supports_multiple_images:
+            return super()._process_pages(pages)
+        response = self.llm_client.process_images(pages, multi_page_prompt(self.prompt, len(pages)))
+        contents = self._split_pages(response, len(pages))
+        # Pages missing from the response are retried on their own
+        return [content if content is not None else self._process_page(page)
+                for content, page in zip(contents, pages)]
+    
+    async def _aprocess_pages(self, pages: List[bytes]) -> List[Optional[str]]:
+        """Asynchronously convert several pages to Markdown in a single LLM request"""
+        if not self.llm_client.supports_multiple_images:
+            return await super()._aprocess_pages(pages)
+        response = await self.llm_client.aprocess_images(pages, multi_page_prompt(self.prompt, len(pages)))
+        contents = self._split_pages(response, len(pages))
+        
+        async def fallback(content: Optional[str], page: bytes) -> Optional[str]:
+            return content if content is not None else await self._aprocess_page(page)
+        
+        return list(await asyncio.gather(*(fallback(content, page) for content, page in zip(contents, pages))))
+    
+    def _split_pages(self, response: str, page_count: int) -> List[Optional[str]]:
+        """Per-page Markdown of a multi-page response, None for pages that could not be parsed"""
+        with self.stats.stage("parse"):
+            parts = split_multi_page_response(response, page_count)
+        if parts is None:
+            logger.warning("Could not split a response covering %s pages, retrying page by page", page_count)
+            return [None] * page_count
+        return [self._rewrite_page(part) for part in parts]
     
     def _merge_content(self) -> str:
         """Merge content with Markdown-specific formatting"""
         # Join pages with proper markdown formatting
         # Handle image references in markdown format
-        merged_content = "\n".join(self.page_contents)
+        merged_content = "\n".join(self._link_images(page_num, content)
+                                   for page_num, content in zip(self.page_numbers, self.page_contents))
         return merged_content
+    
+    def _link_images(self, page_num: int, content: str) -> str:
+        """
+        Point the image references of a page at its extracted images.
+        
+        The image store keeps the images of a page in reading order, so the
+        n-th reference links to the n-th image from the top left. If the
+        page has more or fewer references than images, there is no telling
+        which reference shows which image and they are left unchanged.
+        """
+        links = [self.image_store.link(name) for name in self.image_store.pages.get(page_num, [])]
+        if not links or not content:
+            return content
+        if len(IMAGE_REFERENCE.findall(content)) != len(links):
+            return content
+        links.reverse()
+        
+        def replace(match: re.Match) -> str:
+            link = links.pop()
+            # Destinations with spaces or parentheses must be enclosed in angle brackets
+            if re.search(r"[\s()]", link):
+                link = f"<{link}>"
+            return f"![{match.group(1)}]({link})"
+        
+        return IMAGE_REFERENCE.sub(replace, content)
@@ -0,0 +1,129 @@
+import io
+import time
+from typing import Dict, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+# PDF user space is 72 units per inch
+POINTS_PER_INCH = 72
+
+IMAGE_FORMATS = ("png", "jpeg", "webp")
+
+
+class RenderOptions:
+    """Settings controlling how pages are rendered before they are sent to the LLM"""
+
+    def __init__(self,
+                 dpi: int = 216,
+                 max_long_edge: Optional[int] = None,
+                 grayscale: bool = False,
+                 image_format: str = "png",
+                 quality: int = 85,
+                 adaptive: bool = False,
+                 min_dpi: int = 100,
+                 max_dpi: int = 300,
+                 dense_chars_per_square_inch: float = 40.0):
+        """
+        Initialize the render options.
+
+        Args:
+            dpi (int): Render resolution (default: 216, a 3x zoom)
+            max_long_edge (Optional[int]): Upper bound of the longer side of the render in pixels
+            grayscale (bool): Render without color
+            image_format (str): Encoding of the render, one of "png", "jpeg" or "webp"
+            quality (int): Quality of lossy encodings (1-100)
+            adaptive (bool): Pick the resolution between min_dpi and max_dpi from the text density
+            min_dpi (int): Resolution of pages with little text in adaptive mode
+            max_dpi (int): Resolution of pages with dense text in adaptive mode
+            dense_chars_per_square_inch (float): Text density that gets max_dpi in adaptive mode
+
+        Raises:
+            ValueError: If image_format is not supported
+        """
+        image_format = image_format.lower()
+        if image_format == "jpg":
+            image_format = "jpeg"
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format}")
+
+        self.dpi = dpi
+        self.max_long_edge = max_long_edge
+        self.grayscale = grayscale
+        self.image_format = image_format
+        self.quality = quality
+        self.adaptive = adaptive
+        self.min_dpi = min_dpi
+        self.max_dpi = max_dpi
+        self.dense_chars_per_square_inch = dense_chars_per_square_inch
+
+    def resolve_dpi(self, page, clip: Optional[fitz.Rect] = None) -> float:
+        """Choose the render resolution for a page, or for the part of it inside clip"""
+        dpi = self.dpi
+        rect = page.rect if clip is None else clip
+        if self.adaptive:
+            area = (rect.width / POINTS_PER_INCH) * (rect.height / POINTS_PER_INCH)
+            chars = len(page.get_text("text", clip=clip).strip())
+            # Pages without a text layer (e.g. scans) keep the base resolution
+            if chars and area:
+                density = min(1.0, chars / area / self.dense_chars_per_square_inch)
+                dpi = self.min_dpi + (self.max_dpi - self.min_dpi) * density
+
+        if self.max_long_edge:
+            long_edge = max(rect.width, rect.height) / POINTS_PER_INCH
+            if long_edge:
+                dpi = min(dpi, self.max_long_edge / long_edge)
+        return dpi
+
+
+def render_page(page,
+                options: Optional[RenderOptions] = None,
+                clip: Optional[fitz.Rect] = None) -> Tuple[bytes, Dict[str, float]]:
+    """
+    Render a page to an encoded image.
+
+    With a clip only that region of the page is rendered; the resolution,
+    including the max_long_edge bound and adaptive density, is then sized
+    for the region rather than the whole page.
+
+    Args:
+        page (fitz.Page): Page to render
+        options (Optional[RenderOptions]): Render settings (default: 216 dpi PNG)
+        clip (Optional[fitz.Rect]): Region of the page to render
+
+    Returns:
+        Tuple[bytes, Dict[str, float]]: Encoded image and render statistics
+            (resolution, pixel size, payload bytes and seconds spent rendering,
+            encoding and in total)
+    """
+    options = options or RenderOptions()
+    start = time.perf_counter()
+
+    dpi = options.resolve_dpi(page, clip)
+    zoom = dpi / POINTS_PER_INCH
+    colorspace = fitz.csGRAY if options.grayscale else fitz.csRGB
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace, alpha=False, clip=clip)
+    rendered = time.perf_counter()
+
+    if options.image_format == "png":
+        image_bytes = pix.tobytes("png")
+    elif options.image_format == "jpeg":
+        image_bytes = pix.tobytes("jpeg", jpg_quality=options.quality)
+    else:
+        from PIL import Image
+
+        mode = "L" if options.grayscale else "RGB"
+        img = Image.frombytes(mode, [pix.width, pix.height], pix.samples)
+        output = io.BytesIO()
+        img.save(output, format="WEBP", quality=options.quality)
+        image_bytes = output.getvalue()
+
+    stats = {
+        "dpi": dpi,
+        "width": pix.width,
+        "height": pix.height,
+        "bytes": len(image_bytes),
+        "render_seconds": rendered - start,
+        "encode_seconds": time.perf_counter() - rendered,
+        "seconds": time.perf_counter() - start,
+    }
+    return image_bytes, stats
@@ -0,0 +1,283 @@
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from ..llm.factory import provider_of
+from .textlayer import MATH_FONT_PATTERN, _is_math_char, _spans
+
+# Page classes of classify_page()
+BLANK = "blank"
+SIMPLE = "simple"
+COMPLEX = "complex"
+
+# Cheap model for plain text, strong model for formulas, tables and figures
+DEFAULT_ROUTES = {
+    SIMPLE: "gemini-flash-1",
+    COMPLEX: "gpt4-vision",
+}
+
+
+class PageFeatures:
+    """
+    Cheap features of a page, read from PyMuPDF without rendering it.
+
+    Covers the length and fonts of the text layer, math fonts and symbols,
+    the line segments and shapes of get_drawings() with how many of them
+    are horizontal or vertical rules, and the fraction of the page covered
+    by images.
+    """
+
+    def __init__(self,
+                 text_chars: int,
+                 font_count: int,
+                 math_fonts: bool,
+                 math_chars: int,
+                 drawing_count: int,
+                 rule_lines: int,
+                 image_coverage: float):
+        self.text_chars = text_chars
+        self.font_count = font_count
+        self.math_fonts = math_fonts
+        self.math_chars = math_chars
+        self.drawing_count = drawing_count
+        self.rule_lines = rule_lines
+        self.image_coverage = image_coverage
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+    def __repr__(self) -> str:
+        features = ", ".join(f"{name}={value!r}" for name, value in vars(self).items())
+        return f"PageFeatures({features})"
+
+
+def page_features(page, text_dict: Optional[Dict] = None, drawings: Optional[List[Dict]] = None) -> PageFeatures:
+    """
+    Collect the features the page classifier works on.
+
+    Args:
+        page (fitz.Page): Page to analyze
+        text_dict (Optional[Dict]): Result of page.get_text("dict") if already available
+        drawings (Optional[List[Dict]]): Result of page.get_drawings() if already available
+
+    Returns:
+        PageFeatures: Text layer length, fonts, math, drawings and image coverage of the page
+    """
+    if text_dict is None:
+        text_dict = page.get_text("dict")
+
+    spans = _spans(text_dict)
+    visible = [char for span in spans for char in span["text"] if not char.isspace()]
+    fonts = {span.get("font", "") for span in spans if span["text"].strip()}
+
+    if drawings is None:
+        drawings = page.get_drawings()
+    # A plot is often a single path, so its segments and shapes are counted
+    items = 0
+    rules = 0
+    for path in drawings:
+        items += len(path["items"])
+        for item in path["items"]:
+            if item[0] == "l":
+                p1, p2 = item[1], item[2]
+                if abs(p1.x - p2.x) < 1 or abs(p1.y - p2.y) < 1:
+                    rules += 1
+            elif item[0] == "re":
+                rules += 4
+
+    page_rect = page.rect
+    image_area = 0.0
+    for info in page.get_image_info():
+        # Only the part of an image inside the page is visible
+        bbox = page_rect & info["bbox"]
+        if not bbox.is_empty:
+            image_area += abs(bbox)
+    page_area = abs(page_rect)
+
+    return PageFeatures(
+        text_chars=len(visible),
+        font_count=len(fonts),
+        math_fonts=any(MATH_FONT_PATTERN.search(font) for font in fonts),
+        math_chars=sum(1 for char in visible if _is_math_char(char)),
+        drawing_count=items,
+        rule_lines=rules,
+        image_coverage=min(1.0, image_area / page_area) if page_area else 0.0,
+    )
+
+
+def classify_page(features: PageFeatures,
+                  max_blank_chars: int = 8,
+                  max_math_chars: int = 2,
+                  max_rule_lines: int = 6,
+                  max_drawings: int = 20,
+                  max_image_coverage: float = 0.3,
+                  max_fonts: int = 6) -> Tuple[str, str]:
+    """
+    Classify a page as blank, simple or complex.
+
+    Blank pages have at most a page number and nothing drawn on them.
+    Pages with math, table rulings, vector graphics, large images (which
+    includes scans) or an unusual number of fonts are complex, everything
+    else is simple text.
+
+    Returns:
+        Tuple[str, str]: Page class and the reason for it
+    """
+    if features.text_chars <= max_blank_chars and not features.drawing_count and not features.image_coverage:
+        return BLANK, "empty page"
+    if features.math_fonts:
+        return COMPLEX, "math font"
+    if features.math_chars > max_math_chars:
+        return COMPLEX, "math symbols"
+    if features.rule_lines > max_rule_lines:
+        return COMPLEX, "table rulings"
+    if features.drawing_count > max_drawings:
+        return COMPLEX, "vector graphics"
+    if features.image_coverage > max_image_coverage:
+        return COMPLEX, "images"
+    if features.font_count > max_fonts:
+        return COMPLEX, "many fonts"
+    return SIMPLE, "plain text"
+
+
+class RoutingDecision:
+    """Where a page is sent, and why"""
+
+    def __init__(self,
+                 page_num: int,
+                 page_class: str,
+                 reason: str,
+                 llm_type: Optional[Union[str, List[str]]],
+                 skip: bool = False,
+                 features: Optional[PageFeatures] = None):
+        """
+        Args:
+            page_num (int): Zero-based page number
+            page_class (str): Class of the page, e.g. "simple"
+            reason (str): Why the page got its class
+            llm_type (Optional[Union[str, List[str]]]): LLM type the page is sent to,
+                None for the converter's own
+            skip (bool): The page is not sent to the LLM at all
+            features (Optional[PageFeatures]): Features the decision was based on
+        """
+        self.page_num = page_num
+        self.page_class = page_class
+        self.reason = reason
+        self.llm_type = llm_type
+        self.skip = skip
+        self.features = features
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "page": self.page_num,
+            "class": self.page_class,
+            "reason": self.reason,
+            "llm_type": self.llm_type,
+            "skip": self.skip,
+            "features": self.features.to_dict() if self.features is not None else None,
+        }
+
+    def __repr__(self) -> str:
+        target = "skip" if self.skip else self.llm_type
+        return f"RoutingDecision(page={self.page_num}, class={self.page_class!r}, reason={self.reason!r}, to={target!r})"
+
+
+class ModelRouter:
+    """
+    Picks the LLM every page is sent to, from a cheap local classification.
+
+    Simple text pages go to a cheap model and complex pages to a strong
+    one; blank pages skip the LLM. Pages of a class without a route go to
+    the converter's own llm_type. The router is shipped to render worker
+    processes, so a custom classifier must be picklable (a module-level
+    function).
+
+    Example:
+        router = ModelRouter({"simple": "gemini-flash-1", "complex": "gpt4-vision"},
+                             api_keys={"gemini-flash-1": gemini_key, "gpt4-vision": openai_key})
+        converter = MarkdownConverter("report.pdf", openai_key, router=router)
+    """
+
+    def __init__(self,
+                 routes: Optional[Dict[str, Union[str, List[str]]]] = None,
+                 api_keys: Optional[Dict[str, str]] = None,
+                 skip_blank: bool = True,
+                 classifier: Callable[[PageFeatures], Tuple[str, str]] = classify_page):
+        """
+        Args:
+            routes (Optional[Dict[str, Union[str, List[str]]]]): LLM type by page class
+                (default: DEFAULT_ROUTES); a list of types hedges between them
+            api_keys (Optional[Dict[str, str]]): API keys by LLM type; required for types
+                of another provider than the converter's llm_type
+            skip_blank (bool): Leave blank pages empty instead of sending them to the LLM
+            classifier (Callable[[PageFeatures], Tuple[str, str]]): Returns the class of a
+                page and the reason for it
+        """
+        self.routes = dict(DEFAULT_ROUTES if routes is None else routes)
+        self.api_keys = dict(api_keys or {})
+        self.skip_blank = skip_blank
+        self.classifier = classifier
+
+    def route(self, page, text_dict: Optional[Dict] = None, drawings: Optional[List[Dict]] = None) -> RoutingDecision:
+        """
+        Decide where a page is sent.
+
+        Args:
+            page (fitz.Page): Page to route
+            text_dict (Optional[Dict]): Result of page.get_text("dict") if already available
+            drawings (Optional[List[Dict]]): Result of page.get_drawings() if already available
+        """
+        features = page_features(page, text_dict, drawings)
+        page_class, reason = self.classifier(features)
+        if page_class == BLANK and self.skip_blank:
+            return RoutingDecision(page.number, page_class, reason, None, skip=True, features=features)
+        return RoutingDecision(page.number, page_class, reason, self.routes.get(page_class), features=features)
+
+    def api_key(self,
+                llm_type: Union[str, List[str]],
+                default: str,
+                default_llm_type: Optional[Union[str, List[str]]] = None) -> Union[str, Dict[str, str]]:
+        """
+        API key of an LLM type, or the keys of each type of a list.
+
+        Types without a key of their own use the default key, the key of
+        the converter, only if they are served by the same provider as
+        default_llm_type, so that a route to another provider fails when
+        the converter is built rather than on every page sent to it.
+
+        Args:
+            llm_type (Union[str, List[str]]): LLM type of a route
+            default (str): API key of the converter
+            default_llm_type (Optional[Union[str, List[str]]]): LLM type of the converter
+
+        Raises:
+            ValueError: If a type of another provider has no API key
+        """
+        if isinstance(llm_type, (list, tuple)):
+            return {name: self.api_key(name, default, default_llm_type) for name in llm_type}
+        if llm_type in self.api_keys:
+            return self.api_keys[llm_type]
+        default_types = default_llm_type if isinstance(default_llm_type, (list, tuple)) else [default_llm_type]
+        provider = provider_of(llm_type)
+        default_providers = {provider_of(name) for name in default_types if name is not None}
+        # Custom LLM types have no known provider and may use any key
+        if provider is None or not default_providers or None in default_providers or provider in default_providers:
+            return default
+        raise ValueError(f"No API key for routed LLM type {llm_type}: the converter's key is for "
+                         f"{', '.join(sorted(default_providers))}, not {provider}; "
+                         f"pass it in the api_keys of the ModelRouter")
+
+    def settings(self) -> Dict[str, Any]:
+        """Settings that affect the converted content, for the incremental manifest"""
+        return {"routes": self.routes, "skip_blank": self.skip_blank,
+                "classifier": f"{self.classifier.__module__}.{self.classifier.__qualname__}"}
+
+
+def summarize_routing(decisions: Iterable[RoutingDecision]) -> Dict[str, Dict[str, Any]]:
+    """Number of pages of every class, with the LLM type they went to"""
+    counts = Counter()
+    targets = {}
+    for decision in decisions:
+        counts[decision.page_class] += 1
+        targets[decision.page_class] = None if decision.skip else decision.llm_type
+    return {page_class: {"pages": count, "llm_type": targets[page_class]}
+            for page_class, count in counts.items()}
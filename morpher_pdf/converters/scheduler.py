@@ -0,0 +1,207 @@
+from collections import deque
+import threading
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class _Task:
+    __slots__ = ("func", "arg", "cost", "batch", "index")
+
+    def __init__(self, func: Callable, arg: Any, cost: float, batch: "_Batch", index: int):
+        self.func = func
+        self.arg = arg
+        self.cost = cost
+        self.batch = batch
+        self.index = index
+
+
+class _Batch:
+    """Bookkeeping for a single map() call"""
+
+    def __init__(self, lock: threading.Lock):
+        self.results: Dict[int, Tuple[bool, Any]] = {}
+        self.done = threading.Condition(lock)
+
+
+class PageScheduler:
+    """
+    Page-level work-stealing scheduler.
+
+    Every worker thread owns a deque of page tasks. Workers take tasks from
+    the head of their own deque and, once it runs dry, steal from the tail
+    of the longest deque of another worker, so one slow page never holds
+    up the pages queued behind it. With ``prioritize_short`` enabled each
+    deque is kept sorted by task cost: owners pick the cheapest pages first
+    while thieves take the most expensive ones off the tail.
+
+    A scheduler may be shared by several map() calls running concurrently,
+    which then share its workers.
+    """
+
+    def __init__(self, max_workers: int = 4, prioritize_short: bool = False):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_workers (int): Number of worker threads
+            prioritize_short (bool): Run cheaper tasks first within each worker deque
+        """
+        self.max_workers = max(1, max_workers)
+        self.prioritize_short = prioritize_short
+        self._lock = threading.Lock()
+        self._work_available = threading.Condition(self._lock)
+        self._deques: List[Deque[_Task]] = [deque() for _ in range(self.max_workers)]
+        self._workers: List[threading.Thread] = []
+        self._shutdown = False
+
+    def __enter__(self) -> "PageScheduler":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+    def map(self,
+            func: Callable[[Any], Any],
+            items: Iterable[Any],
+            cost: Optional[Callable[[Any], float]] = None,
+            max_pending: Optional[int] = None) -> Iterator[Any]:
+        """
+        Apply func to every item on the worker threads.
+
+        Items are pulled lazily and results are yielded in input order.
+
+        Args:
+            func (Callable[[Any], Any]): Function applied to each item
+            items (Iterable[Any]): Items to process
+            cost (Optional[Callable[[Any], float]]): Estimated cost of an item, used for prioritization
+            max_pending (Optional[int]): Maximum number of items submitted but not yet yielded
+
+        Yields:
+            Any: Result of func for each item, in input order
+
+        Raises:
+            Exception: Re-raises the exception of the first failed item in input order
+        """
+        self._start()
+
+        batch = _Batch(self._lock)
+        max_pending = max(1, max_pending or self.max_workers * 2)
+        iterator = iter(items)
+        exhausted = False
+        submitted = 0
+        next_index = 0
+
+        try:
+            while True:
+                # Hand out everything that is already finished, in order
+                while True:
+                    with self._lock:
+                        result = batch.results.pop(next_index, None)
+                    if result is None:
+                        break
+                    next_index += 1
+                    ok, value = result
+                    if not ok:
+                        raise value
+                    yield value
+
+                if not exhausted and submitted - next_index < max_pending:
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        exhausted = True
+                        continue
+                    task_cost = cost(item) if cost is not None else 0
+                    self._submit(_Task(func, item, task_cost, batch, submitted))
+                    del item
+                    submitted += 1
+                    continue
+
+                if next_index >= submitted:
+                    return
+
+                # Window is full or input is exhausted: wait for the head of the line
+                with self._lock:
+                    while next_index not in batch.results:
+                        batch.done.wait()
+        finally:
+            self._cancel(batch)
+
+    def shutdown(self) -> None:
+        """Stop the worker threads once they finish their current task"""
+        with self._lock:
+            self._shutdown = True
+            for tasks in self._deques:
+                tasks.clear()
+            self._work_available.notify_all()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Cannot schedule work after shutdown")
+            if self._workers:
+                return
+            for worker_id in range(self.max_workers):
+                worker = threading.Thread(
+                    target=self._run_worker,
+                    args=(worker_id,),
+                    name=f"morpher-page-{worker_id}",
+                    daemon=True,
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def _submit(self, task: _Task) -> None:
+        with self._lock:
+            # New work goes to the least loaded worker
+            tasks = min(self._deques, key=len)
+            if self.prioritize_short:
+                position = len(tasks)
+                for i, queued in enumerate(tasks):
+                    if queued.cost > task.cost:
+                        position = i
+                        break
+                tasks.insert(position, task)
+            else:
+                tasks.append(task)
+            self._work_available.notify()
+
+    def _cancel(self, batch: _Batch) -> None:
+        # Drop tasks of an abandoned map() call that have not started yet
+        with self._lock:
+            for i, tasks in enumerate(self._deques):
+                if any(task.batch is batch for task in tasks):
+                    self._deques[i] = deque(task for task in tasks if task.batch is not batch)
+
+    def _next_task(self, worker_id: int) -> Optional[_Task]:
+        own = self._deques[worker_id]
+        if own:
+            return own.popleft()
+
+        # Steal from the tail of the most loaded worker
+        victim = max(self._deques, key=len)
+        if victim:
+            return victim.pop()
+        return None
+
+    def _run_worker(self, worker_id: int) -> None:
+        while True:
+            with self._lock:
+                task = self._next_task(worker_id)
+                while task is None:
+                    if self._shutdown:
+                        return
+                    self._work_available.wait()
+                    task = self._next_task(worker_id)
+
+            try:
+                result = (True, task.func(task.arg))
+            except Exception as e:
+                result = (False, e)
+
+            with self._lock:
+                task.batch.results[task.index] = result
+                task.batch.done.notify_all()
+            del task, result
@@ -0,0 +1,87 @@
+from typing import Iterable, List, Optional, Tuple
+
+
+def toc_sections(toc: List[list], page_count: int) -> List[Tuple[int, str, range]]:
+    """
+    Page ranges of the entries of a table of contents.
+
+    A section runs from its own page up to the page before the next entry
+    on the same or a higher level, so it includes its subsections.
+
+    Args:
+        toc (List[list]): Outline as returned by ``fitz.Document.get_toc()``,
+            entries of level, title and 1-based page number
+        page_count (int): Number of pages of the document
+
+    Returns:
+        List[Tuple[int, str, range]]: Level, title and 0-based pages of every entry
+    """
+    sections = []
+    for index, (level, title, page, *_) in enumerate(toc):
+        # Entries pointing nowhere have a page number below one
+        if page < 1:
+            continue
+        end = page_count
+        for next_level, _, next_page, *_ in toc[index + 1:]:
+            if next_level <= level and next_page >= 1:
+                # Sections starting on the same page still cover that page
+                end = max(next_page - 1, page)
+                break
+        sections.append((level, title, range(page - 1, min(end, page_count))))
+    return sections
+
+
+def select_pages(pdf_document,
+                 pages: Optional[Iterable[int]] = None,
+                 sections: Optional[Iterable[str]] = None) -> List[int]:
+    """
+    Resolve a page selection against a document.
+
+    Args:
+        pdf_document (fitz.Document): Document the pages are selected from
+        pages (Optional[Iterable[int]]): 0-based page numbers, e.g. ``range(39, 55)``
+        sections (Optional[Iterable[str]]): Titles of table of contents entries,
+            matched case-insensitively; each selects all pages of the section
+
+    Returns:
+        List[int]: Selected page numbers in document order, all pages if nothing is selected
+
+    Raises:
+        ValueError: If a page is out of range or a section is not in the table of contents
+    """
+    page_count = len(pdf_document)
+    if pages is None and sections is None:
+        return list(range(page_count))
+
+    selected = set()
+    for page_num in pages or ():
+        if not 0 <= page_num < page_count:
+            raise ValueError(f"Page {page_num} out of range for a document of {page_count} pages")
+        selected.add(page_num)
+
+    if sections is not None:
+        selected.update(section_pages(pdf_document.get_toc(), page_count, sections))
+
+    return sorted(selected)
+
+
+def section_pages(toc: List[list], page_count: int, titles: Iterable[str]) -> List[int]:
+    """
+    Pages of the table of contents sections with the given titles.
+
+    Titles are matched case-insensitively; a title occurring several times
+    selects all of its sections.
+
+    Raises:
+        ValueError: If a title is not in the table of contents
+    """
+    entries = toc_sections(toc, page_count)
+    selected = set()
+    for title in titles:
+        matches = [section for _, section_title, section in entries
+                   if section_title.strip().casefold() == title.strip().casefold()]
+        if not matches:
+            raise ValueError(f"No section titled {title!r} in the table of contents")
+        for section in matches:
+            selected.update(section)
+    return sorted(selected)
@@ -0,0 +1,148 @@
+from abc import ABC, abstractmethod
+import io
+import os
+import tarfile
+import threading
+import time
+from typing import BinaryIO, Callable, Optional, Union
+import zipfile
+
+
+class ImageSink(ABC):
+    """
+    Destination of extracted images.
+
+    Images are handed to the sink as soon as they are extracted, so the
+    converter does not keep them in memory. Every image is written once,
+    under a name unique within the document. Sinks can be used as context
+    managers; archives are only complete once the sink is closed.
+    """
+
+    def __init__(self, base_url: Optional[str] = None):
+        """
+        Args:
+            base_url (Optional[str]): Prefix of the links written into the converted
+                document; the image name is appended to it
+        """
+        self.base_url = base_url
+        self._lock = threading.Lock()
+
+    def write(self, name: str, data: bytes) -> str:
+        """
+        Store an image.
+
+        Args:
+            name (str): File name of the image
+            data (bytes): Encoded image
+
+        Returns:
+            str: Link to the image for the converted document
+        """
+        with self._lock:
+            location = self._write(name, data)
+        if self.base_url is not None:
+            return self.base_url + name
+        return location
+
+    @abstractmethod
+    def _write(self, name: str, data: bytes) -> str:
+        """Store an image, returning its default link"""
+        pass
+
+    def close(self) -> None:
+        """Finish writing; no images can be written afterwards"""
+        pass
+
+    def __enter__(self) -> "ImageSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class DirectoryImageSink(ImageSink):
+    """Writes every image to a file in a directory, created on the first image"""
+
+    def __init__(self, directory: str, base_url: Optional[str] = None):
+        """
+        Args:
+            directory (str): Directory receiving the images
+            base_url (Optional[str]): Prefix of the links (default: the directory path)
+        """
+        super().__init__(base_url)
+        self.directory = directory
+
+    def _write(self, name: str, data: bytes) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+
+class ZipImageSink(ImageSink):
+    """Streams images into a zip archive"""
+
+    def __init__(self, target: Union[str, BinaryIO], base_url: Optional[str] = None):
+        """
+        Args:
+            target (Union[str, BinaryIO]): Path of the archive, or a writable binary
+                file object, which need not be seekable
+            base_url (Optional[str]): Prefix of the links (default: the name inside the archive)
+        """
+        super().__init__(base_url)
+        # Images are already compressed, deflating them again only costs time
+        self._archive = zipfile.ZipFile(target, "w", compression=zipfile.ZIP_STORED)
+
+    def _write(self, name: str, data: bytes) -> str:
+        self._archive.writestr(zipfile.ZipInfo(name, time.localtime()[:6]), data)
+        return name
+
+    def close(self) -> None:
+        with self._lock:
+            self._archive.close()
+
+
+class TarImageSink(ImageSink):
+    """Streams images into a tar archive"""
+
+    def __init__(self, target: Union[str, BinaryIO], base_url: Optional[str] = None):
+        """
+        Args:
+            target (Union[str, BinaryIO]): Path of the archive, or a writable binary
+                file object, which need not be seekable
+            base_url (Optional[str]): Prefix of the links (default: the name inside the archive)
+        """
+        super().__init__(base_url)
+        if isinstance(target, (str, os.PathLike)):
+            self._archive = tarfile.open(target, "w")
+        else:
+            self._archive = tarfile.open(fileobj=target, mode="w|")
+
+    def _write(self, name: str, data: bytes) -> str:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self._archive.addfile(info, io.BytesIO(data))
+        return name
+
+    def close(self) -> None:
+        with self._lock:
+            self._archive.close()
+
+
+class CallbackImageSink(ImageSink):
+    """Hands every image to a function, e.g. to upload it"""
+
+    def __init__(self, callback: Callable[[str, bytes], Optional[str]], base_url: Optional[str] = None):
+        """
+        Args:
+            callback (Callable[[str, bytes], Optional[str]]): Called with the name and bytes of
+                every image; may return the link to use, otherwise the name is used
+            base_url (Optional[str]): Prefix of the links, overriding the callback's result
+        """
+        super().__init__(base_url)
+        self.callback = callback
+
+    def _write(self, name: str, data: bytes) -> str:
+        return self.callback(name, data) or name
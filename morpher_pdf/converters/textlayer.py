@@ -0,0 +1,241 @@
+from collections import Counter
+import re
+from typing import Dict, List, Optional, Sequence
+
+# Font name fragments of math fonts (TeX, AMS, STIX, Cambria Math, Symbol, ...)
+MATH_FONT_PATTERN = re.compile(
+    r"CMMI|CMSY|CMEX|CMBSY|MSAM|MSBM|EUFM|EUSM|RSFS|STIX|Math|Symbol|Euclid|MTExtra|Mathematica",
+    re.IGNORECASE,
+)
+
+# Characters that only show up in formulas
+MATH_CHARS = set("∑∏∫∮√∂∇∞≈≠≡≤≥≪≫±∓×÷∈∉⊂⊃⊆⊇∪∩∀∃∧∨¬→←↔⇒⇔∝∠⊥∥⊕⊗")
+
+BULLET_CHARS = ("•", "●", "▪", "◦", "‣", "–", "-", "*")
+
+# Span flags of page.get_text("dict")
+FLAG_SUPERSCRIPT = 1
+FLAG_ITALIC = 2
+FLAG_BOLD = 16
+
+
+class TextLayerAnalysis:
+    """Verdict on whether a page's embedded text layer can be used directly"""
+
+    def __init__(self, needs_llm: bool, reason: str):
+        self.needs_llm = needs_llm
+        self.reason = reason
+
+    def __repr__(self) -> str:
+        return f"TextLayerAnalysis(needs_llm={self.needs_llm}, reason={self.reason!r})"
+
+
+def _is_math_char(char: str) -> bool:
+    # Mathematical alphanumeric symbols live in U+1D400-U+1D7FF
+    return char in MATH_CHARS or 0x1D400 <= ord(char) <= 0x1D7FF
+
+
+def _spans(text_dict: Dict) -> List[Dict]:
+    return [span
+            for block in text_dict.get("blocks", []) if block.get("type") == 0
+            for line in block["lines"]
+            for span in line["spans"]]
+
+
+def _side_by_side(blocks: List[Dict], min_lines: int) -> bool:
+    """Whether two text blocks of several lines sit next to each other, as columns do"""
+    boxes = [block["bbox"] for block in blocks if len(block["lines"]) >= min_lines]
+    for index, (x0, y0, x1, y1) in enumerate(boxes):
+        for other_x0, other_y0, other_x1, other_y1 in boxes[index + 1:]:
+            if (min(x1, other_x1) <= max(x0, other_x0)
+                    and min(y1, other_y1) > max(y0, other_y0)):
+                return True
+    return False
+
+
+def _is_figure(bbox: Sequence[float], min_size: float) -> bool:
+    return abs(bbox[2] - bbox[0]) >= min_size and abs(bbox[3] - bbox[1]) >= min_size
+
+
+def analyze_page(page,
+                 text_dict: Optional[Dict] = None,
+                 clusters: Optional[List] = None,
+                 drawings: Optional[List[Dict]] = None,
+                 min_chars: int = 80,
+                 min_figure_size: float = 30,
+                 max_rule_lines: int = 6,
+                 max_math_chars: int = 2,
+                 max_unknown_ratio: float = 0.01,
+                 min_column_lines: int = 2) -> TextLayerAnalysis:
+    """
+    Decide whether a page must go through the vision LLM.
+
+    Plain single-column prose pages with a reliable text layer can be
+    converted locally. Pages with little or no text (scans), several text
+    columns, images or vector figures, table rulings, math fonts or
+    symbols, or a broken text layer need the LLM: the local conversion
+    reads blocks top to bottom and has no way to place figures.
+
+    Args:
+        page (fitz.Page): Page to analyze
+        text_dict (Optional[Dict]): Result of page.get_text("dict") if already available
+        clusters (Optional[List[fitz.Rect]]): Drawing clusters of the page, as computed
+            by the figure extraction (default: clustered from the page drawings)
+        drawings (Optional[List[Dict]]): Result of page.get_drawings() if already available
+        min_chars (int): Minimum number of characters of a text page
+        min_figure_size (float): Width and height in points from which an image or
+            drawing cluster is a figure rather than an ornament
+        max_rule_lines (int): Maximum number of horizontal/vertical rules before assuming a table
+        max_math_chars (int): Maximum number of math symbols
+        max_unknown_ratio (float): Maximum fraction of unmappable characters
+        min_column_lines (int): Lines of two text blocks side by side before they are columns
+
+    Returns:
+        TextLayerAnalysis: Verdict and the reason for it
+    """
+    if text_dict is None:
+        text_dict = page.get_text("dict")
+
+    spans = _spans(text_dict)
+    text = "".join(span["text"] for span in spans)
+    visible = [char for char in text if not char.isspace()]
+    if len(visible) < min_chars:
+        return TextLayerAnalysis(True, "too little text")
+
+    unknown = sum(1 for char in visible if char == "�")
+    if unknown / len(visible) > max_unknown_ratio:
+        return TextLayerAnalysis(True, "unreliable text layer")
+
+    if any(MATH_FONT_PATTERN.search(span.get("font", "")) for span in spans):
+        return TextLayerAnalysis(True, "math font")
+    if sum(1 for char in visible if _is_math_char(char)) > max_math_chars:
+        return TextLayerAnalysis(True, "math symbols")
+
+    blocks = text_dict.get("blocks", [])
+    if _side_by_side([block for block in blocks if block.get("type") == 0], min_column_lines):
+        return TextLayerAnalysis(True, "columns")
+
+    if any(_is_figure(block["bbox"], min_figure_size) for block in blocks if block.get("type") == 1):
+        return TextLayerAnalysis(True, "images")
+
+    if drawings is None:
+        drawings = page.get_drawings()
+    rules = 0
+    for path in drawings:
+        for item in path["items"]:
+            if item[0] == "l":
+                p1, p2 = item[1], item[2]
+                if abs(p1.x - p2.x) < 1 or abs(p1.y - p2.y) < 1:
+                    rules += 1
+            elif item[0] == "re":
+                rules += 4
+    if rules > max_rule_lines:
+        return TextLayerAnalysis(True, "table rulings")
+
+    if clusters is None:
+        from .clustering import cluster_drawings
+        clusters = cluster_drawings(drawings)
+    if any(_is_figure(cluster, min_figure_size) for cluster in clusters):
+        return TextLayerAnalysis(True, "figures")
+
+    return TextLayerAnalysis(False, "plain text")
+
+
+def _style(text: str, flags: int) -> str:
+    stripped = text.strip()
+    if not stripped:
+        return text
+    if flags & FLAG_BOLD and flags & FLAG_ITALIC:
+        styled = f"***{stripped}***"
+    elif flags & FLAG_BOLD:
+        styled = f"**{stripped}**"
+    elif flags & FLAG_ITALIC:
+        styled = f"*{stripped}*"
+    else:
+        return text
+    # Keep the surrounding whitespace outside of the markers
+    leading = text[:len(text) - len(text.lstrip())]
+    trailing = text[len(text.rstrip()):]
+    return leading + styled + trailing
+
+
+def _line_text(line: Dict) -> str:
+    # Merge neighbouring spans with the same style before adding markers
+    parts = []
+    for span in line["spans"]:
+        flags = span["flags"] & (FLAG_BOLD | FLAG_ITALIC)
+        if parts and parts[-1][1] == flags:
+            parts[-1][0] += span["text"]
+        else:
+            parts.append([span["text"], flags])
+    return "".join(_style(text, flags) for text, flags in parts).strip()
+
+
+def page_to_markdown(page, text_dict: Optional[Dict] = None) -> str:
+    """
+    Convert the text layer of a page to Markdown.
+
+    Headings are derived from font sizes relative to the dominant body
+    size, bold and italic spans keep their styling and bulleted lines
+    become list items.
+
+    Args:
+        page (fitz.Page): Page to convert
+        text_dict (Optional[Dict]): Result of page.get_text("dict", sort=True) if already available
+
+    Returns:
+        str: Markdown content of the page
+    """
+    if text_dict is None:
+        text_dict = page.get_text("dict", sort=True)
+
+    blocks = [block for block in text_dict.get("blocks", []) if block.get("type") == 0]
+
+    # The size covering most characters is the body text size
+    sizes = Counter()
+    for span in _spans(text_dict):
+        sizes[round(span["size"], 1)] += len(span["text"].strip())
+    if not sizes:
+        return ""
+    body_size = sizes.most_common(1)[0][0]
+    heading_sizes = sorted((size for size in sizes if size >= body_size * 1.15), reverse=True)[:3]
+
+    paragraphs = []
+    for block in blocks:
+        lines = [line for line in block["lines"] if "".join(span["text"] for span in line["spans"]).strip()]
+        if not lines:
+            continue
+
+        block_size = max(round(span["size"], 1) for line in lines for span in line["spans"])
+        plain = " ".join("".join(span["text"] for span in line["spans"]).strip() for line in lines)
+
+        if block_size in heading_sizes and len(plain) < 200:
+            level = heading_sizes.index(block_size) + 1
+            paragraphs.append(f"{'#' * level} {plain}")
+            continue
+
+        items = []
+        current = ""
+        for line in lines:
+            text = _line_text(line)
+            bullet = next((char for char in BULLET_CHARS if text.startswith(char + " ")), None)
+            if bullet is not None:
+                if current:
+                    items.append(current)
+                current = "- " + text[len(bullet):].strip()
+            elif current.endswith("-") and not current.endswith(" -"):
+                # Re-join words hyphenated across lines
+                current = current[:-1] + text
+            elif current:
+                current += " " + text
+            else:
+                current = text
+        if current:
+            items.append(current)
+
+        if all(item.startswith("- ") for item in items):
+            paragraphs.append("\n".join(items))
+        else:
+            paragraphs.extend(items if any(item.startswith("- ") for item in items) else [" ".join(items)])
+
+    return "\n\n".join(paragraphs)
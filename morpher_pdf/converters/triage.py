@@ -0,0 +1,85 @@
+import io
+from typing import Dict, Optional, Tuple
+
+# Images smaller than this in either dimension are decoration, not content
+MIN_IMAGE_SIZE = 10
+# Grey level range below which an image counts as a solid color
+BLANK_RANGE = 5
+# Longest side of the sample the blank check looks at
+SAMPLE_SIZE = 256
+# Encodings Markdown viewers and browsers display as they are
+PASSTHROUGH_EXTENSIONS = {"png", "jpeg", "jpg", "gif", "webp"}
+
+
+def is_tiny(width: int, height: int) -> bool:
+    """Whether image dimensions from the xref metadata are too small to be content"""
+    return width < MIN_IMAGE_SIZE or height < MIN_IMAGE_SIZE
+
+
+def is_blank(image) -> bool:
+    """
+    Whether a PIL image is a solid color, judged on a downsampled grey copy.
+
+    JPEGs are decoded straight at the reduced size, other formats are
+    reduced by box averaging before the grey levels are compared.
+    """
+    import numpy as np
+
+    # Only has an effect on JPEGs, whose DCT decoding can scale down for free
+    image.draft("L", (SAMPLE_SIZE, SAMPLE_SIZE))
+    factor = max(1, max(image.size) // SAMPLE_SIZE)
+    if factor > 1:
+        image = image.reduce(factor)
+    pixels = np.asarray(image.convert("L"))
+    return int(pixels.max()) - int(pixels.min()) < BLANK_RANGE
+
+
+def triage_image(pdf_document, base_image: Dict) -> Optional[Tuple[bytes, str]]:
+    """
+    Decide what to store for an extracted image.
+
+    Images without a soft mask in an encoding viewers can display are
+    passed through in their original encoding. Only images with a soft
+    mask, CMYK images and encodings such as JPEG 2000 or JBIG2 are
+    re-encoded as PNG.
+
+    Args:
+        pdf_document (fitz.Document): Document the image belongs to
+        base_image (Dict): Result of ``fitz.Document.extract_image()``
+
+    Returns:
+        Optional[Tuple[bytes, str]]: Encoded image and its file extension,
+            or None if the image is a solid color
+    """
+    from PIL import Image
+
+    image_bytes = base_image["image"]
+    image_ext = base_image.get("ext", "png")
+    img = Image.open(io.BytesIO(image_bytes))
+    # The soft mask is given as the xref of a separate image, 0 if there is none
+    smask = base_image.get("smask") or 0
+
+    if not smask and image_ext in PASSTHROUGH_EXTENSIONS and img.mode != "CMYK":
+        if is_blank(img):
+            return None
+        return image_bytes, image_ext
+
+    img.load()
+    if is_blank(img):
+        return None
+
+    if smask:
+        mask = Image.open(io.BytesIO(pdf_document.extract_image(smask)["image"]))
+        if mask.mode != "L":
+            mask = mask.convert("L")
+        if mask.size != img.size:
+            mask = mask.resize(img.size)
+        if img.mode not in ("RGBA", "LA"):
+            img = img.convert("RGBA")
+        img.putalpha(mask)
+    elif img.mode not in ("RGB", "RGBA", "L", "LA", "P", "1"):
+        img = img.convert("RGB")
+
+    output = io.BytesIO()
+    img.save(output, format="PNG")
+    return output.getvalue(), "png"
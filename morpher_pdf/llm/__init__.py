@@ -0,0 +1,5 @@
+from .clients import BaseLLMClient
+from .factory import LLMFactory, LLMType
+from .hedging import HedgedClient, LatencyHistogram
+
+__all__ = ['BaseLLMClient', 'LLMFactory', 'LLMType', 'HedgedClient', 'LatencyHistogram']
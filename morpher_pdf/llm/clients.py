@@ -1,16 +1,87 @@
 from abc import ABC, abstractmethod
+import asyncio
 import base64
+import importlib.util
 import json
-from typing import Any, Dict
-from openai import OpenAI
-import google.generativeai as genai
-from llm.prompts import MARKDOWN_CONVERTER_PROMPT
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
+import logging
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+from .prompts import MARKDOWN_CONVERTER_PROMPT
+from .throttle import CircuitBreaker, RateLimiter, RetryPolicy, is_throttled
+from ..stats import current_stats
+
+logger = logging.getLogger(__name__)
+
+# Connections kept per client unless the caller sizes the pool
+DEFAULT_MAX_CONNECTIONS = 32
+# HTTP/2 multiplexes requests over one connection but needs the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_gemini_lock = threading.Lock()
+_gemini_api_key: Optional[str] = None
+
+
+def configure_gemini(api_key: str) -> None:
+    """Configure the process-global Gemini SDK, only when the key changes"""
+    import google.generativeai as genai
+
+    global _gemini_api_key
+    with _gemini_lock:
+        if _gemini_api_key == api_key:
+            return
+        if _gemini_api_key is not None:
+            logger.warning("Reconfiguring the Gemini SDK with another API key affects all Gemini clients")
+        genai.configure(api_key=api_key)
+        _gemini_api_key = api_key
+
+
+def guess_mime_type(image_bytes: bytes) -> str:
+    """Detect the MIME type of an encoded image from its signature"""
+    if image_bytes.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/png"
+
+
+def gemini_contents(images: List[bytes], prompt: str) -> List[Any]:
+    """Gemini request contents: the prompt followed by the images, labeled when there are several"""
+    contents: List[Any] = [prompt]
+    for index, image_bytes in enumerate(images):
+        if len(images) > 1:
+            contents.append(f"Page {index + 1}:")
+        contents.append({"mime_type": guess_mime_type(image_bytes), "data": image_bytes})
+    return contents
+
+
+def record_gemini_usage(client: "BaseLLMClient", response) -> None:
+    """Record the token usage of a Gemini response"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        client._record_usage(usage.prompt_token_count, usage.candidates_token_count)
 
 
 class BaseLLMClient(ABC):
-    def __init__(self, api_key: str):
+    # Model the requests are sent to
+    model_name: str = ""
+    # Rough token cost of a request, used to charge the rate limiter up front
+    estimated_image_tokens: int = 1000
+    estimated_output_tokens: int = 2000
+
+    def __init__(self,
+                 api_key: str,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS):
         self.api_key = api_key
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.max_connections = max(1, max_connections)
+        self.closed = False
+        self._pool_lock = threading.Lock()
         self._setup_client()
     
     @abstractmethod
@@ -18,30 +89,322 @@ class BaseLLMClient(ABC):
         """Initialize the specific client"""
         pass
 
+    def grow_pool(self, max_connections: int) -> None:
+        """
+        Keep at least max_connections connections open to the provider.
+        
+        A shared client is sized by its first caller; later callers with
+        more workers grow its pool instead of getting a client of their own.
+        
+        Args:
+            max_connections (int): Connections the caller needs
+        """
+        with self._pool_lock:
+            if max_connections <= self.max_connections:
+                return
+            self.max_connections = max_connections
+            self._resize_pool()
+
+    def _resize_pool(self) -> None:
+        """Make room for max_connections connections; SDKs multiplexing their requests need nothing"""
+        pass
+
+    def close(self) -> None:
+        """Release the connections of the client; it cannot be used afterwards"""
+        self.closed = True
+
+    async def aclose(self) -> None:
+        """Release the connections of the client, including those of the async SDK client"""
+        self.close()
+
+    def __enter__(self) -> "BaseLLMClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "BaseLLMClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
     @abstractmethod
-    def process_image(self, image_bytes: bytes, prompt: str) -> str:
-        """Process image with the LLM and return the response"""
+    def _process_image(self, image_bytes: bytes, prompt: str) -> str:
+        """Send a single request for the image to the LLM"""
         pass
 
+    async def _aprocess_image(self, image_bytes: bytes, prompt: str) -> str:
+        """Asynchronously send a single request for the image to the LLM"""
+        # Fallback for clients without a native async SDK
+        return await asyncio.to_thread(self._process_image, image_bytes, prompt)
+
+    def _process_images(self, images: List[bytes], prompt: str) -> str:
+        """Send a single request for several images to the LLM"""
+        raise NotImplementedError(f"{type(self).__name__} does not support multiple images per request")
+
+    async def _aprocess_images(self, images: List[bytes], prompt: str) -> str:
+        """Asynchronously send a single request for several images to the LLM"""
+        return await asyncio.to_thread(self._process_images, images, prompt)
+
+    def _stream_image(self, image_bytes: bytes, prompt: str) -> Iterator[str]:
+        """Send a single streaming request for the image, yielding text chunks"""
+        # Clients without streaming deliver the whole response as one chunk
+        yield self._process_image(image_bytes, prompt)
+
+    async def _astream_image(self, image_bytes: bytes, prompt: str) -> AsyncIterator[str]:
+        """Asynchronously send a single streaming request for the image, yielding text chunks"""
+        yield await self._aprocess_image(image_bytes, prompt)
+
+    @property
+    def supports_multiple_images(self) -> bool:
+        return type(self)._process_images is not BaseLLMClient._process_images
+
+    def process_image(self, image_bytes: bytes, prompt: str = MARKDOWN_CONVERTER_PROMPT) -> str:
+        """Process image with the LLM and return the response"""
+        return self._call_with_retry(self._process_image, image_bytes, prompt)
+
+    async def aprocess_image(self, image_bytes: bytes, prompt: str = MARKDOWN_CONVERTER_PROMPT) -> str:
+        """Asynchronously process image with the LLM and return the response"""
+        return await self._acall_with_retry(self._aprocess_image, image_bytes, prompt)
+
+    def stream_image(self, image_bytes: bytes, prompt: str = MARKDOWN_CONVERTER_PROMPT) -> Iterator[str]:
+        """
+        Process image with the LLM, yielding the response as it is generated.
+        
+        Failures before the first chunk are retried like in process_image;
+        a failure after chunks were handed out is raised.
+        """
+        attempt = 0
+        while True:
+            trial = self.circuit_breaker.before_call()
+            try:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire(self._estimate_tokens(prompt))
+                started = False
+                waited = 0.0
+                try:
+                    # Only the time spent waiting on the provider counts, not the consumer
+                    start = time.perf_counter()
+                    for chunk in self._stream_image(image_bytes, prompt):
+                        waited += time.perf_counter() - start
+                        if chunk:
+                            started = True
+                            yield chunk
+                        start = time.perf_counter()
+                    waited += time.perf_counter() - start
+                except Exception as e:
+                    self._record_request(image_bytes, waited)
+                    if started or not self._should_retry(e, attempt):
+                        raise
+                    error = e
+                else:
+                    self._record_request(image_bytes, waited)
+                    self._record_success()
+                    return
+            finally:
+                # Also reached when the consumer abandons the stream
+                self.circuit_breaker.release(trial)
+            time.sleep(self.retry_policy.delay(attempt, error))
+            attempt += 1
+
+    async def astream_image(self, image_bytes: bytes, prompt: str = MARKDOWN_CONVERTER_PROMPT) -> AsyncIterator[str]:
+        """Asynchronously process image with the LLM, yielding the response as it is generated"""
+        attempt = 0
+        while True:
+            trial = self.circuit_breaker.before_call()
+            try:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.aacquire(self._estimate_tokens(prompt))
+                started = False
+                waited = 0.0
+                try:
+                    start = time.perf_counter()
+                    async for chunk in self._astream_image(image_bytes, prompt):
+                        waited += time.perf_counter() - start
+                        if chunk:
+                            started = True
+                            yield chunk
+                        start = time.perf_counter()
+                    waited += time.perf_counter() - start
+                except Exception as e:
+                    self._record_request(image_bytes, waited)
+                    if started or not self._should_retry(e, attempt):
+                        raise
+                    error = e
+                else:
+                    self._record_request(image_bytes, waited)
+                    self._record_success()
+                    return
+            finally:
+                self.circuit_breaker.release(trial)
+            await asyncio.sleep(self.retry_policy.delay(attempt, error))
+            attempt += 1
+
+    def process_images(self, images: List[bytes], prompt: str) -> str:
+        """Process several images in a single request and return the response"""
+        return self._call_with_retry(self._process_images, images, prompt, len(images))
+
+    async def aprocess_images(self, images: List[bytes], prompt: str) -> str:
+        """Asynchronously process several images in a single request and return the response"""
+        return await self._acall_with_retry(self._aprocess_images, images, prompt, len(images))
+
+    def _estimate_tokens(self, prompt: str, image_count: int = 1) -> int:
+        return len(prompt) // 4 + image_count * (self.estimated_image_tokens + self.estimated_output_tokens)
+
+    def _should_retry(self, error: Exception, attempt: int) -> bool:
+        """Record a failed attempt and decide whether to try again"""
+        stats = current_stats()
+        retryable = self.retry_policy.is_retryable(error)
+        if retryable:
+            # Only transient failures count against the provider's health
+            self.circuit_breaker.record_failure()
+        if is_throttled(error):
+            if self.rate_limiter is not None:
+                self.rate_limiter.on_throttle()
+            if stats is not None:
+                stats.increment("throttled")
+        retry = retryable and attempt < self.retry_policy.max_retries
+        if retry:
+            logger.debug("Retrying %s request after error: %s", type(self).__name__, error)
+            if stats is not None:
+                stats.increment("retries")
+        elif stats is not None:
+            stats.increment("failed_requests")
+        return retry
+
+    def _record_request(self, images: Any, seconds: float) -> None:
+        """Record an LLM request in the stats of the current run"""
+        stats = current_stats()
+        if stats is None:
+            return
+        stats.add_time("llm_wait", seconds)
+        stats.increment("requests")
+        payload = images if isinstance(images, list) else [images]
+        stats.increment("payload_bytes", sum(len(image) for image in payload))
+
+    def _record_usage(self, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+        """Record the token usage reported by the provider in the stats of the current run"""
+        stats = current_stats()
+        if stats is None:
+            return
+        stats.increment("prompt_tokens", prompt_tokens or 0)
+        stats.increment("completion_tokens", completion_tokens or 0)
+
+    def _record_success(self) -> None:
+        self.circuit_breaker.record_success()
+        if self.rate_limiter is not None:
+            self.rate_limiter.on_success()
+
+    def _call_with_retry(self, func: Callable[[Any, str], str], images: Any, prompt: str, image_count: int = 1) -> str:
+        attempt = 0
+        while True:
+            trial = self.circuit_breaker.before_call()
+            try:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire(self._estimate_tokens(prompt, image_count))
+                start = time.perf_counter()
+                try:
+                    result = func(images, prompt)
+                except Exception as e:
+                    self._record_request(images, time.perf_counter() - start)
+                    if not self._should_retry(e, attempt):
+                        raise
+                    error = e
+                else:
+                    self._record_request(images, time.perf_counter() - start)
+                    self._record_success()
+                    return result
+            finally:
+                # A trial that ended without a verdict, e.g. on an invalid request, is given back
+                self.circuit_breaker.release(trial)
+            time.sleep(self.retry_policy.delay(attempt, error))
+            attempt += 1
+
+    async def _acall_with_retry(self, func: Callable, images: Any, prompt: str, image_count: int = 1) -> str:
+        attempt = 0
+        while True:
+            trial = self.circuit_breaker.before_call()
+            try:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.aacquire(self._estimate_tokens(prompt, image_count))
+                start = time.perf_counter()
+                try:
+                    result = await func(images, prompt)
+                except Exception as e:
+                    self._record_request(images, time.perf_counter() - start)
+                    if not self._should_retry(e, attempt):
+                        raise
+                    error = e
+                else:
+                    self._record_request(images, time.perf_counter() - start)
+                    self._record_success()
+                    return result
+            finally:
+                # Cancellation of the request also ends up here
+                self.circuit_breaker.release(trial)
+            await asyncio.sleep(self.retry_policy.delay(attempt, error))
+            attempt += 1
+
 class GPT4VisionClient(BaseLLMClient):
+    model_name = "gpt-4o"
+    estimated_image_tokens = 1105
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, **kwargs):
+        self.base_url = base_url
+        # SDK clients of the pools replaced by grow_pool(), closed with the client
+        self._retired = []
+        super().__init__(api_key, **kwargs)
+
     def _setup_client(self) -> None:
-        self.client = OpenAI(api_key=self.api_key)
+        # The SDK is imported on first use so that other providers do not pay for it
+        import httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+        # One keep-alive connection per worker, so concurrent pages never wait for a connection
+        limits = httpx.Limits(max_connections=self.max_connections,
+                              max_keepalive_connections=self.max_connections,
+                              keepalive_expiry=60)
+        # Retries are handled by BaseLLMClient, keep the SDK from retrying on its own
+        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                             http_client=DefaultHttpxClient(limits=limits, http2=HTTP2_AVAILABLE))
+        self.async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                                        http_client=DefaultAsyncHttpxClient(limits=limits, http2=HTTP2_AVAILABLE))
+
+    def _resize_pool(self) -> None:
+        # httpx pools have a fixed size; requests in flight finish on the previous pool
+        self._retired.append((self.client, self.async_client))
+        self._setup_client()
+
+    def close(self) -> None:
+        for client, _ in self._retired:
+            client.close()
+        self.client.close()
+        super().close()
+
+    async def aclose(self) -> None:
+        for _, async_client in self._retired:
+            await async_client.close()
+        await self.async_client.close()
+        self.close()
     
-    def process_image(self, image_bytes: bytes, prompt: str = MARKDOWN_CONVERTER_PROMPT) -> str:
-        base64_image = base64.b64encode(image_bytes).decode("utf-8")
+    def _request_kwargs(self, images: List[bytes], prompt: str) -> Dict[str, Any]:
+        content = [{"type": "text", "text": prompt}]
+        for index, image_bytes in enumerate(images):
+            base64_image = base64.b64encode(image_bytes).decode("utf-8")
+            if len(images) > 1:
+                content.append({"type": "text", "text": f"Page {index + 1}:"})
+            content.append({
+                "type": "image_url",
+                "image_url": {"url": f"data:{guess_mime_type(image_bytes)};base64,{base64_image}"},
+            })
         
-        response = self.client.chat.completions.create(
-            model="gpt-4o",
+        return dict(
+            model=self.model_name,
             messages=[
                 {
                     "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": f"data:image/png;base64,{base64_image}"},
-                        },
-                    ],
+                    "content": content,
                 }
             ],
             temperature=0,
@@ -49,31 +412,99 @@ class GPT4VisionClient(BaseLLMClient):
             presence_penalty=0,
             top_p=1,
         )
+    
+    def _process_image(self, image_bytes: bytes, prompt: str) -> str:
+        return self._process_images([image_bytes], prompt)
+    
+    async def _aprocess_image(self, image_bytes: bytes, prompt: str) -> str:
+        return await self._aprocess_images([image_bytes], prompt)
+    
+    def _process_images(self, images: List[bytes], prompt: str) -> str:
+        response = self.client.chat.completions.create(**self._request_kwargs(images, prompt))
+        self._record_response_usage(response)
 
         return response.choices[0].message.content
+    
+    async def _aprocess_images(self, images: List[bytes], prompt: str) -> str:
+        response = await self.async_client.chat.completions.create(**self._request_kwargs(images, prompt))
+        self._record_response_usage(response)
+
+        return response.choices[0].message.content
+    
+    def _record_response_usage(self, response) -> None:
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self._record_usage(usage.prompt_tokens, usage.completion_tokens)
+    
+    def _stream_image(self, image_bytes: bytes, prompt: str) -> Iterator[str]:
+        stream = self.client.chat.completions.create(**self._request_kwargs([image_bytes], prompt), stream=True)
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    async def _astream_image(self, image_bytes: bytes, prompt: str) -> AsyncIterator[str]:
+        stream = await self.async_client.chat.completions.create(**self._request_kwargs([image_bytes], prompt), stream=True)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
 class GeminiFlash1Client(BaseLLMClient):
+    model_name = "gemini-1.5-flash"
+    estimated_image_tokens = 258
+
     def _setup_client(self) -> None:
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        import google.generativeai as genai
+
+        # The SDK keeps one gRPC channel per process, which already multiplexes requests
+        configure_gemini(self.api_key)
+        self.model = genai.GenerativeModel(self.model_name)
     
-    def process_image(self, image_bytes: bytes, prompt: str=MARKDOWN_CONVERTER_PROMPT) -> str:
-        response = self.model.generate_content(
-            contents=[prompt, {"mime_type": "image/png", "data": image_bytes}],
+    def _request_kwargs(self, images: List[bytes], prompt: str) -> Dict[str, Any]:
+        return dict(
+            contents=gemini_contents(images, prompt),
             generation_config={"temperature": 0.3}
         )
+    
+    def _process_image(self, image_bytes: bytes, prompt: str) -> str:
+        return self._process_images([image_bytes], prompt)
+    
+    async def _aprocess_image(self, image_bytes: bytes, prompt: str) -> str:
+        return await self._aprocess_images([image_bytes], prompt)
+    
+    def _process_images(self, images: List[bytes], prompt: str) -> str:
+        response = self.model.generate_content(**self._request_kwargs(images, prompt))
+        record_gemini_usage(self, response)
         return response.text
+    
+    async def _aprocess_images(self, images: List[bytes], prompt: str) -> str:
+        response = await self.model.generate_content_async(**self._request_kwargs(images, prompt))
+        record_gemini_usage(self, response)
+        return response.text
+    
+    def _stream_image(self, image_bytes: bytes, prompt: str) -> Iterator[str]:
+        for chunk in self.model.generate_content(**self._request_kwargs([image_bytes], prompt), stream=True):
+            yield chunk.text
+    
+    async def _astream_image(self, image_bytes: bytes, prompt: str) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(**self._request_kwargs([image_bytes], prompt), stream=True)
+        async for chunk in response:
+            yield chunk.text
 
 class GeminiFlash2Client(BaseLLMClient):
+    model_name = "gemini-2.0-flash-exp"
+    estimated_image_tokens = 258
+
     def _setup_client(self) -> None:
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        import google.generativeai as genai
+
+        configure_gemini(self.api_key)
+        self.model = genai.GenerativeModel(self.model_name)
     
-    def process_image(self, image_bytes: bytes, prompt: str=MARKDOWN_CONVERTER_PROMPT) -> str:
+    def _request_kwargs(self, images: List[bytes], prompt: str) -> Dict[str, Any]:
         # safety_settings_b64 = "e30="  # @param {isTemplate: true}
         # safety_settings = json.loads(base64.b64decode(safety_settings_b64))
-        response = self.model.generate_content(
-            contents=[prompt, {"mime_type": "image/png", "data": image_bytes}],
+        return dict(
+            contents=gemini_contents(images, prompt),
             # safety_settings={
             #     HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
             #     HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
@@ -87,4 +518,28 @@ class GeminiFlash2Client(BaseLLMClient):
                     {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}],
             generation_config={"temperature": 0.3}
         )
+    
+    def _process_image(self, image_bytes: bytes, prompt: str) -> str:
+        return self._process_images([image_bytes], prompt)
+    
+    async def _aprocess_image(self, image_bytes: bytes, prompt: str) -> str:
+        return await self._aprocess_images([image_bytes], prompt)
+    
+    def _process_images(self, images: List[bytes], prompt: str) -> str:
+        response = self.model.generate_content(**self._request_kwargs(images, prompt))
+        record_gemini_usage(self, response)
+        return response.text
+    
+    async def _aprocess_images(self, images: List[bytes], prompt: str) -> str:
+        response = await self.model.generate_content_async(**self._request_kwargs(images, prompt))
+        record_gemini_usage(self, response)
         return response.text
+    
+    def _stream_image(self, image_bytes: bytes, prompt: str) -> Iterator[str]:
+        for chunk in self.model.generate_content(**self._request_kwargs([image_bytes], prompt), stream=True):
+            yield chunk.text
+    
+    async def _astream_image(self, image_bytes: bytes, prompt: str) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(**self._request_kwargs([image_bytes], prompt), stream=True)
+        async for chunk in response:
+            yield chunk.text
@@ -1,21 +1,245 @@
+import atexit
 from enum import Enum
-from typing import Optional
-from .clients import BaseLLMClient, GPT4VisionClient, GeminiFlash1Client, GeminiFlash2Client
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Mapping, Optional, Sequence, Tuple, Type, Union
+from .clients import DEFAULT_MAX_CONNECTIONS, BaseLLMClient, GPT4VisionClient, GeminiFlash1Client, GeminiFlash2Client
+from .hedging import HedgedClient
+from .throttle import RateLimiter
 
 class LLMType(Enum):
     GPT4_VISION = "gpt4-vision"
     GEMINI_FLASH_1 = "gemini-flash-1"
     GEMINI_FLASH_2 = "gemini-flash-2"
 
+# Budget of a provider as (requests per minute, tokens per minute), None for no token budget
+RateLimit = Tuple[float, Optional[float]]
+# Rate limit of one provider, or rate limits by LLM type; LLM types missing from it are not limited
+RateLimits = Union[RateLimit, Mapping[Union[LLMType, str], RateLimit]]
+
+# Entry tier budgets of the providers. Clients are only rate limited when asked
+# to, e.g. with rate_limit=RATE_LIMITS; accounts on higher tiers pass their own.
+RATE_LIMITS: Dict[LLMType, RateLimit] = {
+    LLMType.GPT4_VISION: (500, 30_000),
+    LLMType.GEMINI_FLASH_1: (2_000, 4_000_000),
+    LLMType.GEMINI_FLASH_2: (10, 4_000_000),
+}
+
+logger = logging.getLogger(__name__)
+
+CLIENT_CLASSES: Dict[LLMType, Type[BaseLLMClient]] = {
+    LLMType.GPT4_VISION: GPT4VisionClient,
+    LLMType.GEMINI_FLASH_1: GeminiFlash1Client,
+    LLMType.GEMINI_FLASH_2: GeminiFlash2Client,
+}
+
+# Service issuing the API keys of every LLM type; types of one provider share keys
+PROVIDERS: Dict[LLMType, str] = {
+    LLMType.GPT4_VISION: "openai",
+    LLMType.GEMINI_FLASH_1: "google",
+    LLMType.GEMINI_FLASH_2: "google",
+}
+
+def _type_name(llm_type: Union[LLMType, str]) -> str:
+    return llm_type.value if isinstance(llm_type, LLMType) else llm_type
+
+
+def provider_of(llm_type: Union[LLMType, str]) -> Optional[str]:
+    """Provider of a built-in LLM type, None for custom types whose provider is unknown"""
+    try:
+        return PROVIDERS.get(LLMType(_type_name(llm_type)))
+    except ValueError:
+        return None
+
+
+def resolve_rate_limit(llm_type: Union[LLMType, str], rate_limit: Optional[RateLimits]) -> Optional[RateLimit]:
+    """Rate limit of an LLM type from a single limit or limits by LLM type, None if not limited"""
+    if rate_limit is None:
+        return None
+    if not isinstance(rate_limit, Mapping):
+        # Lists as read from JSON are accepted too; limits are part of the client key
+        return tuple(rate_limit)
+    limits = {_type_name(key): value for key, value in rate_limit.items()}
+    limit = limits.get(_type_name(llm_type))
+    return tuple(limit) if limit is not None else None
+
+
 class LLMFactory:
-    @staticmethod
-    def create_client(llm_type: LLMType, api_key: str) -> BaseLLMClient:
+    _rate_limiters: Dict[Tuple[Union[LLMType, str], str, RateLimit], RateLimiter] = {}
+    _registry: Dict[str, Callable[..., BaseLLMClient]] = {}
+    # Shared clients by provider, model, API key digest and rate limit; their pools grow to the largest caller
+    _clients: Dict[Tuple[str, str, str, Optional[RateLimit]], BaseLLMClient] = {}
+    _lock = threading.RLock()
+
+    @classmethod
+    def register(cls, llm_type: str, client_factory: Callable[..., BaseLLMClient]) -> None:
+        """
+        Register a client for a custom LLM type, e.g. a fake backend for benchmarks.
+        
+        Args:
+            llm_type (str): Name of the LLM type, used as llm_type of the converters
+            client_factory (Callable[..., BaseLLMClient]): Client class or factory, called
+                with api_key, rate_limiter and max_connections keyword arguments
         """
-        Create an LLM client based on the specified type.
+        with cls._lock:
+            cls._registry[llm_type] = client_factory
+
+    @classmethod
+    def unregister(cls, llm_type: str) -> None:
+        """Remove a custom LLM type registered with register()"""
+        with cls._lock:
+            cls._registry.pop(llm_type, None)
+
+    @classmethod
+    def get_rate_limiter(cls, llm_type: Union[LLMType, str], api_key: str,
+                         rate_limit: Optional[RateLimits] = None) -> Optional[RateLimiter]:
+        """
+        Get the rate limiter shared by all clients of a provider, API key and budget.
+        
+        Args:
+            llm_type (LLMType): Type of LLM client, or the name of a registered custom type
+            api_key (str): API key for the service
+            rate_limit (Optional[RateLimits]): Budget of the provider, or budgets by LLM type
+            
+        Returns:
+            Optional[RateLimiter]: Shared rate limiter, or None if the provider has no budget
+        """
+        limits = resolve_rate_limit(llm_type, rate_limit)
+        if limits is None:
+            return None
+        
+        with cls._lock:
+            key = (llm_type, api_key, limits)
+            if key not in cls._rate_limiters:
+                requests_per_minute, tokens_per_minute = limits
+                cls._rate_limiters[key] = RateLimiter(requests_per_minute, tokens_per_minute)
+            return cls._rate_limiters[key]
+
+    @classmethod
+    def get_client(cls, llm_type: LLMType, api_key: str,
+                   max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                   rate_limit: Optional[RateLimits] = None) -> BaseLLMClient:
+        """
+        Get the client shared by all callers of a provider, model, API key and rate limit.
+        
+        The client is created on first use and kept with its open
+        connections until close_all(), so converting many documents in a
+        long-running process does not set up a new client per document.
+        Its connection pool grows to the largest max_connections asked for.
+        A list of types gets the hedged client of get_hedged_client().
+        
+        Args:
+            llm_type (LLMType): Type of LLM client, or a list of types in order of preference
+            api_key (str): API key for the service
+            max_connections (int): Connections kept open to the provider, e.g. the number of workers
+            rate_limit (Optional[RateLimits]): Budget the requests are throttled to, or budgets
+                by LLM type such as RATE_LIMITS (default: not throttled)
+            
+        Returns:
+            BaseLLMClient: Shared LLM client
+            
+        Raises:
+            ValueError: If llm_type is not supported
+        """
+        if isinstance(llm_type, (list, tuple)):
+            return cls.get_hedged_client(llm_type, api_key, max_connections=max_connections, rate_limit=rate_limit)
+        name = _type_name(llm_type)
+        with cls._lock:
+            custom = isinstance(llm_type, str) and llm_type in cls._registry
+        model_name = "" if custom else cls._client_class(llm_type).model_name
+        limits = resolve_rate_limit(llm_type, rate_limit)
+        key = (name, model_name, hashlib.sha256(api_key.encode("utf-8")).hexdigest(), limits)
+        
+        with cls._lock:
+            client = cls._clients.get(key)
+            if client is None or client.closed:
+                client = cls._new_client(llm_type, api_key, max_connections, limits)
+                cls._clients[key] = client
+            else:
+                client.grow_pool(max_connections)
+            return client
+
+    @classmethod
+    def get_hedged_client(cls, llm_types: Sequence[LLMType], api_key: Union[str, Dict[str, str]],
+                          max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                          rate_limit: Optional[RateLimits] = None, **options) -> HedgedClient:
+        """
+        Get the shared client hedging and failing over between several providers or models.
+        
+        Args:
+            llm_types (Sequence[LLMType]): Types of LLM client in order of preference
+            api_key (Union[str, Dict[str, str]]): API key for all services, or keys by LLM type name
+            max_connections (int): Connections kept open to each provider
+            rate_limit (Optional[RateLimits]): Budget of every provider, or budgets by LLM type
+            **options: Hedging options of HedgedClient, e.g. hedge_percentile
+            
+        Returns:
+            HedgedClient: Client spreading requests over the shared clients of the given types
+            
+        Raises:
+            ValueError: If an LLM type is not supported or has no API key
+        """
+        names = [_type_name(llm_type) for llm_type in llm_types]
+        keys = [api_key.get(name) if isinstance(api_key, dict) else api_key for name in names]
+        for name, key in zip(names, keys):
+            if not key:
+                raise ValueError(f"No API key for LLM type: {name}")
+        limits = tuple(resolve_rate_limit(name, rate_limit) for name in names)
+        key = ("+".join(names), repr(sorted(options.items())),
+               hashlib.sha256("\0".join(keys).encode("utf-8")).hexdigest(), limits)
+        
+        with cls._lock:
+            client = cls._clients.get(key)
+            if client is None or client.closed:
+                client = HedgedClient([cls.get_client(llm_type, api_key, max_connections=max_connections,
+                                                      rate_limit=limit)
+                                       for llm_type, api_key, limit in zip(llm_types, keys, limits)], **options)
+                cls._clients[key] = client
+            else:
+                client.grow_pool(max_connections)
+            return client
+
+    @classmethod
+    def close_all(cls) -> None:
+        """Close and forget all shared clients; later get_client() calls create new ones"""
+        with cls._lock:
+            clients = list(cls._clients.values())
+            cls._clients.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception as e:
+                logger.warning("Failed to close %s: %s", type(client).__name__, e)
+
+    @classmethod
+    async def aclose_all(cls) -> None:
+        """Close and forget all shared clients, including their async connections"""
+        with cls._lock:
+            clients = list(cls._clients.values())
+            cls._clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning("Failed to close %s: %s", type(client).__name__, e)
+
+    @classmethod
+    def create_client(cls, llm_type: LLMType, api_key: str,
+                      max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                      rate_limit: Optional[RateLimits] = None) -> BaseLLMClient:
+        """
+        Create a new LLM client based on the specified type.
+        
+        The caller owns the client and closes it; use get_client() to
+        share one client between converters.
         
         Args:
             llm_type (LLMType): Type of LLM client to create
             api_key (str): API key for the service
+            max_connections (int): Connections kept open to the provider
+            rate_limit (Optional[RateLimits]): Budget the requests are throttled to, or budgets
+                by LLM type (default: not throttled)
             
         Returns:
             BaseLLMClient: Configured LLM client
@@ -23,20 +247,35 @@ class LLMFactory:
         Raises:
             ValueError: If llm_type is not supported
         """
+        with cls._lock:
+            return cls._new_client(llm_type, api_key, max_connections, resolve_rate_limit(llm_type, rate_limit))
+
+    @classmethod
+    def _new_client(cls, llm_type: LLMType, api_key: str, max_connections: int,
+                    rate_limit: Optional[RateLimit] = None) -> BaseLLMClient:
+        """Create a client, with the lock held"""
+        client_factory = cls._registry.get(llm_type) if isinstance(llm_type, str) else None
+        if client_factory is None:
+            client_factory = cls._client_class(llm_type)
+            llm_type = LLMType(llm_type)
+        # Custom types are throttled and sized like the built-in ones
+        rate_limiter = cls.get_rate_limiter(llm_type, api_key, rate_limit)
+        return client_factory(api_key=api_key, rate_limiter=rate_limiter, max_connections=max_connections)
+
+    @staticmethod
+    def _client_class(llm_type: LLMType) -> Type[BaseLLMClient]:
         if isinstance(llm_type, str):
             try:
                 llm_type = LLMType(llm_type)
             except ValueError:
                 raise ValueError(f"Unsupported LLM type: {llm_type}")
 
-        clients = {
-            LLMType.GPT4_VISION: GPT4VisionClient,
-            LLMType.GEMINI_FLASH_1: GeminiFlash1Client,
-            LLMType.GEMINI_FLASH_2: GeminiFlash2Client
-        }
-        
-        client_class = clients.get(llm_type)
+        client_class = CLIENT_CLASSES.get(llm_type)
         if not client_class:
             raise ValueError(f"Unsupported LLM type: {llm_type}")
-        
-        return client_class(api_key=api_key) 
\ No newline at end of file
+        return client_class
+
+
+# Shared clients hold open connections until the interpreter exits
+atexit.register(LLMFactory.close_all)
+ 
\ No newline at end of file
@@ -0,0 +1,337 @@
+"""
+Local fakes of an LLM provider.
+
+FakeLLMServer is an OpenAI compatible chat completions endpoint used to
+exercise the rate limiter, retries and circuit breaker without a real
+provider: the server injects latency, random failures and 429s carrying
+a Retry-After header once a request budget is exceeded. FakeLLMClient
+answers in-process without any network traffic, for benchmarks.
+
+Example:
+    with FakeLLMServer(latency=0.2, requests_per_second=5) as server:
+        client = GPT4VisionClient("fake-key", base_url=server.base_url)
+        print(measure_throughput(client, pages=50, concurrency=10))
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from .clients import BaseLLMClient
+
+
+FAKE_PAGE_CONTENT = "<task_one>\nFake page\n</task_one>\n\n<task_two>\n# Fake page\n</task_two>"
+
+
+class FakeLLMServer:
+    """Threaded HTTP server answering chat completion requests with canned content"""
+
+    def __init__(self,
+                 latency: float = 0.0,
+                 latency_jitter: float = 0.0,
+                 requests_per_second: Optional[float] = None,
+                 error_rate: float = 0.0,
+                 retry_after: float = 1.0,
+                 content: str = FAKE_PAGE_CONTENT,
+                 stream_chunk_size: int = 16):
+        """
+        Initialize the server.
+
+        Args:
+            latency (float): Seconds each request takes
+            latency_jitter (float): Maximum random latency added on top
+            requests_per_second (Optional[float]): Request budget, excess requests get a 429
+            error_rate (float): Fraction of requests failing with a 503
+            retry_after (float): Retry-After value sent with every 429
+            content (str): Message content returned by successful requests
+            stream_chunk_size (int): Characters per chunk of streamed responses
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.requests_per_second = requests_per_second
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.content = content
+        self.stream_chunk_size = max(1, stream_chunk_size)
+        self.counters = {"requests": 0, "succeeded": 0, "throttled": 0, "failed": 0}
+        self._allowance = requests_per_second or 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "FakeLLMServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _admit(self) -> str:
+        """Decide the outcome of an incoming request"""
+        with self._lock:
+            self.counters["requests"] += 1
+            if self.requests_per_second:
+                now = time.monotonic()
+                self._allowance = min(
+                    self.requests_per_second,
+                    self._allowance + (now - self._updated) * self.requests_per_second,
+                )
+                self._updated = now
+                if self._allowance < 1:
+                    self.counters["throttled"] += 1
+                    return "throttled"
+                self._allowance -= 1
+            if random.random() < self.error_rate:
+                self.counters["failed"] += 1
+                return "failed"
+            self.counters["succeeded"] += 1
+            return "ok"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self):
+                # Server-sent events as sent by the chat completions API with stream=True
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                size = server.stream_chunk_size
+                for start in range(0, len(server.content), size):
+                    chunk = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": "gpt-4o",
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"content": server.content[start:start + size]},
+                            "finish_reason": None,
+                        }],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def do_POST(self):
+                # Drain the request body so the connection can be reused
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                try:
+                    stream = bool(json.loads(body or b"{}").get("stream"))
+                except ValueError:
+                    stream = False
+
+                outcome = server._admit()
+                if outcome == "throttled":
+                    self._reply(
+                        429,
+                        {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                        {"Retry-After": str(server.retry_after)},
+                    )
+                    return
+
+                time.sleep(server.latency + random.uniform(0, server.latency_jitter))
+
+                if outcome == "failed":
+                    self._reply(503, {"error": {"message": "Service unavailable", "type": "server_error"}})
+                    return
+
+                if stream:
+                    self._stream()
+                    return
+
+                self._reply(200, {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": "gpt-4o",
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": server.content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+
+        return Handler
+
+
+class FakeServiceUnavailable(Exception):
+    """Transient failure injected by FakeLLMClient"""
+    status_code = 503
+
+
+class FakeLLMClient(BaseLLMClient):
+    """
+    In-process client answering every request with canned content.
+
+    Requests wait for a simulated latency and fail at a configurable rate
+    with a retryable error, so the full retry path is exercised. Requests
+    for several pages get one tagged block per page.
+    """
+
+    def __init__(self,
+                 api_key: str = "fake-key",
+                 latency: float = 0.0,
+                 latency_jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 stall_rate: float = 0.0,
+                 stall_latency: float = 0.0,
+                 latency_per_mb: float = 0.0,
+                 content: str = FAKE_PAGE_CONTENT,
+                 stream_chunk_size: int = 16,
+                 seed: Optional[int] = None,
+                 **kwargs):
+        """
+        Initialize the client.
+
+        Args:
+            api_key (str): Ignored
+            latency (float): Seconds each request takes
+            latency_jitter (float): Maximum random latency added on top
+            error_rate (float): Fraction of requests failing with FakeServiceUnavailable
+            stall_rate (float): Fraction of requests that stall, the tail latency of real providers
+            stall_latency (float): Seconds a stalled request takes on top of its latency
+            latency_per_mb (float): Seconds added per megabyte of images, as real requests
+                take longer the more content there is to transcribe
+            content (str): Response to every page
+            stream_chunk_size (int): Characters per chunk of streamed responses
+            seed (Optional[int]): Seed of the latency and failure draws
+            **kwargs: Rate limiter, retry policy and circuit breaker of BaseLLMClient
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_latency = stall_latency
+        self.latency_per_mb = latency_per_mb
+        self.content = content
+        self.stream_chunk_size = max(1, stream_chunk_size)
+        self.counters = {"requests": 0, "pages": 0, "failed": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        super().__init__(api_key, **kwargs)
+
+    def _setup_client(self) -> None:
+        pass
+
+    def _draw(self, images: List[bytes]) -> Tuple[float, bool]:
+        """Latency and outcome of the next request"""
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters["pages"] += len(images)
+            delay = self.latency + self._random.uniform(0, self.latency_jitter)
+            delay += self.latency_per_mb * sum(len(image) for image in images) / (1024 * 1024)
+            if self.stall_rate and self._random.random() < self.stall_rate:
+                delay += self.stall_latency
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.counters["failed"] += 1
+            return delay, failed
+
+    def _respond(self, page_count: int, failed: bool) -> str:
+        if failed:
+            raise FakeServiceUnavailable("Service unavailable")
+        if page_count == 1:
+            return self.content
+        return "".join(f'<page number="{number}">{self.content}</page>' for number in range(1, page_count + 1))
+
+    def _process_image(self, image_bytes: bytes, prompt: str) -> str:
+        return self._process_images([image_bytes], prompt)
+
+    async def _aprocess_image(self, image_bytes: bytes, prompt: str) -> str:
+        return await self._aprocess_images([image_bytes], prompt)
+
+    def _process_images(self, images: List[bytes], prompt: str) -> str:
+        delay, failed = self._draw(images)
+        time.sleep(delay)
+        return self._respond(len(images), failed)
+
+    async def _aprocess_images(self, images: List[bytes], prompt: str) -> str:
+        delay, failed = self._draw(images)
+        await asyncio.sleep(delay)
+        return self._respond(len(images), failed)
+
+    def _stream_image(self, image_bytes: bytes, prompt: str) -> Iterator[str]:
+        content = self._process_image(image_bytes, prompt)
+        for start in range(0, len(content), self.stream_chunk_size):
+            yield content[start:start + self.stream_chunk_size]
+
+    async def _astream_image(self, image_bytes: bytes, prompt: str) -> AsyncIterator[str]:
+        content = await self._aprocess_image(image_bytes, prompt)
+        for start in range(0, len(content), self.stream_chunk_size):
+            yield content[start:start + self.stream_chunk_size]
+
+
+def measure_throughput(client: BaseLLMClient,
+                       pages: int = 100,
+                       concurrency: int = 10,
+                       image_bytes: bytes = b"fake-page") -> Dict[str, float]:
+    """
+    Send pages requests through a client and measure the throughput.
+
+    Args:
+        client (BaseLLMClient): Client under test
+        pages (int): Number of page requests to send
+        concurrency (int): Number of requests in flight
+        image_bytes (bytes): Payload sent as the page image
+
+    Returns:
+        Dict[str, float]: Elapsed seconds, pages per second and page outcomes
+    """
+    def send(_):
+        try:
+            client.process_image(image_bytes)
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(send, range(pages)))
+    elapsed = time.perf_counter() - start
+
+    succeeded = sum(outcomes)
+    return {
+        "elapsed": elapsed,
+        "pages_per_second": succeeded / elapsed if elapsed else 0.0,
+        "succeeded": succeeded,
+        "failed": pages - succeeded,
+    }
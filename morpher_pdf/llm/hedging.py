@@ -0,0 +1,368 @@
+import asyncio
+import bisect
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import contextvars
+import logging
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .clients import BaseLLMClient
+from .prompts import MARKDOWN_CONVERTER_PROMPT
+from ..stats import current_stats
+
+logger = logging.getLogger(__name__)
+
+# Until a client has enough samples for its percentile, requests are hedged
+# once they take this many times its median latency
+COLD_MEDIAN_FACTOR = 4
+# Seconds between checks of the hedging threshold, which moves as latencies come in
+HEDGE_RECHECK_INTERVAL = 1.0
+
+
+class LatencyHistogram:
+    """
+    Request latencies in logarithmic buckets.
+
+    Buckets grow by 10% from 10 ms to about 15 minutes, so percentiles are
+    accurate to 10% at any scale. Once max_count requests are recorded the
+    counts are halved, so old requests fade out and the percentiles follow
+    the provider's current behavior. Thread-safe.
+    """
+
+    def __init__(self, min_seconds: float = 0.01, growth: float = 1.1, buckets: int = 120, max_count: int = 1000):
+        self.bounds = [min_seconds * growth ** index for index in range(buckets)]
+        self.max_count = max_count
+        # The last bucket collects everything beyond the largest bound
+        self._counts = [0.0] * (buckets + 1)
+        self._total = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> float:
+        """Number of requests the percentiles are based on, after decay"""
+        return self._total
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.bounds, seconds)] += 1
+            self._total += 1
+            if self._total > self.max_count:
+                self._counts = [count / 2 for count in self._counts]
+                self._total /= 2
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Latency below which a fraction q of the requests finished, None without requests.
+
+        Args:
+            q (float): Fraction between 0 and 1, e.g. 0.95
+        """
+        with self._lock:
+            if not self._total:
+                return None
+            target = q * self._total
+            cumulative = 0.0
+            for index, count in enumerate(self._counts):
+                cumulative += count
+                if cumulative >= target and count:
+                    return self.bounds[min(index, len(self.bounds) - 1)]
+            return self.bounds[-1]
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Request count with the median, p95 and p99 latencies"""
+        return {"count": self.count, "p50": self.percentile(0.5),
+                "p95": self.percentile(0.95), "p99": self.percentile(0.99)}
+
+
+class HedgedClient(BaseLLMClient):
+    """
+    Client spreading requests over several providers or models.
+
+    Requests go to the first client. Once a request has been waiting
+    longer than the hedge_percentile latency of that client, a duplicate
+    is sent to the next client; the first answer wins and the other
+    request is cancelled. A request that fails, after the retries of its
+    client, fails over to the next client in order.
+
+    Latencies are tracked per client in histograms. Until a client has
+    min_samples requests, requests are hedged after a few times its median
+    latency, or after initial_hedge_delay before its first answer. The
+    histograms live as long as the client, so a shared client hedges
+    accurately from the first page of later documents. Streaming requests
+    fail over but are not hedged.
+
+    The wrapped clients keep their own rate limiters, retries and circuit
+    breakers. They are usually shared, so closing the hedged client does
+    not close them.
+
+    Example:
+        client = HedgedClient([LLMFactory.get_client("gemini-flash-1", gemini_key),
+                               LLMFactory.get_client("gpt4-vision", openai_key)])
+        converter = MarkdownConverter("report.pdf", openai_key, llm_client=client)
+    """
+
+    def __init__(self,
+                 clients: Sequence[BaseLLMClient],
+                 hedge_percentile: float = 0.95,
+                 max_hedges: int = 1,
+                 min_samples: int = 20,
+                 initial_hedge_delay: float = 10.0,
+                 hedge_delay: Optional[float] = None):
+        """
+        Initialize the client.
+
+        Args:
+            clients (Sequence[BaseLLMClient]): Clients in order of preference
+            hedge_percentile (float): Latency percentile of a client after which a request is hedged
+            max_hedges (int): Duplicates a request may get on top of the original, 0 only fails over
+            min_samples (int): Requests a client needs before its percentile is trusted
+            initial_hedge_delay (float): Seconds before hedging while a client has fewer samples
+            hedge_delay (Optional[float]): Fixed seconds before hedging, overriding the histograms
+        """
+        if not clients:
+            raise ValueError("HedgedClient needs at least one client")
+        self.clients = list(clients)
+        self.hedge_percentile = hedge_percentile
+        self.max_hedges = max_hedges
+        self.min_samples = min_samples
+        self.initial_hedge_delay = initial_hedge_delay
+        self.hedge_delay = hedge_delay
+        self.latencies = [LatencyHistogram() for _ in self.clients]
+        # Executors replaced by grow_pool(), whose requests may still be running
+        self._retired = []
+        self.model_name = "+".join(client.model_name or type(client).__name__ for client in self.clients)
+        super().__init__("", max_connections=max(client.max_connections for client in self.clients))
+
+    def _setup_client(self) -> None:
+        # Requests and their hedges each need a thread of their own
+        self._executor = ThreadPoolExecutor(max_workers=self.max_connections * len(self.clients),
+                                            thread_name_prefix="morpher-hedge")
+
+    def _resize_pool(self) -> None:
+        for client in self.clients:
+            client.grow_pool(self.max_connections)
+        # Calls may still be submitting to the previous executor, it is shut down on close
+        self._retired.append(self._executor)
+        self._setup_client()
+
+    def close(self) -> None:
+        for executor in self._retired:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        super().close()
+
+    @property
+    def supports_multiple_images(self) -> bool:
+        return all(client.supports_multiple_images for client in self.clients)
+
+    def latency_report(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Latency summary of every wrapped client, by model name"""
+        names = [client.model_name or type(client).__name__ for client in self.clients]
+        # Clients of the same model are told apart by their position
+        return {name if names.count(name) == 1 else f"{name}#{index}": histogram.summary()
+                for index, (name, histogram) in enumerate(zip(names, self.latencies))}
+
+    def _hedge_after(self, index: int) -> float:
+        """Seconds to wait on a request to the client at index before hedging it"""
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        histogram = self.latencies[index]
+        if not histogram.count:
+            return self.initial_hedge_delay
+        if histogram.count < self.min_samples:
+            return min(self.initial_hedge_delay, COLD_MEDIAN_FACTOR * histogram.percentile(0.5))
+        return histogram.percentile(self.hedge_percentile)
+
+    def _hedge_wait(self, index: int, launched_at: float) -> Tuple[float, bool]:
+        """Seconds to wait for an answer before checking again, and whether the request is due for a hedge"""
+        remaining = launched_at + self._hedge_after(index) - time.monotonic()
+        return max(0.0, min(remaining, HEDGE_RECHECK_INTERVAL)), remaining <= 0
+
+    def _process_image(self, image_bytes: bytes, prompt: str) -> str:
+        return self.clients[0].process_image(image_bytes, prompt)
+
+    def process_image(self, image_bytes: bytes, prompt: str = MARKDOWN_CONVERTER_PROMPT) -> str:
+        return self._hedged_call("process_image", image_bytes, prompt)
+
+    async def aprocess_image(self, image_bytes: bytes, prompt: str = MARKDOWN_CONVERTER_PROMPT) -> str:
+        return await self._ahedged_call("aprocess_image", image_bytes, prompt)
+
+    def process_images(self, images: List[bytes], prompt: str) -> str:
+        return self._hedged_call("process_images", images, prompt)
+
+    async def aprocess_images(self, images: List[bytes], prompt: str) -> str:
+        return await self._ahedged_call("aprocess_images", images, prompt)
+
+    def stream_image(self, image_bytes: bytes, prompt: str = MARKDOWN_CONVERTER_PROMPT) -> Iterator[str]:
+        for index, client in enumerate(self.clients):
+            started = False
+            try:
+                for chunk in client.stream_image(image_bytes, prompt):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                # Chunks already handed out cannot be taken back
+                if started or index == len(self.clients) - 1:
+                    raise
+                self._record_failover(index, index + 1, e)
+
+    async def astream_image(self, image_bytes: bytes, prompt: str = MARKDOWN_CONVERTER_PROMPT) -> AsyncIterator[str]:
+        for index, client in enumerate(self.clients):
+            started = False
+            try:
+                async for chunk in client.astream_image(image_bytes, prompt):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started or index == len(self.clients) - 1:
+                    raise
+                self._record_failover(index, index + 1, e)
+
+    def _timed_call(self, index: int, method: str, *args) -> str:
+        """Call a method of the client at index, recording its latency on success"""
+        # Losing requests run to their end on their thread and are recorded like winners
+        start = time.perf_counter()
+        result = getattr(self.clients[index], method)(*args)
+        self.latencies[index].record(time.perf_counter() - start)
+        return result
+
+    async def _atimed_call(self, index: int, method: str, *args) -> str:
+        """Await a method of the client at index, recording its latency on success or cancellation"""
+        start = time.perf_counter()
+        try:
+            result = await getattr(self.clients[index], method)(*args)
+        except asyncio.CancelledError:
+            # A cancelled loser took at least this long; leaving it out would hide
+            # the slow tail the hedge delay is taken from
+            self.latencies[index].record(time.perf_counter() - start)
+            raise
+        self.latencies[index].record(time.perf_counter() - start)
+        return result
+
+    def _hedged_call(self, method: str, *args) -> str:
+        """
+        Run a request with hedging and failover on the executor threads.
+
+        Threads cannot be interrupted, so a losing request runs to its end
+        in the background; its latency is still recorded.
+        """
+        pending: Dict[Future, int] = {}
+        next_index = 0
+        launched_at = 0.0
+        hedges = 0
+        error: Optional[Exception] = None
+
+        def launch() -> None:
+            nonlocal next_index, launched_at
+            # Each request runs with the stats of the caller's conversion run
+            context = contextvars.copy_context()
+            pending[self._executor.submit(context.run, self._timed_call, next_index, method, *args)] = next_index
+            next_index += 1
+            launched_at = time.monotonic()
+
+        launch()
+        while pending:
+            timeout, due = None, False
+            if hedges < self.max_hedges and next_index < len(self.clients):
+                timeout, due = self._hedge_wait(next_index - 1, launched_at)
+            if due:
+                done = set()
+            else:
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if not due:
+                    continue
+                hedges += 1
+                self._record_hedge(next_index)
+                launch()
+                continue
+
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    if not pending and next_index < len(self.clients):
+                        self._record_failover(index, next_index, e)
+                        launch()
+                    continue
+                for other in pending:
+                    other.cancel()
+                self._record_win(index)
+                return result
+        raise error
+
+    async def _ahedged_call(self, method: str, *args) -> str:
+        """Run a request with hedging and failover as tasks; the losing request is cancelled"""
+        pending: Dict[asyncio.Task, int] = {}
+        next_index = 0
+        launched_at = 0.0
+        hedges = 0
+        error: Optional[Exception] = None
+
+        def launch() -> None:
+            nonlocal next_index, launched_at
+            pending[asyncio.ensure_future(self._atimed_call(next_index, method, *args))] = next_index
+            next_index += 1
+            launched_at = time.monotonic()
+
+        launch()
+        try:
+            while pending:
+                timeout, due = None, False
+                if hedges < self.max_hedges and next_index < len(self.clients):
+                    timeout, due = self._hedge_wait(next_index - 1, launched_at)
+                if due:
+                    done = set()
+                else:
+                    done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if not due:
+                        continue
+                    hedges += 1
+                    self._record_hedge(next_index)
+                    launch()
+                    continue
+
+                for task in done:
+                    index = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        error = e
+                        if not pending and next_index < len(self.clients):
+                            self._record_failover(index, next_index, e)
+                            launch()
+                        continue
+                    self._record_win(index)
+                    return result
+            raise error
+        finally:
+            # Losers, or all requests if the caller was cancelled
+            for task in pending:
+                task.cancel()
+            if pending:
+                # Let them release their clients' circuit breakers and record their latency
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def _record_hedge(self, index: int) -> None:
+        logger.debug("Hedging a slow request to %s", self.clients[index].model_name)
+        stats = current_stats()
+        if stats is not None:
+            stats.increment("hedged_requests")
+
+    def _record_win(self, index: int) -> None:
+        stats = current_stats()
+        if stats is not None and index > 0:
+            stats.increment("fallback_answers")
+
+    def _record_failover(self, index: int, next_index: int, error: Exception) -> None:
+        logger.warning("Request to %s failed, failing over to %s: %s",
+                       self.clients[index].model_name, self.clients[next_index].model_name, error)
+        stats = current_stats()
+        if stats is not None:
+            stats.increment("failovers")
@@ -1,25 +1,8 @@
-MARKDOWN_CONVERTER_PROMPT = """
-Do two independent tasks "task one" and "task two" and place the result of those into these tags <task_one>...</task_one>, <task_two>...<task_two>.
+import re
+from typing import Dict, List, Optional
 
-Examples:
-<task_one>
-this is the plain text from an image
-</task_one>
-
-<task_two>
-### Header of the text
-text
-...
-</task_two>
-
-### TASK ONE
-Directly cite the text on this image. Preserve all the text.
-
-###TASK TWO
-Directly cite the text on this image. Preserve all the text.
-Convert this PDF page image to Markdown format. The text should be the same text you output in "task one"
-
-Follow these formatting rules:
+# Formatting rules shared by the Markdown prompts
+MARKDOWN_FORMATTING_RULES = """Follow these formatting rules:
 - Preserve all original formatting and layout
 - Never automatically complete the text. If the sentence is not complete, leave it as is.
 - Always keep the original text in the same order. If the text is not complete, leave it as is.
@@ -52,3 +35,91 @@ Return the converted text in clean Markdown format.
 Pay EXTRA attention to correct formatting of formulas.
 Make sure all powers are on a correct position!!!
 """
+
+MARKDOWN_CONVERTER_PROMPT = """
+Do two independent tasks "task one" and "task two" and place the result of those into these tags <task_one>...</task_one>, <task_two>...<task_two>.
+
+Examples:
+<task_one>
+this is the plain text from an image
+</task_one>
+
+<task_two>
+### Header of the text
+text
+...
+</task_two>
+
+### TASK ONE
+Directly cite the text on this image. Preserve all the text.
+
+###TASK TWO
+Directly cite the text on this image. Preserve all the text.
+Convert this PDF page image to Markdown format. The text should be the same text you output in "task one"
+
+""" + MARKDOWN_FORMATTING_RULES
+
+# Single pass variant: the page is only written out once, as Markdown
+MARKDOWN_SINGLE_TASK_PROMPT = """
+Convert this PDF page image to Markdown format and place the result into these tags <markdown>...</markdown>.
+Directly cite the text on this image. Preserve all the text.
+
+Example:
+<markdown>
+### Header of the text
+text
+...
+</markdown>
+
+""" + MARKDOWN_FORMATTING_RULES
+
+MULTI_PAGE_PROMPT_HEADER = """
+You are given {page_count} consecutive PDF page images, labeled "Page 1:" to "Page {page_count}:".
+Process every page on its own, following the instructions for a single page below.
+Wrap the complete result of each page in <page number="N">...</page>, where N is the label of the page, and output the pages in order.
+Never move content from one page to another and never skip a page. Output an empty <page number="N"></page> for a blank page.
+
+Instructions for a single page:
+"""
+
+REGION_PROMPT_HEADER = """
+The image is not a whole PDF page but a single region of one, holding a {kind}. The other regions of the page are converted separately and joined in reading order.
+Convert only what is visible in the image. Do not add headings, captions or page headers that are not in it, and do not complete text cut off at its edges.
+
+Instructions for a page:
+"""
+
+_PAGE_PATTERN = re.compile(r'<page\s+number="?(\d+)"?\s*>(.*?)</page>', re.DOTALL)
+
+
+def multi_page_prompt(prompt: str, page_count: int) -> str:
+    """Wrap a single-page prompt for a request covering page_count pages"""
+    return MULTI_PAGE_PROMPT_HEADER.format(page_count=page_count) + prompt
+
+
+def region_prompt(prompt: str, kind: str) -> str:
+    """Wrap a single-page prompt for a request covering one region of a page, e.g. a "table\""""
+    return REGION_PROMPT_HEADER.format(kind="column of text" if kind == "text" else kind) + prompt
+
+
+def split_multi_page_response(response: Optional[str], page_count: int) -> Optional[List[str]]:
+    """
+    Split the response to a multi-page prompt into per-page results.
+
+    Returns:
+        Optional[List[str]]: Result of every page in order, or None if the
+            response does not contain exactly one result per page
+    """
+    if not response:
+        return None
+
+    pages: Dict[int, str] = {}
+    for match in _PAGE_PATTERN.finditer(response):
+        number = int(match.group(1))
+        if number in pages:
+            return None
+        pages[number] = match.group(2)
+
+    if sorted(pages) != list(range(1, page_count + 1)):
+        return None
+    return [pages[number] for number in range(1, page_count + 1)]
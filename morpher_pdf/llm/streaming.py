@@ -0,0 +1,94 @@
+from typing import List, Optional
+
+
+def _partial_suffix(text: str, tag: str) -> int:
+    """Length of the longest suffix of text that is a proper prefix of tag"""
+    for length in range(min(len(text), len(tag) - 1), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class TagStreamParser:
+    """
+    Incrementally extract the content of a tag from a streamed response.
+
+    Chunks are fed as they arrive and the text inside the first
+    ``<tag>...</tag>`` pair is handed back as soon as it can no longer be
+    part of the closing tag. Everything outside the tag, such as the
+    ``<task_one>`` transcript, is dropped. Leading and trailing whitespace
+    of the content is trimmed, so the concatenated output equals the
+    stripped content of the tag.
+    """
+
+    def __init__(self, tag: str):
+        """
+        Initialize the parser.
+
+        Args:
+            tag (str): Name of the tag to extract, without angle brackets
+        """
+        self.open_tag = f"<{tag}>"
+        self.close_tag = f"</{tag}>"
+        self._buffer = ""
+        self._inside = False
+        self._done = False
+        self._started = False
+        self._whitespace = ""
+        self._parts: List[str] = []
+
+    @property
+    def done(self) -> bool:
+        """Whether the closing tag was seen"""
+        return self._done
+
+    @property
+    def result(self) -> Optional[str]:
+        """Complete content of the tag, or None if the tag was not closed"""
+        return "".join(self._parts) if self._done else None
+
+    def feed(self, chunk: str) -> str:
+        """
+        Consume the next chunk of the response.
+
+        Returns:
+            str: Newly available content of the tag, possibly empty
+        """
+        if self._done or not chunk:
+            return ""
+        self._buffer += chunk
+
+        if not self._inside:
+            index = self._buffer.find(self.open_tag)
+            if index < 0:
+                # Only a partial opening tag at the end is worth keeping
+                keep = _partial_suffix(self._buffer, self.open_tag)
+                self._buffer = self._buffer[len(self._buffer) - keep:]
+                return ""
+            self._buffer = self._buffer[index + len(self.open_tag):]
+            self._inside = True
+
+        index = self._buffer.find(self.close_tag)
+        if index >= 0:
+            text = self._buffer[:index]
+            self._buffer = ""
+            self._done = True
+            return self._emit(text, final=True)
+
+        # Hold back what could be the start of the closing tag
+        keep = _partial_suffix(self._buffer, self.close_tag)
+        text = self._buffer[:len(self._buffer) - keep]
+        self._buffer = self._buffer[len(self._buffer) - keep:]
+        return self._emit(text)
+
+    def _emit(self, text: str, final: bool = False) -> str:
+        text = self._whitespace + text
+        if not self._started:
+            text = text.lstrip()
+        stripped = text.rstrip()
+        # Trailing whitespace is only emitted once more content follows it
+        self._whitespace = "" if final else text[len(stripped):]
+        if stripped:
+            self._started = True
+            self._parts.append(stripped)
+        return stripped
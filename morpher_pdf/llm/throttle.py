@@ -0,0 +1,313 @@
+import asyncio
+from email.utils import parsedate_to_datetime
+import random
+import threading
+import time
+from typing import Optional
+
+
+# HTTP status codes worth retrying
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Exception class name fragments of transient provider errors
+RETRYABLE_ERROR_NAMES = (
+    "Timeout",
+    "RateLimit",
+    "APIConnectionError",
+    "ResourceExhausted",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+    "InternalServerError",
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit breaker is open"""
+    pass
+
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """Return the HTTP status code carried by a provider exception, if any"""
+    for attribute in ("status_code", "code"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """
+    Return the delay in seconds requested by the server, if any.
+
+    Looks at a ``retry_after`` attribute and at the ``Retry-After`` and
+    ``retry-after-ms`` headers of the HTTP response attached to the error.
+    """
+    retry_after = getattr(error, "retry_after", None)
+    if isinstance(retry_after, (int, float)):
+        return float(retry_after)
+
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    try:
+        milliseconds = headers.get("retry-after-ms")
+        if milliseconds is not None:
+            return float(milliseconds) / 1000
+
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            # Retry-After may also be an HTTP date
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttled(error: Exception) -> bool:
+    """Check whether an error means the provider is rate limiting us"""
+    if get_status_code(error) == 429:
+        return True
+    name = type(error).__name__
+    return "RateLimit" in name or "ResourceExhausted" in name
+
+
+class TokenBucket:
+    """Thread-safe token bucket handing out reservations"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum number of tokens the bucket holds
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1, rate: Optional[float] = None) -> float:
+        """
+        Take amount tokens from the bucket, going into debt if needed.
+
+        A reservation larger than the capacity grows the bucket to hold
+        it, so the largest request can still be sent from a full bucket
+        and is charged in full rather than capped.
+
+        Args:
+            amount (float): Number of tokens to take
+            rate (Optional[float]): Refill rate to use instead of the nominal one
+
+        Returns:
+            float: Seconds the caller has to wait before the reservation is valid
+        """
+        rate = rate or self.rate
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            if amount > self.capacity:
+                self._tokens += amount - self.capacity
+                self.capacity = amount
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / rate
+
+
+class RateLimiter:
+    """
+    Adaptive rate limiter over requests and tokens per minute.
+
+    The effective rate backs off multiplicatively whenever the provider
+    throttles us and recovers additively with every successful call.
+    """
+
+    def __init__(self,
+                 requests_per_minute: float,
+                 tokens_per_minute: Optional[float] = None,
+                 min_scale: float = 0.05,
+                 recovery_step: float = 0.02):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            requests_per_minute (float): Nominal request budget
+            tokens_per_minute (Optional[float]): Nominal token budget, unlimited if None
+            min_scale (float): Lowest fraction of the nominal rate to back off to
+            recovery_step (float): Fraction of the nominal rate recovered per success
+        """
+        self.requests = TokenBucket(requests_per_minute / 60, max(1.0, requests_per_minute / 60))
+        self.tokens = None
+        if tokens_per_minute:
+            self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute / 60 * 5)
+        self.min_scale = min_scale
+        self.recovery_step = recovery_step
+        self.scale = 1.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        scale = self.scale
+        delay = self.requests.reserve(1, self.requests.rate * scale)
+        if self.tokens is not None and tokens:
+            delay = max(delay, self.tokens.reserve(tokens, self.tokens.rate * scale))
+        return delay
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Block until one request using tokens tokens may be sent"""
+        delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, tokens: int = 0) -> None:
+        """Wait without blocking the event loop until one request may be sent"""
+        delay = self._reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.scale = min(1.0, self.scale + self.recovery_step)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self.scale = max(self.min_scale, self.scale / 2)
+
+
+class RetryPolicy:
+    """Jittered exponential backoff honoring server supplied Retry-After"""
+
+    def __init__(self, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        """
+        Initialize the retry policy.
+
+        Args:
+            max_retries (int): Maximum number of retries per call
+            base_delay (float): Backoff of the first retry in seconds
+            max_delay (float): Upper bound of a single backoff in seconds
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable(self, error: Exception) -> bool:
+        """Check whether a failed call is worth retrying"""
+        if isinstance(error, CircuitOpenError):
+            return False
+        if isinstance(error, (TimeoutError, ConnectionError)):
+            return True
+        if get_status_code(error) in RETRYABLE_STATUS_CODES:
+            return True
+        name = type(error).__name__
+        return any(fragment in name for fragment in RETRYABLE_ERROR_NAMES)
+
+    def delay(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """
+        Compute how long to wait before the next attempt.
+
+        Args:
+            attempt (int): Zero-based number of the retry
+            error (Optional[Exception]): Error of the failed attempt
+
+        Returns:
+            float: Delay in seconds
+        """
+        retry_after = get_retry_after(error) if error is not None else None
+        if retry_after is not None:
+            # Add a little jitter so throttled callers do not come back in lockstep
+            return min(self.max_delay, retry_after) + random.uniform(0, self.base_delay / 2)
+        # Full jitter backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker that stops calling a failing provider.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail fast with CircuitOpenError. Once ``reset_timeout`` seconds
+    have passed a single trial call is let through; its outcome closes or
+    re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit
+            reset_timeout (float): Seconds to wait before a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        Check whether a call may proceed.
+
+        Returns:
+            bool: Whether the call is the trial call of a half-open circuit; the
+                caller passes it to release() once the call is over
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            raise CircuitOpenError("Circuit breaker is open, provider is failing")
+
+    def release(self, trial: bool) -> None:
+        """
+        End a call that was let through, whatever its outcome.
+
+        A trial call that neither succeeded nor failed transiently, e.g. a
+        request rejected as invalid or cancelled, says nothing about the
+        provider's health: the circuit stays half-open and the next call
+        becomes the trial.
+
+        Args:
+            trial (bool): Result of before_call() for the call
+        """
+        if not trial:
+            return
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
@@ -0,0 +1,210 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Pipeline stages timed by the converters and LLM clients
+STAGES = (
+    "open",
+    "extract_embedded",
+    "extract_regions",
+    "render",
+    "encode",
+    "llm_wait",
+    "parse",
+    "merge",
+)
+
+# Stats of the run the current thread or task is working for
+_current_stats: ContextVar[Optional["ConversionStats"]] = ContextVar("morpher_conversion_stats", default=None)
+
+
+def current_stats() -> Optional["ConversionStats"]:
+    """Stats of the conversion run the caller is working for, if any"""
+    return _current_stats.get()
+
+
+class ConversionStats:
+    """
+    Timings and counters of a single conversion run.
+
+    Stage times are summed over all pages and threads, so with parallel
+    workers they may add up to more than the wall time of the run.
+    Counters include pages, LLM requests, retries, tokens, payload bytes
+    and cache hits. All methods are thread-safe.
+    """
+
+    def __init__(self):
+        self.stage_seconds: Dict[str, float] = defaultdict(float)
+        self.stage_calls: Dict[str, int] = defaultdict(int)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.started = time.time()
+        self.wall_seconds = 0.0
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block of code as one call of a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float, calls: int = 1) -> None:
+        with self._lock:
+            self.stage_seconds[name] += seconds
+            self.stage_calls[name] += calls
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def merge(self, other: Dict[str, Any]) -> None:
+        """Add the stage times and counters of another run, given as to_dict()"""
+        with self._lock:
+            for name, stage in other.get("stages", {}).items():
+                self.stage_seconds[name] += stage["seconds"]
+                self.stage_calls[name] += stage["calls"]
+            for name, value in other.get("counters", {}).items():
+                self.counters[name] += value
+
+    @contextmanager
+    def activate(self) -> Iterator["ConversionStats"]:
+        """Make these the stats recorded into by LLM clients in the current context"""
+        token = _current_stats.set(self)
+        try:
+            yield self
+        finally:
+            _current_stats.reset(token)
+
+    def finish(self) -> None:
+        """Stop the wall clock of the run"""
+        self.wall_seconds = time.perf_counter() - self._start
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.counters.get("pages", 0) / self.wall_seconds if self.wall_seconds else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started": self.started,
+                "wall_seconds": self.wall_seconds,
+                "pages_per_second": self.pages_per_second,
+                "stages": {name: {"seconds": self.stage_seconds[name], "calls": self.stage_calls[name]}
+                           for name in self.stage_seconds},
+                "counters": dict(self.counters),
+            }
+
+    def __repr__(self) -> str:
+        stages = ", ".join(f"{name}={seconds:.3f}s" for name, seconds in self.stage_seconds.items())
+        return (f"ConversionStats(pages={self.counters.get('pages', 0)}, "
+                f"wall={self.wall_seconds:.3f}s, {stages})")
+
+
+class StatsSink(ABC):
+    """Destination of the stats of finished conversion runs"""
+
+    @abstractmethod
+    def emit(self, stats: ConversionStats, labels: Dict[str, str]) -> None:
+        """
+        Publish the stats of a run.
+
+        Args:
+            stats (ConversionStats): Stats of the finished run
+            labels (Dict[str, str]): Identify the run, e.g. converter and document
+        """
+        pass
+
+
+class CallbackSink(StatsSink):
+    """Hands the stats of every run to a function"""
+
+    def __init__(self, callback: Callable[[ConversionStats, Dict[str, str]], None]):
+        self.callback = callback
+
+    def emit(self, stats: ConversionStats, labels: Dict[str, str]) -> None:
+        self.callback(stats, labels)
+
+
+class JSONLinesSink(StatsSink):
+    """Appends one JSON object per run to a file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, stats: ConversionStats, labels: Dict[str, str]) -> None:
+        line = json.dumps({"labels": labels, **stats.to_dict()})
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class PrometheusTextSink(StatsSink):
+    """
+    Keeps cumulative totals over all runs in the Prometheus text format.
+
+    The totals are rewritten to ``path`` after every run (suitable for the
+    node exporter textfile collector) and are available from render().
+    """
+
+    def __init__(self, path: Optional[str] = None, prefix: str = "morpher_pdf"):
+        self.path = path
+        self.prefix = prefix
+        self.runs = 0
+        self.wall_seconds = 0.0
+        self.stage_seconds: Dict[str, float] = defaultdict(float)
+        self.stage_calls: Dict[str, int] = defaultdict(int)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def emit(self, stats: ConversionStats, labels: Dict[str, str]) -> None:
+        data = stats.to_dict()
+        with self._lock:
+            self.runs += 1
+            self.wall_seconds += data["wall_seconds"]
+            for name, stage in data["stages"].items():
+                self.stage_seconds[name] += stage["seconds"]
+                self.stage_calls[name] += stage["calls"]
+            for name, value in data["counters"].items():
+                self.counters[name] += value
+            text = self._render()
+
+        if self.path is not None:
+            # Write atomically so the collector never reads a partial file
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(self.path + ".tmp", self.path)
+
+    def render(self) -> str:
+        """Current totals in the Prometheus text exposition format"""
+        with self._lock:
+            return self._render()
+
+    def _render(self) -> str:
+        prefix = self.prefix
+        lines = [
+            f"# TYPE {prefix}_runs_total counter",
+            f"{prefix}_runs_total {self.runs}",
+            f"# TYPE {prefix}_run_seconds_total counter",
+            f"{prefix}_run_seconds_total {self.wall_seconds}",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{name}"}} {seconds}'
+                  for name, seconds in sorted(self.stage_seconds.items())]
+        lines.append(f"# TYPE {prefix}_stage_calls_total counter")
+        lines += [f'{prefix}_stage_calls_total{{stage="{name}"}} {calls}'
+                  for name, calls in sorted(self.stage_calls.items())]
+        for name, value in sorted(self.counters.items()):
+            metric = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
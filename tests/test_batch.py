@@ -0,0 +1,51 @@
+import threading
+import time
+
+import fitz  # PyMuPDF
+
+from morpher_pdf.converters.batch import BatchConverter
+from morpher_pdf.converters.markdown import MarkdownConverter
+from morpher_pdf.llm.fake import FakeLLMClient
+
+
+def make_documents(tmp_path, count, pages=3):
+    paths = []
+    for doc_num in range(count):
+        path = tmp_path / f"document_{doc_num}.pdf"
+        document = fitz.open()
+        for page_num in range(pages):
+            page = document.new_page()
+            page.insert_text((72, 72), f"Document {doc_num}, page {page_num + 1}", fontsize=14)
+        document.save(str(path))
+        paths.append(str(path))
+    return paths
+
+
+def test_concurrent_documents_take_turns_on_pymupdf(tmp_path, monkeypatch):
+    active = 0
+    most_active = 0
+    lock = threading.Lock()
+    prepare_page = MarkdownConverter._prepare_page
+
+    def counting_prepare_page(self, pdf_document, page, page_num):
+        nonlocal active, most_active
+        with lock:
+            active += 1
+            most_active = max(most_active, active)
+        try:
+            time.sleep(0.01)
+            return prepare_page(self, pdf_document, page, page_num)
+        finally:
+            with lock:
+                active -= 1
+
+    monkeypatch.setattr(MarkdownConverter, "_prepare_page", counting_prepare_page)
+    monkeypatch.setattr("morpher_pdf.converters.batch.LLMFactory.get_client",
+                        lambda *args, **kwargs: FakeLLMClient())
+
+    batch = BatchConverter(make_documents(tmp_path, 4), "fake-key", max_workers=4, max_documents=4)
+    results = batch.convert()
+
+    assert len(results) == 4
+    assert all(result.ok for result in results)
+    assert most_active == 1
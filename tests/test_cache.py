@@ -0,0 +1,48 @@
+import pytest
+
+from morpher_pdf.cache import BasePageCache, MemoryPageCache, SQLitePageCache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryPageCache(max_bytes=10)
+    else:
+        cache = SQLitePageCache(str(tmp_path / "cache.db"), max_bytes=10)
+        yield cache
+        cache.close()
+
+
+def test_get_and_set(cache):
+    assert cache.get("a") is None
+    cache.set("a", "1234")
+    assert cache.get("a") == "1234"
+    cache.set("a", "5678")
+    assert cache.get("a") == "5678"
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.set("a", "aaaa")
+    cache.set("b", "bbbb")
+    cache.get("a")
+    cache.set("c", "cccc")
+
+    assert cache.get("a") == "aaaa"
+    assert cache.get("b") is None
+    assert cache.get("c") == "cccc"
+
+
+def test_oversized_entries_are_not_stored(cache):
+    cache.set("a", "x" * 11)
+    assert cache.get("a") is None
+
+
+def test_key_covers_page_model_and_prompt():
+    key = BasePageCache.make_key(b"page", "gpt4-vision", "prompt")
+
+    assert key == BasePageCache.make_key(b"page", "gpt4-vision", "prompt")
+    assert key != BasePageCache.make_key(b"page2", "gpt4-vision", "prompt")
+    assert key != BasePageCache.make_key(b"page", "gemini-flash-1", "prompt")
+    assert key != BasePageCache.make_key(b"page", "gpt4-vision", "other prompt")
+    # Parts are length prefixed, moving bytes between them changes the key
+    assert BasePageCache.make_key(b"ab", "c", "") != BasePageCache.make_key(b"a", "bc", "")
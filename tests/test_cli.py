@@ -0,0 +1,21 @@
+import pytest
+
+from morpher_pdf.cli import parse_llm_type, parse_pages
+
+
+def test_parse_pages():
+    assert parse_pages("1") == [0]
+    assert parse_pages("40-42") == [39, 40, 41]
+    assert parse_pages("3-5, 1,4") == [0, 2, 3, 4]
+    assert parse_pages("2,") == [1]
+
+
+@pytest.mark.parametrize("spec", ["0", "5-3", "a", "1-b", "-2"])
+def test_parse_pages_rejects_malformed_selections(spec):
+    with pytest.raises(ValueError):
+        parse_pages(spec)
+
+
+def test_parse_llm_type():
+    assert parse_llm_type("gpt4-vision") == "gpt4-vision"
+    assert parse_llm_type("gemini-flash-1, gpt4-vision") == ["gemini-flash-1", "gpt4-vision"]
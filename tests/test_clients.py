@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from morpher_pdf.llm.fake import FakeLLMClient, FakeServiceUnavailable
+from morpher_pdf.llm.throttle import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+class ScriptedClient(FakeLLMClient):
+    """Fake client raising the queued errors, one per request, before answering normally"""
+
+    def __init__(self, errors, **kwargs):
+        super().__init__(**kwargs)
+        self.errors = list(errors)
+
+    def _respond(self, page_count: int, failed: bool) -> str:
+        if self.errors:
+            raise self.errors.pop(0)
+        return super()._respond(page_count, failed)
+
+
+def half_open_client(*errors, **kwargs):
+    """Client whose circuit opened on a transient failure and is ready for a trial call"""
+    client = ScriptedClient([FakeServiceUnavailable("down"), *errors],
+                            retry_policy=RetryPolicy(max_retries=0),
+                            circuit_breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0), **kwargs)
+    with pytest.raises(FakeServiceUnavailable):
+        client.process_image(b"page", "prompt")
+    assert client.circuit_breaker.state == CircuitBreaker.OPEN
+    return client
+
+
+def test_non_retryable_error_of_the_trial_call_releases_it():
+    client = half_open_client(BadRequest("invalid image"))
+
+    with pytest.raises(BadRequest):
+        client.process_image(b"page", "prompt")
+    assert client.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+
+    # The next call is the new trial and closes the circuit
+    assert client.process_image(b"page", "prompt")
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_transient_failure_of_the_trial_call_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    client = ScriptedClient([FakeServiceUnavailable("down")], retry_policy=RetryPolicy(max_retries=0),
+                            circuit_breaker=breaker)
+    with pytest.raises(FakeServiceUnavailable):
+        client.process_image(b"page", "prompt")
+
+    with pytest.raises(CircuitOpenError):
+        client.process_image(b"page", "prompt")
+
+
+def test_abandoned_stream_releases_the_trial():
+    client = half_open_client(stream_chunk_size=4)
+
+    stream = client.stream_image(b"page", "prompt")
+    next(stream)
+    stream.close()
+
+    assert client.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+    assert "".join(client.stream_image(b"page", "prompt"))
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_trial_is_released():
+    client = half_open_client()
+    client.latency = 5.0
+
+    async def cancel_trial():
+        task = asyncio.create_task(client.aprocess_image(b"page", "prompt"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert client.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+    client.latency = 0.0
+    assert client.process_image(b"page", "prompt")
+
+
+def test_call_started_before_the_circuit_opened_does_not_release_the_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    assert breaker.before_call() is False
+    breaker.record_failure()
+
+    assert breaker.before_call() is True
+    # The earlier call ends while the trial is in flight
+    breaker.release(False)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
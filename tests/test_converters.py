@@ -0,0 +1,127 @@
+import threading
+
+import fitz  # PyMuPDF
+import pytest
+
+from morpher_pdf.cache import MemoryPageCache
+from morpher_pdf.converters.markdown import MarkdownConverter
+from morpher_pdf.llm.fake import FakeLLMClient
+
+
+PAGES = 5
+
+
+class UntaggedPageClient(FakeLLMClient):
+    """Fake client whose answer to one request lacks the output tags"""
+
+    def __init__(self, bad_request: int, **kwargs):
+        super().__init__(**kwargs)
+        self.bad_request = bad_request
+        self._requests = 0
+        self._requests_lock = threading.Lock()
+
+    def _process_image(self, image_bytes: bytes, prompt: str) -> str:
+        content = super()._process_image(image_bytes, prompt)
+        with self._requests_lock:
+            request = self._requests
+            self._requests += 1
+        return "No tags here" if request == self.bad_request else content
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "document.pdf"
+    document = fitz.open()
+    for page_num in range(PAGES):
+        page = document.new_page()
+        page.insert_text((72, 72), f"Page {page_num + 1}", fontsize=14)
+    document.save(str(path))
+    return str(path)
+
+
+def make_converter(pdf_path, client, **kwargs):
+    kwargs.setdefault("max_workers", 1)
+    return MarkdownConverter(pdf_path, "fake-key", llm_client=client, **kwargs)
+
+
+def test_failed_page_is_left_empty(pdf_path):
+    converter = make_converter(pdf_path, UntaggedPageClient(bad_request=1))
+    results = list(converter.convert_iter())
+
+    assert [page_num for page_num, _ in results] == [0, 1, 2, 3, 4]
+    assert all(isinstance(content, str) for _, content in results)
+    assert converter.failed_pages == [1]
+    assert results[1] == (1, "")
+
+
+def test_failed_page_does_not_fail_the_document(pdf_path):
+    converter = make_converter(pdf_path, UntaggedPageClient(bad_request=2))
+    content, _ = converter.convert()
+
+    assert content.count("# Fake page") == 4
+    assert converter.failed_pages == [2]
+
+
+def test_failed_page_in_multi_page_request_is_left_empty(pdf_path):
+    client = FakeLLMClient(content="No tags here")
+    converter = make_converter(pdf_path, client, pages_per_request=2)
+    content, _ = converter.convert()
+
+    assert converter.page_contents == [""] * 5
+    assert converter.failed_pages == [0, 1, 2, 3, 4]
+    assert isinstance(content, str)
+
+
+def test_pages_are_yielded_in_page_order(pdf_path):
+    # Jittered latencies make pages finish out of order
+    client = FakeLLMClient(latency_jitter=0.02, seed=1)
+    converter = make_converter(pdf_path, client, max_workers=4)
+
+    assert [page_num for page_num, _ in converter.convert_iter()] == list(range(PAGES))
+    assert client.counters["pages"] == PAGES
+
+
+def test_multi_page_requests_keep_the_page_order(pdf_path):
+    client = FakeLLMClient(latency_jitter=0.02, seed=1)
+    converter = make_converter(pdf_path, client, max_workers=4, pages_per_request=2)
+    results = list(converter.convert_iter())
+
+    assert [page_num for page_num, _ in results] == list(range(PAGES))
+    assert all(content == "# Fake page" for _, content in results)
+    assert client.counters["requests"] == 3
+
+
+def test_repeated_conversion_is_served_from_the_cache(pdf_path):
+    client = FakeLLMClient()
+    cache = MemoryPageCache()
+
+    first = make_converter(pdf_path, client, cache=cache)
+    content, _, stats = first.convert(return_stats=True)
+    assert stats.counters["cache_misses"] == PAGES
+    assert stats.counters["cache_hits"] == 0
+
+    second = make_converter(pdf_path, client, cache=cache)
+    cached_content, _, stats = second.convert(return_stats=True)
+    assert stats.counters["cache_hits"] == PAGES
+    assert stats.counters["cache_misses"] == 0
+    assert cached_content == content
+    assert client.counters["requests"] == PAGES
+
+
+def test_failed_pages_are_not_cached(pdf_path):
+    cache = MemoryPageCache()
+    make_converter(pdf_path, UntaggedPageClient(bad_request=0), cache=cache).convert()
+
+    client = FakeLLMClient()
+    converter = make_converter(pdf_path, client, cache=cache)
+    converter.convert()
+    assert converter.failed_pages == []
+    assert client.counters["requests"] == 1
+
+
+def test_only_selected_pages_are_converted(pdf_path):
+    client = FakeLLMClient()
+    converter = make_converter(pdf_path, client, pages=[3, 1, 3])
+
+    assert [page_num for page_num, _ in converter.convert_iter()] == [1, 3]
+    assert client.counters["pages"] == 2
@@ -0,0 +1,58 @@
+import fitz  # PyMuPDF
+import pytest
+
+from morpher_pdf.converters.document import Document
+from morpher_pdf.converters.markdown import MarkdownConverter
+from morpher_pdf.llm.factory import LLMFactory
+from morpher_pdf.llm.fake import FakeLLMClient
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "report.pdf"
+    document = fitz.open()
+    for page_num in range(4):
+        document.new_page().insert_text((72, 72), f"Page {page_num + 1}", fontsize=14)
+    document.set_toc([[1, "Introduction", 1], [1, "Results", 3]])
+    document.save(str(path))
+    return str(path)
+
+
+class CountingConverter(MarkdownConverter):
+    instances = 0
+
+    def __init__(self, *args, **kwargs):
+        type(self).instances += 1
+        super().__init__(*args, **kwargs)
+
+
+def test_opening_sets_up_no_converter_or_client(pdf_path, monkeypatch):
+    def get_client(*args, **kwargs):
+        raise AssertionError("LLM client created")
+
+    monkeypatch.setattr(LLMFactory, "get_client", get_client)
+    CountingConverter.instances = 0
+    document = Document(pdf_path, "test-key", converter_class=CountingConverter)
+
+    assert len(document) == 4
+    assert [page.number for page in document.section("Results")] == [2, 3]
+    assert CountingConverter.instances == 0
+
+
+def test_pages_are_converted_on_first_access(pdf_path):
+    client = FakeLLMClient()
+    CountingConverter.instances = 0
+    document = Document(pdf_path, "fake-key", converter_class=CountingConverter, llm_client=client)
+
+    assert document.pages[1].markdown == "# Fake page"
+    assert document.pages[1].loaded and not document.pages[0].loaded
+    assert document.pages[1].content == "# Fake page"
+    assert CountingConverter.instances == 1
+    assert client.counters["pages"] == 1
+
+
+def test_document_opened_by_the_caller_stays_open(pdf_path):
+    with fitz.open(pdf_path) as pdf_document:
+        document = Document(pdf_document, "fake-key", llm_client=FakeLLMClient())
+        assert len(document) == 4
+        assert not pdf_document.is_closed
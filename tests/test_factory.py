@@ -0,0 +1,51 @@
+import pytest
+
+from morpher_pdf.llm.factory import LLMFactory
+from morpher_pdf.llm.fake import FakeLLMClient
+
+
+@pytest.fixture
+def factory():
+    yield LLMFactory
+    LLMFactory.close_all()
+
+
+@pytest.fixture
+def fake_type(factory):
+    factory.register("fake", FakeLLMClient)
+    yield "fake"
+    factory.unregister("fake")
+
+
+def test_callers_with_more_workers_grow_the_shared_pool(factory):
+    pytest.importorskip("openai")
+    client = factory.get_client("gpt4-vision", "test-key", max_connections=4)
+    pool = client.client
+
+    assert factory.get_client("gpt4-vision", "test-key", max_connections=16) is client
+    assert client.max_connections == 16
+    assert client.client is not pool
+
+    # Smaller callers share the grown pool
+    assert factory.get_client("gpt4-vision", "test-key", max_connections=2) is client
+    assert client.max_connections == 16
+
+
+def test_hedged_client_grows_its_executor_and_clients(factory, fake_type):
+    client = factory.get_client([fake_type, fake_type], "test-key", max_connections=2)
+    executor = client._executor
+
+    assert factory.get_client([fake_type, fake_type], "test-key", max_connections=40) is client
+    assert client._executor is not executor
+    assert client._executor._max_workers == 80
+    assert all(wrapped.max_connections == 40 for wrapped in client.clients)
+    assert client.process_image(b"page", "prompt")
+
+
+def test_custom_types_are_throttled_and_sized_like_built_in_ones(factory, fake_type):
+    client = factory.get_client(fake_type, "test-key", max_connections=3, rate_limit={fake_type: (120, None)})
+
+    assert client.max_connections == 3
+    assert client.rate_limiter.requests.rate == 2
+    assert factory.get_client(fake_type, "test-key", max_connections=3, rate_limit=(120, None)) is client
+    assert factory.get_client(fake_type, "test-key").rate_limiter is None
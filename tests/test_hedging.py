@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from morpher_pdf.llm.fake import FakeLLMClient, FakeServiceUnavailable
+from morpher_pdf.llm.hedging import HedgedClient
+from morpher_pdf.llm.throttle import RetryPolicy
+
+
+def fake_client(**kwargs):
+    return FakeLLMClient(retry_policy=RetryPolicy(max_retries=0), **kwargs)
+
+
+def test_failed_request_fails_over_to_the_next_client():
+    failing = fake_client(error_rate=1.0)
+    backup = fake_client(content="backup")
+    with HedgedClient([failing, backup], max_hedges=0) as client:
+        assert client.process_image(b"page", "prompt") == "backup"
+
+    assert failing.counters["failed"] == 1
+    assert backup.counters["requests"] == 1
+
+
+def test_error_of_the_last_client_is_raised():
+    with HedgedClient([fake_client(error_rate=1.0), fake_client(error_rate=1.0)], max_hedges=0) as client:
+        with pytest.raises(FakeServiceUnavailable):
+            client.process_image(b"page", "prompt")
+
+
+def test_slow_request_is_hedged():
+    slow = fake_client(latency=2.0, content="slow")
+    fast = fake_client(content="fast")
+    with HedgedClient([slow, fast], hedge_delay=0.05) as client:
+        start = time.monotonic()
+        assert client.process_image(b"page", "prompt") == "fast"
+        assert time.monotonic() - start < 1.0
+
+
+def test_async_request_fails_over():
+    import asyncio
+
+    backup = fake_client(content="backup")
+    client = HedgedClient([fake_client(error_rate=1.0), backup], max_hedges=0)
+    try:
+        assert asyncio.run(client.aprocess_image(b"page", "prompt")) == "backup"
+    finally:
+        client.close()
+
+
+def test_cancelled_loser_releases_its_half_open_trial():
+    import asyncio
+
+    from morpher_pdf.llm.throttle import CircuitBreaker
+
+    slow = fake_client(circuit_breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0))
+    slow.circuit_breaker.record_failure()
+    slow.latency = 5.0
+    fast = fake_client(content="fast")
+    client = HedgedClient([slow, fast], hedge_delay=0.05)
+    try:
+        assert asyncio.run(client.aprocess_image(b"page", "prompt")) == "fast"
+    finally:
+        client.close()
+
+    # The loser was the trial call; it is given back instead of holding the circuit open
+    assert slow.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+    assert client.latencies[0].count == 1
+    assert client.latencies[0].percentile(0.5) >= 0.05
+    slow.latency = 0.0
+    assert slow.process_image(b"page", "prompt")
+    assert slow.circuit_breaker.state == CircuitBreaker.CLOSED
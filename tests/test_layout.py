@@ -0,0 +1,140 @@
+import random
+
+import fitz  # PyMuPDF
+import pytest
+
+from morpher_pdf.converters import layout
+from morpher_pdf.converters.layout import TABLE, TEXT, Region, _overlap_fraction, tile_page
+from morpher_pdf.converters.markdown import MarkdownConverter
+from morpher_pdf.llm.fake import FakeLLMClient
+
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+
+
+def paper_page(document, rng):
+    """Title, two columns of prose and a ruled table below them"""
+    page = document.new_page()
+    page.insert_textbox(fitz.Rect(72, 60, 540, 90), "Results", fontsize=16)
+    for column in range(2):
+        x0 = 72 + column * 240
+        body = "\n\n".join(" ".join(rng.choice(WORDS) for _ in range(45)) for _ in range(4))
+        page.insert_textbox(fitz.Rect(x0, 110, x0 + 225, 540), body, fontsize=9)
+    shape = page.new_shape()
+    for row in range(7):
+        shape.draw_line((72, 560 + row * 20), (540, 560 + row * 20))
+        if row < 6:
+            for column in range(4):
+                page.insert_text((80 + column * 117, 575 + row * 20), f"{rng.uniform(0, 100):.2f}", fontsize=8)
+    for column in range(5):
+        shape.draw_line((72 + column * 117, 560), (72 + column * 117, 680))
+    shape.finish(color=(0, 0, 0), width=0.5)
+    shape.commit()
+    return page
+
+
+@pytest.fixture
+def document():
+    document = fitz.open()
+    paper_page(document, random.Random(0))
+    yield document
+    document.close()
+
+
+def test_dense_page_is_cut_in_reading_order(document):
+    regions = tile_page(document[0])
+
+    assert [region.kind for region in regions] == [TEXT, TEXT, TABLE]
+    left, right, table = (region.rect for region in regions)
+    assert left.x1 < right.x0
+    assert max(left.y1, right.y1) < table.y0
+    assert all(_overlap_fraction(a.rect, b.rect) == 0
+               for index, a in enumerate(regions) for b in regions[index + 1:])
+
+
+def test_sparse_page_is_sent_whole():
+    document = fitz.open()
+    document.new_page().insert_text((72, 72), "A short note", fontsize=12)
+
+    assert tile_page(document[0]) is None
+
+
+def test_page_with_overlapping_regions_is_sent_whole(document, monkeypatch):
+    # The first and last region overlap without being neighbours in reading order
+    regions = [Region(fitz.Rect(50, 50, 250, 400), TEXT),
+               Region(fitz.Rect(300, 50, 550, 400), TEXT),
+               Region(fitz.Rect(150, 300, 350, 700), TABLE)]
+    monkeypatch.setattr(layout, "page_regions", lambda page, clusters=None: regions)
+
+    assert tile_page(document[0]) is None
+
+
+def test_clusters_of_the_figure_extraction_are_reused(document, monkeypatch):
+    page = document[0]
+    clusters = [fitz.Rect(72, 560, 540, 680)]
+
+    def cluster_drawings(paths):
+        raise AssertionError("drawings clustered again")
+
+    monkeypatch.setattr("morpher_pdf.converters.clustering.cluster_drawings", cluster_drawings)
+    regions = tile_page(page, clusters=clusters)
+
+    assert regions[-1].kind == TABLE
+    assert clusters == [fitz.Rect(72, 560, 540, 680)]
+
+
+def test_converter_clusters_each_page_once(tmp_path, monkeypatch):
+    from morpher_pdf.converters import clustering
+
+    path = str(tmp_path / "paper.pdf")
+    document = fitz.open()
+    rng = random.Random(0)
+    for _ in range(3):
+        paper_page(document, rng)
+    document.save(path)
+
+    calls = []
+    cluster_drawings = clustering.cluster_drawings
+
+    def counting_cluster_drawings(*args, **kwargs):
+        calls.append(args)
+        return cluster_drawings(*args, **kwargs)
+
+    monkeypatch.setattr(clustering, "cluster_drawings", counting_cluster_drawings)
+    client = FakeLLMClient()
+    converter = MarkdownConverter(path, "fake-key", llm_client=client, region_tiling=True, max_workers=2)
+    content, _, stats = converter.convert(return_stats=True)
+
+    assert len(calls) == 3
+    assert stats.counters["tiled_pages"] == 3
+    assert client.counters["requests"] == stats.counters["region_requests"] == 9
+    assert converter.page_contents == ["# Fake page\n\n# Fake page\n\n# Fake page"] * 3
+
+
+def test_clusters_are_reused_when_figure_images_cannot_be_extracted(tmp_path, monkeypatch):
+    from morpher_pdf.converters import clustering
+    from morpher_pdf.converters.imagestore import ImageStore
+
+    path = str(tmp_path / "paper.pdf")
+    document = fitz.open()
+    rng = random.Random(0)
+    for _ in range(3):
+        paper_page(document, rng)
+    document.save(path)
+
+    calls = []
+    cluster_drawings = clustering.cluster_drawings
+
+    def counting_cluster_drawings(*args, **kwargs):
+        calls.append(args)
+        return cluster_drawings(*args, **kwargs)
+
+    def failing_add(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(clustering, "cluster_drawings", counting_cluster_drawings)
+    monkeypatch.setattr(ImageStore, "add", failing_add)
+    converter = MarkdownConverter(path, "fake-key", llm_client=FakeLLMClient(), region_tiling=True, max_workers=2)
+    _, _, stats = converter.convert(return_stats=True)
+
+    assert len(calls) == 3
+    assert stats.counters["tiled_pages"] == 3
@@ -0,0 +1,73 @@
+import io
+
+import fitz  # PyMuPDF
+import pytest
+from PIL import Image
+
+from morpher_pdf.converters.imagestore import ImageStore, reading_order
+from morpher_pdf.converters.markdown import MarkdownConverter
+from morpher_pdf.llm.fake import FakeLLMClient
+
+
+def png(width, height):
+    image = Image.new("RGB", (width, height))
+    image.putdata([((x * 7) % 256, (y * 5) % 256, ((x + y) * 3) % 256)
+                   for y in range(height) for x in range(width)])
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def markdown(references):
+    body = "\n\n".join(f"![figure {number}](image)" for number in range(references))
+    return f"<task_one>\nFigures\n</task_one>\n\n<task_two>\n{body}\n</task_two>"
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    """A page whose right figure is placed, and extracted, before the left one"""
+    path = tmp_path / "figures.pdf"
+    document = fitz.open()
+    page = document.new_page()
+    page.insert_image(fitz.Rect(320, 100, 520, 250), stream=png(80, 60))
+    page.insert_image(fitz.Rect(72, 102, 272, 252), stream=png(120, 90))
+    document.save(str(path))
+    document.close()
+    return str(path)
+
+
+def widths(converter, content):
+    names = [line.split("](")[1].rstrip(")") for line in content.splitlines() if line.startswith("![")]
+    return [Image.open(io.BytesIO(converter.image_store.images[name])).width for name in names]
+
+
+def test_reading_order_keeps_a_row_left_to_right():
+    boxes = [(300, 101, 400, 200), (0, 100, 100, 200), (0, 300, 100, 400), (150, 99, 250, 120)]
+
+    assert reading_order(boxes) == [1, 3, 0, 2]
+
+
+def test_store_orders_the_images_of_a_page_by_position():
+    store = ImageStore()
+    store.add(0, "logo", b"1", bbox=(0, 300, 100, 400))
+    store.add(0, "chart", b"2", bbox=(300, 100, 400, 200))
+    store.add_reference(0, "logo", bbox=(0, 100, 100, 200))
+
+    assert store.pages[0] == ["logo", "chart", "logo"]
+
+
+def test_references_link_the_images_from_the_top_left(pdf_path):
+    converter = MarkdownConverter(pdf_path, "fake-key", llm_client=FakeLLMClient(content=markdown(2)),
+                                  max_workers=1)
+    content, _ = converter.convert()
+
+    assert widths(converter, content) == [120, 80]
+
+
+def test_references_are_left_unchanged_when_the_count_differs(pdf_path):
+    converter = MarkdownConverter(pdf_path, "fake-key", llm_client=FakeLLMClient(content=markdown(1)),
+                                  max_workers=1)
+    content, _ = converter.convert()
+
+    assert len(converter.image_store.pages[0]) == 2
+    assert content.strip() == "![figure 0](image)"
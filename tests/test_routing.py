@@ -0,0 +1,85 @@
+import pytest
+
+from morpher_pdf.converters.routing import ModelRouter
+
+
+def test_route_to_the_converters_provider_uses_its_key():
+    router = ModelRouter({"simple": "gemini-flash-1", "complex": "gemini-flash-2"})
+
+    assert router.api_key("gemini-flash-1", "google-key", "gemini-flash-2") == "google-key"
+
+
+def test_route_to_another_provider_needs_a_key():
+    with pytest.raises(ValueError, match="gemini-flash-1"):
+        ModelRouter().api_key("gemini-flash-1", "openai-key", "gpt4-vision")
+
+    router = ModelRouter(api_keys={"gemini-flash-1": "google-key"})
+    assert router.api_key("gemini-flash-1", "openai-key", "gpt4-vision") == "google-key"
+
+
+def test_hedged_route_needs_a_key_for_every_provider():
+    router = ModelRouter(api_keys={"gemini-flash-1": "google-key"})
+
+    assert router.api_key(["gemini-flash-1", "gpt4-vision"], "openai-key", "gpt4-vision") == {
+        "gemini-flash-1": "google-key", "gpt4-vision": "openai-key"}
+    with pytest.raises(ValueError):
+        ModelRouter().api_key(["gpt4-vision", "gemini-flash-2"], "openai-key", ["gpt4-vision"])
+
+
+def test_custom_llm_types_are_not_checked():
+    router = ModelRouter()
+
+    assert router.api_key("fake-cheap", "fake-key", "fake") == "fake-key"
+    assert router.api_key("gemini-flash-1", "fake-key", "fake") == "fake-key"
+
+
+def test_converter_with_default_routes_fails_without_a_google_key(tmp_path):
+    import fitz  # PyMuPDF
+    from morpher_pdf.converters.markdown import MarkdownConverter
+    from morpher_pdf.llm.fake import FakeLLMClient
+
+    path = str(tmp_path / "document.pdf")
+    document = fitz.open()
+    document.new_page()
+    document.save(path)
+
+    with pytest.raises(ValueError, match="api_keys"):
+        MarkdownConverter(path, "openai-key", llm_client=FakeLLMClient(), router=ModelRouter())
+
+
+def test_converter_reads_the_drawings_of_each_page_once(tmp_path, monkeypatch):
+    import random
+
+    import fitz  # PyMuPDF
+    from morpher_pdf.converters.markdown import MarkdownConverter
+    from morpher_pdf.llm.factory import LLMFactory
+    from morpher_pdf.llm.fake import FakeLLMClient
+    from tests.test_layout import paper_page
+
+    path = str(tmp_path / "paper.pdf")
+    document = fitz.open()
+    rng = random.Random(0)
+    for _ in range(3):
+        paper_page(document, rng)
+    document.save(path)
+
+    calls = []
+    get_drawings = fitz.Page.get_drawings
+
+    def counting_get_drawings(page, *args, **kwargs):
+        calls.append(page.number)
+        return get_drawings(page, *args, **kwargs)
+
+    monkeypatch.setattr(fitz.Page, "get_drawings", counting_get_drawings)
+    LLMFactory.register("fake", FakeLLMClient)
+    try:
+        router = ModelRouter({"simple": "fake", "complex": "fake"})
+        converter = MarkdownConverter(path, "fake-key", llm_type="fake", router=router,
+                                      text_layer_fast_path=True, region_tiling=True, max_workers=1)
+        converter.convert()
+    finally:
+        LLMFactory.unregister("fake")
+        LLMFactory.close_all()
+
+    assert sorted(calls) == [0, 1, 2]
+    assert len(converter.routing_decisions) == 3
@@ -0,0 +1,52 @@
+import random
+import threading
+import time
+
+import pytest
+
+from morpher_pdf.converters.scheduler import PageScheduler
+
+
+def slow_identity(item):
+    # Later items often finish first
+    time.sleep(random.Random(item).uniform(0, 0.01))
+    return item
+
+
+@pytest.mark.parametrize("prioritize_short", [False, True])
+def test_results_are_yielded_in_input_order(prioritize_short):
+    with PageScheduler(max_workers=4, prioritize_short=prioritize_short) as scheduler:
+        results = list(scheduler.map(slow_identity, range(50), cost=lambda item: -item, max_pending=8))
+
+    assert results == list(range(50))
+
+
+def test_items_are_pulled_lazily():
+    pulled = []
+
+    def items():
+        for item in range(100):
+            pulled.append(item)
+            yield item
+
+    with PageScheduler(max_workers=2) as scheduler:
+        results = scheduler.map(slow_identity, items(), max_pending=4)
+        assert next(results) == 0
+        assert len(pulled) <= 5
+        assert list(results) == list(range(1, 100))
+
+
+def test_concurrent_maps_share_the_workers():
+    with PageScheduler(max_workers=3) as scheduler:
+        outputs = {}
+
+        def run(name, offset):
+            outputs[name] = list(scheduler.map(slow_identity, range(offset, offset + 20)))
+
+        threads = [threading.Thread(target=run, args=(name, offset)) for name, offset in (("a", 0), ("b", 100))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert outputs == {"a": list(range(20)), "b": list(range(100, 120))}
@@ -0,0 +1,47 @@
+import pytest
+
+from morpher_pdf.llm.streaming import TagStreamParser
+
+RESPONSE = ("<task_one>\nPlain transcript with </task_two> inside\n</task_one>\n\n"
+            "<task_two>\n  # Title\n\nBody text <b>bold</b>\n\n</task_two>\ntrailing")
+
+
+def feed_in_chunks(parser, text, size):
+    return "".join(parser.feed(text[start:start + size]) for start in range(0, len(text), size))
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, len(RESPONSE)])
+def test_chunking_does_not_change_the_content(size):
+    parser = TagStreamParser("task_two")
+    streamed = feed_in_chunks(parser, RESPONSE, size)
+
+    assert streamed == "# Title\n\nBody text <b>bold</b>"
+    assert parser.done
+    assert parser.result == streamed
+
+
+def test_content_is_emitted_before_the_closing_tag():
+    parser = TagStreamParser("markdown")
+
+    assert parser.feed("<mark") == ""
+    assert parser.feed("down>Hello") == "Hello"
+    # Could be the start of the closing tag, so it is held back
+    assert parser.feed(" world</mark") == " world"
+    assert parser.feed("x and more") == "</markx and more"
+    assert not parser.done
+
+
+def test_unclosed_tag_has_no_result():
+    parser = TagStreamParser("task_two")
+    feed_in_chunks(parser, "<task_two>cut off mid", 4)
+
+    assert not parser.done
+    assert parser.result is None
+
+
+def test_input_after_the_closing_tag_is_ignored():
+    parser = TagStreamParser("task_two")
+    parser.feed("<task_two>done</task_two>")
+
+    assert parser.feed("<task_two>again</task_two>") == ""
+    assert parser.result == "done"
@@ -0,0 +1,94 @@
+import random
+
+import fitz  # PyMuPDF
+import pytest
+
+from morpher_pdf.converters.markdown import MarkdownConverter
+from morpher_pdf.converters.textlayer import analyze_page, page_to_markdown
+from morpher_pdf.llm.fake import FakeLLMClient
+
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+
+
+def prose(rng, words=60):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+@pytest.fixture
+def document():
+    document = fitz.open()
+    yield document
+    document.close()
+
+
+def prose_page(document, rng):
+    page = document.new_page()
+    page.insert_textbox(fitz.Rect(72, 72, 540, 300), prose(rng, 120), fontsize=11)
+    return page
+
+
+def test_single_column_prose_is_converted_locally(document):
+    page = prose_page(document, random.Random(0))
+
+    assert analyze_page(page).needs_llm is False
+    assert page_to_markdown(page).startswith(tuple(WORDS))
+
+
+def test_two_column_page_needs_the_llm(document):
+    rng = random.Random(0)
+    page = document.new_page()
+    for column in range(2):
+        x0 = 72 + column * 240
+        page.insert_textbox(fitz.Rect(x0, 72, x0 + 225, 400), prose(rng), fontsize=10)
+
+    analysis = analyze_page(page)
+    assert analysis.needs_llm
+    assert analysis.reason == "columns"
+
+
+def test_small_vector_figure_needs_the_llm(document):
+    page = prose_page(document, random.Random(0))
+    shape = page.new_shape()
+    shape.draw_rect(fitz.Rect(72, 400, 152, 460))
+    shape.draw_line((72, 460), (152, 400))
+    shape.finish(color=(0, 0, 0), fill=(0.8, 0.2, 0.2))
+    shape.commit()
+
+    analysis = analyze_page(page)
+    assert analysis.needs_llm
+    assert analysis.reason == "figures"
+
+
+def test_small_image_needs_the_llm(document):
+    page = prose_page(document, random.Random(0))
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 40), False)
+    pixmap.set_rect(pixmap.irect, (200, 40, 40))
+    page.insert_image(fitz.Rect(72, 400, 132, 460), pixmap=pixmap)
+
+    analysis = analyze_page(page)
+    assert analysis.needs_llm
+    assert analysis.reason == "images"
+
+
+def test_converter_sends_a_page_with_a_figure_to_the_llm(tmp_path):
+    rng = random.Random(0)
+    document = fitz.open()
+    prose_page(document, rng)
+    page = prose_page(document, rng)
+    shape = page.new_shape()
+    for x in range(80, 200, 12):
+        shape.draw_line((x, 400), (x + 30, 480))
+    shape.finish(color=(0, 0, 0.6), width=2)
+    shape.commit()
+    path = tmp_path / "document.pdf"
+    document.save(str(path))
+    document.close()
+
+    client = FakeLLMClient()
+    converter = MarkdownConverter(str(path), "fake-key", llm_client=client, max_workers=1,
+                                  text_layer_fast_path=True)
+    content, images, stats = converter.convert(return_stats=True)
+
+    assert stats.counters["text_layer_pages"] == 1
+    assert client.counters["pages"] == 1
+    assert converter.page_contents[1] == "# Fake page"
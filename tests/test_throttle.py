@@ -0,0 +1,75 @@
+import pytest
+
+from morpher_pdf.llm.factory import RATE_LIMITS, LLMFactory, LLMType, resolve_rate_limit
+from morpher_pdf.llm.throttle import RateLimiter, TokenBucket
+
+
+def test_reservation_larger_than_capacity_grows_the_bucket():
+    bucket = TokenBucket(rate=500, capacity=2500)
+
+    # A full bucket sends the request at once and charges it in full
+    assert bucket.reserve(3688) == 0.0
+    assert bucket.capacity == 3688
+    assert bucket.reserve(3688) == pytest.approx(3688 / 500, rel=0.01)
+
+
+def test_token_budget_is_not_capped_by_the_bucket_size():
+    limiter = RateLimiter(requests_per_minute=500, tokens_per_minute=30_000)
+
+    assert limiter._reserve(3688) == 0.0
+    # 30k tokens per minute pay for one such request every 7.4 seconds
+    assert limiter._reserve(3688) == pytest.approx(3688 / 500, rel=0.01)
+
+
+def test_rate_limits_by_llm_type():
+    assert resolve_rate_limit(LLMType.GPT4_VISION, None) is None
+    assert resolve_rate_limit("gpt4-vision", RATE_LIMITS) == (500, 30_000)
+    assert resolve_rate_limit("gpt4-vision", {"gemini-flash-1": (10, None)}) is None
+    # A single limit applies to any type, lists come from JSON options
+    assert resolve_rate_limit("gemini-flash-1", [60, None]) == (60, None)
+
+
+def test_clients_are_not_rate_limited_by_default():
+    pytest.importorskip("openai")
+    try:
+        client = LLMFactory.get_client("gpt4-vision", "test-key")
+        assert client.rate_limiter is None
+
+        limited = LLMFactory.get_client("gpt4-vision", "test-key", rate_limit=(60, None))
+        assert limited is not client
+        assert limited.rate_limiter.requests.rate == 1
+        assert LLMFactory.get_client("gpt4-vision", "test-key", rate_limit=[60, None]) is limited
+    finally:
+        LLMFactory.close_all()
+
+
+def test_bucket_refills_at_its_rate(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("morpher_pdf.llm.throttle.time.monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=2, capacity=4)
+
+    assert [bucket.reserve() for _ in range(4)] == [0.0] * 4
+    assert bucket.reserve() == pytest.approx(0.5)
+
+    # Three tokens refill, the debt of the last reservation is paid off first
+    now[0] += 1.5
+    assert [bucket.reserve() for _ in range(2)] == [0.0] * 2
+    assert bucket.reserve() == pytest.approx(0.5)
+
+    # The bucket never holds more than its capacity
+    now[0] += 60
+    assert [bucket.reserve() for _ in range(4)] == [0.0] * 4
+    assert bucket.reserve() > 0
+
+
+def test_throttling_slows_the_limiter_down_and_success_recovers_it():
+    limiter = RateLimiter(requests_per_minute=60, recovery_step=0.25)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.scale == 0.25
+
+    limiter.on_success()
+    assert limiter.scale == 0.5
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.scale == 1.0